@@ -3,12 +3,24 @@ import requests
 from bs4 import BeautifulSoup
 import re
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import logging
 from urllib.parse import urlparse
 import groq
 import json
+import os
+import tempfile
+import hashlib
+import sqlite3
+import functools
+from pathlib import Path
 import time
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlunparse, parse_qsl, urlencode
 import plotly.express as px
 
 # Set up logging
@@ -36,7 +48,17 @@ KENYAN_SITES = {
 # Hardcoded SearxNG instance
 SEARXNG_URL = "https://searxng-587s.onrender.com"
 
-# Initialize Groq client
+# Fan-out search settings
+SEARCH_MAX_WORKERS = 16
+AI_MAX_WORKERS = 4
+AI_REQUESTS_PER_SECOND = 2.0
+
+# Shared HTTP session so concurrent queries reuse connections to SearxNG
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=SEARCH_MAX_WORKERS))
+
+# Initialize Groq client (one per process, shared by all enrichment batches)
+@st.cache_resource
 def get_groq_client():
     """Initialize Groq client with secret API key"""
     try:
@@ -48,218 +70,312 @@ def get_groq_client():
 
 # AI-enhanced parsing function
 def ai_enhance_car_analysis(car_data, text_content):
-    """Use Groq AI to enhance car data extraction and analysis"""
-    client = get_groq_client()
-    if not client:
-        return car_data
+    """Use Groq AI to enhance car data extraction and analysis (a batch of one)"""
+    return enrich_listings([car_data], [text_content])[0][0]
+
+# ============== COMPILED EXTRACTION ENGINE ==============
+# All listing patterns are compiled once into a single alternation with named
+# groups, so each listing text is scanned in one finditer pass; make/model
+# come from a separate token pass. At any position the first alternative
+# listed wins, so order below is also priority order.
+
+NUMBER = r'\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?'
+# Amounts written before a currency word must look like a price, not a year
+POST_NUMBER = r'\d{1,3}(?:,\d{3})+|\d{5,}'
+
+# ============== MAKE/MODEL DICTIONARY ==============
+# Aliases and typos live in kenyan_car_models.json. They are compiled into
+# token tries, so a lookup walks at most the longest alias per token no
+# matter how many models are listed. A deletion index catches single-typo
+# tokens that the dictionary does not spell out.
+
+CAR_MODELS_PATH = Path(__file__).with_name("kenyan_car_models.json")
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def bounded_edit_distance(a, b, max_dist):
+    """Levenshtein distance, or max_dist + 1 as soon as it is known to exceed max_dist"""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if min(cur) > max_dist:
+            return max_dist + 1
+        prev = cur
+    return prev[-1]
+
+class DeletionIndex:
+    """Candidates within edit distance 1 of a token via single-character deletes"""
     
-    try:
-        prompt = f"""
-        Analyze this Kenyan car listing and extract structured information:
-        
-        TEXT CONTENT:
-        {text_content[:3000]}
-        
-        EXISTING EXTRACTED DATA:
-        {json.dumps(car_data, indent=2)}
-        
-        Please enhance and correct the following fields for the Kenyan market:
-        1. Price in KSh (convert if in other currencies, handle formats like 800000, 800k, 1.2m)
-        2. Car make, model, year (handle common Kenyan typos like vitz/vits/viz)
-        3. Fuel type (petrol/diesel/hybrid)
-        4. Location in Kenya
-        5. Contact information (Kenyan phone formats: 07xxx, 01xxx, +254)
-        6. Condition (new, used, foreign used)
-        7. Transmission (automatic/manual)
-        8. Additional features
-        
-        Return ONLY a JSON object with enhanced data. If information is not available, use null.
-        """
-        
-        response = client.chat.completions.create(
-            model="llama-3.1-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are an expert at analyzing Kenyan car listings. Extract accurate information considering common Kenyan terminology and typos."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=1024
-        )
+    def __init__(self, min_length=4):
+        self.min_length = min_length
+        self.index = {}
+    
+    @staticmethod
+    def _deletes(word):
+        return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+    
+    def add(self, word, value):
+        if len(word) >= self.min_length:
+            for key in self._deletes(word):
+                self.index.setdefault(key, {})[word] = value
+    
+    def lookup(self, token):
+        if len(token) < self.min_length:
+            return None
+        best = None
+        for key in self._deletes(token):
+            for word, value in self.index.get(key, {}).items():
+                if bounded_edit_distance(token, word, 1) <= 1 and (best is None or word < best[0]):
+                    best = (word, value)
+        return best[1] if best else None
+
+class TokenTrie:
+    """Multi-word aliases keyed by token; longest match from a start position"""
+    
+    def __init__(self):
+        self.root = {}
+    
+    def add(self, phrase, value):
+        node = self.root
+        for token in TOKEN_RE.findall(phrase.lower()):
+            node = node.setdefault(token, {})
+        node[None] = value
+    
+    def longest_match(self, tokens, start):
+        node, found = self.root, None
+        for end in range(start, len(tokens)):
+            node = node.get(tokens[end])
+            if node is None:
+                break
+            if None in node:
+                found = (node[None], end + 1)
+        return found
+
+class CarModelMatcher:
+    """Resolve (make, model) from free listing text using the data-driven dictionary"""
+    
+    def __init__(self, data):
+        self.makes = TokenTrie()
+        self.standalone_models = TokenTrie()
+        self.models_by_make = {}
+        self.fuzzy_makes = DeletionIndex(min_length=5)
+        self.fuzzy_models = {}
         
-        enhanced_data = json.loads(response.choices[0].message.content)
+        for make in data.get("makes", []):
+            name = make["name"]
+            models = TokenTrie()
+            fuzzy = DeletionIndex(min_length=4)
+            for alias in [name] + make.get("aliases", []):
+                self.makes.add(alias, name)
+                if ' ' not in alias:
+                    self.fuzzy_makes.add(alias.lower(), name)
+            for model in make.get("models", []):
+                value = (name, model["name"])
+                for alias in [model["name"]] + model.get("aliases", []):
+                    models.add(alias, value)
+                    if not model.get("needs_make"):
+                        self.standalone_models.add(alias, value)
+                    if ' ' not in alias:
+                        fuzzy.add(alias.lower(), value)
+            self.models_by_make[name] = models
+            self.fuzzy_models[name] = fuzzy
+    
+    @classmethod
+    def from_file(cls, path=CAR_MODELS_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    def _make_at(self, tokens, i):
+        found = self.makes.longest_match(tokens, i)
+        if found:
+            return found
+        make = self.fuzzy_makes.lookup(tokens[i])
+        return (make, i + 1) if make else None
+    
+    def _model_after(self, make, tokens, i):
+        if i >= len(tokens):
+            return None
+        found = self.models_by_make[make].longest_match(tokens, i)
+        if found:
+            return found[0]
+        return self.fuzzy_models[make].lookup(tokens[i])
+    
+    def match(self, text):
+        """(make, model): a make followed by its model wins, then a standalone model, then a bare make"""
+        tokens = TOKEN_RE.findall(text.lower()) if text else []
+        model_only = make_only = None
         
-        # Merge enhanced data with existing data
-        for key, value in enhanced_data.items():
-            if value and value != "null" and value != "N/A":
-                car_data[key] = value
-                
-        return car_data
+        i = 0
+        while i < len(tokens):
+            found = self._make_at(tokens, i)
+            if found:
+                make, end = found
+                model = self._model_after(make, tokens, end)
+                if model:
+                    return model
+                make_only = make_only or make
+                i = end
+                continue
+            
+            found = self.standalone_models.longest_match(tokens, i)
+            if found:
+                model_only = model_only or found[0]
+                i = found[1]
+                continue
+            i += 1
         
-    except Exception as e:
-        logger.warning(f"AI enhancement failed: {e}")
-        return car_data
+        if model_only:
+            return model_only
+        return (make_only, None)
 
-# Enhanced Kenyan price extraction
-def extract_kenyan_price(text):
-    """Extract price from text with all Kenyan currency formats"""
+@functools.lru_cache(maxsize=1)
+def get_car_matcher():
+    return CarModelMatcher.from_file()
+
+def _build_listing_pattern():
+    alts = [
+        # Currency-anchored prices: "ksh 800,000", "kes 1.2m", "950,000/=", "1,450,000 shillings"
+        rf'(?P<price_pre>(?:ksh|kes|sh)\.?\s*(?P<pre_num>{NUMBER})\s*(?P<pre_unit>million\b|mn\b|m\b|k\b)?)',
+        rf'(?P<price_post>(?P<post_num>{POST_NUMBER})\s*(?:ksh\b|kes\b|shillings\b|sh\b|/=))',
+        r'(?P<price_million>(?P<million_num>\d+(?:\.\d{1,2})?)\s*(?:million|mn|m)\b)',
+        r'(?P<price_thousand>(?P<thousand_num>\d+(?:\.\d)?)\s*k\b)',
+        r'(?P<phone>(?:\+?254\s?|0)[17]\d{2}[\s-]?\d{3}[\s-]?\d{3}(?!\d))',
+        r'(?P<email>[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)',
+        r'(?P<year>(?:19[5-9]\d|20[0-4]\d)\b)',
+        r'(?P<fuel>(?:petrol|diesel|hybrid|electric)\b)',
+        r'(?P<auto>(?:automatic|auto|a/t|cvt)\b)',
+        r'(?P<manual>(?:manual|m/t|mt)\b)',
+        r'(?P<foreign_used>(?:foreign\s*used|ex[\s-]?(?:japan|uk|jp)|imported)\b)',
+        r'(?P<used>(?:locally\s*used|used|second\s*hand)\b)',
+        r'(?P<new>(?:brand\s*new|new)\b)',
+        r'(?P<big_number>\d{5,7}\b)',
+    ]
+    # Every alternative starts a token: the guard rejects mid-word positions
+    # before any branch is tried, which is what keeps one big alternation fast
+    return re.compile(r'(?<![\w+])(?=[\w+])(?:' + '|'.join(alts) + ')', re.IGNORECASE)
+
+LISTING_PATTERN = _build_listing_pattern()
+PRICE_KEYWORDS = re.compile(r'price|cost|asking|ksh|kes|\bsh\b', re.IGNORECASE)
+PRICE_UNITS = {'m': 1_000_000, 'mn': 1_000_000, 'million': 1_000_000, 'k': 1_000}
+# Lower rank wins when a text contains several kinds of price
+PRICE_RANK = {'price_pre': 0, 'price_post': 0, 'price_million': 1, 'price_thousand': 2, 'big_number': 3}
+CONDITION_RANK = {'foreign_used': 0, 'used': 1, 'new': 2}
+CONDITION_LABELS = {'foreign_used': 'Foreign Used', 'used': 'Used', 'new': 'New'}
+
+def _to_float(number, unit=None):
+    value = float(number.replace(',', ''))
+    return value * PRICE_UNITS.get((unit or '').lower(), 1)
+
+def _normalize_phone(raw):
+    """+254 712 345 678 / 0712-345-678 -> 0712345678 so formats de-duplicate"""
+    digits = re.sub(r'\D', '', raw)
+    return '0' + digits[3:] if digits.startswith('254') else digits
+
+def extract_listing(text):
+    """Single-pass extraction of price, contacts and car details from listing text"""
+    info = {
+        'price': None, 'phones': [], 'emails': [],
+        'make': None, 'model': None, 'year': None,
+        'fuel_type': None, 'transmission': None, 'condition': None,
+    }
     if not text:
-        return None
+        return info
     
-    text_lower = text.lower()
+    best_price_rank = None
+    condition_rank = None
     
-    # All Kenyan price patterns
-    price_patterns = [
-        # Formatted prices with currency
-        r'ksh\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
-        r'sh\s*(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)',
-        r'(\d{1,3}(?:,\d{3})*(?:\.\d{2})?)\s*(ksh|sh|shillings)',
+    for m in LISTING_PATTERN.finditer(text):
+        kind = m.lastgroup
         
-        # Million formats
-        r'(\d+(?:\.\d{1,2})?)\s*m(?:illion)?',
-        r'ksh\s*(\d+(?:\.\d{1,2})?)\s*m',
-        
-        # K format
-        r'(\d+(?:\.\d)?)\s*k\b',
-        r'ksh\s*(\d+)\s*k',
-    ]
-    
-    for pattern in price_patterns:
-        matches = re.findall(pattern, text_lower, re.IGNORECASE)
-        if matches:
-            price_match = matches[0][0] if isinstance(matches[0], tuple) else matches[0]
-            
-            try:
-                # Handle million format
-                if 'm' in pattern:
-                    return float(price_match) * 1000000
-                
-                # Handle k format
-                if 'k' in pattern and not 'ksh' in pattern:
-                    return float(price_match) * 1000
-                
-                # Handle normal numbers
-                clean_price = price_match.replace(',', '')
-                return float(clean_price)
-                
-            except ValueError:
+        if kind in PRICE_RANK:
+            rank = PRICE_RANK[kind]
+            if best_price_rank is not None and rank >= best_price_rank:
                 continue
-    
-    # Final fallback: look for large standalone numbers near price keywords
-    if any(keyword in text_lower for keyword in ['price', 'cost', 'asking', 'ksh', 'sh']):
-        big_numbers = re.findall(r'\b(\d{5,7})\b', text)
-        if big_numbers:
             try:
-                return float(big_numbers[0])
-            except:
-                pass
+                if kind == 'price_pre':
+                    value = _to_float(m.group('pre_num'), m.group('pre_unit'))
+                elif kind == 'price_post':
+                    value = _to_float(m.group('post_num'))
+                elif kind == 'price_million':
+                    value = _to_float(m.group('million_num'), 'm')
+                elif kind == 'price_thousand':
+                    value = _to_float(m.group('thousand_num'), 'k')
+                else:
+                    value = float(m.group()) if PRICE_KEYWORDS.search(text) else None
+            except ValueError:
+                value = None
+            if value:
+                info['price'] = value
+                best_price_rank = rank
+        
+        elif kind == 'phone':
+            phone = _normalize_phone(m.group())
+            if phone not in info['phones']:
+                info['phones'].append(phone)
+        
+        elif kind == 'email':
+            if m.group() not in info['emails']:
+                info['emails'].append(m.group())
+        
+        elif kind == 'year':
+            if info['year'] is None:
+                info['year'] = m.group()
+        
+        elif kind == 'fuel':
+            if info['fuel_type'] is None:
+                info['fuel_type'] = m.group().capitalize()
+        
+        elif kind in ('auto', 'manual'):
+            if info['transmission'] is None:
+                info['transmission'] = 'Automatic' if kind == 'auto' else 'Manual'
+        
+        elif kind in CONDITION_RANK:
+            if condition_rank is None or CONDITION_RANK[kind] < condition_rank:
+                condition_rank = CONDITION_RANK[kind]
+                info['condition'] = CONDITION_LABELS[kind]
     
-    return None
+    info['make'], info['model'] = get_car_matcher().match(text)
+    return info
+
+# Enhanced Kenyan price extraction
+def extract_kenyan_price(text):
+    """Extract price from text with all Kenyan currency formats"""
+    return extract_listing(text)['price']
 
 # Enhanced Kenyan contact extraction
 def extract_kenyan_contacts(text):
     """Extract all Kenyan phone numbers and email addresses"""
-    contacts = {'phones': [], 'emails': []}
-    
-    if not text:
-        return contacts
-    
-    # All Kenyan phone number patterns
-    phone_patterns = [
-        r'(\+?254\s?\d{2}\s?\d{3}\s?\d{4})',
-        r'(07\d{2}\s?\d{3}\s?\d{3})',
-        r'(07\d{2}\-?\d{3}\-?\d{3})',
-        r'(07\d{8})',
-        r'(01\d{7,8})',
-        r'(011\d{6,7})',
-        r'(010\d{6,7})',
-    ]
-    
-    for pattern in phone_patterns:
-        phones = re.findall(pattern, text)
-        for phone in phones:
-            cleaned_phone = re.sub(r'[\s\-]', '', str(phone))
-            if cleaned_phone and cleaned_phone not in contacts['phones']:
-                contacts['phones'].append(cleaned_phone)
-    
-    # Email pattern
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    emails = re.findall(email_pattern, text)
-    contacts['emails'].extend(emails)
-    
-    # Remove duplicates
-    contacts['phones'] = list(set(contacts['phones']))
-    contacts['emails'] = list(set(contacts['emails']))
-    
-    return contacts
+    info = extract_listing(text)
+    return {'phones': info['phones'], 'emails': info['emails']}
 
 # Enhanced car details extraction
 def extract_kenyan_car_details(text):
     """Extract car make, model, year with focus on popular Kenyan models"""
-    car_info = {'make': None, 'model': None, 'year': None, 'fuel_type': None, 'transmission': None, 'condition': None}
-    
-    if not text:
-        return car_info
-    
-    text_lower = text.lower()
-    
-    # Year extraction with typo handling
-    year_patterns = [
-        r'\b(19|20)\d{2}\b',
-        r'\b(19|20)\s?\d{2}\b'
-    ]
-    
-    for pattern in year_patterns:
-        year_match = re.search(pattern, text)
-        if year_match:
-            car_info['year'] = year_match.group().replace(' ', '')
-            break
-    
-    # Fuel type
-    fuel_types = ['petrol', 'diesel', 'hybrid', 'electric']
-    for fuel in fuel_types:
-        if fuel in text_lower:
-            car_info['fuel_type'] = fuel.capitalize()
-            break
-    
-    # Transmission type
-    if 'automatic' in text_lower or 'at' in text_lower:
-        car_info['transmission'] = 'Automatic'
-    elif 'manual' in text_lower or 'mt' in text_lower:
-        car_info['transmission'] = 'Manual'
-    
-    # Condition
-    if 'new' in text_lower:
-        car_info['condition'] = 'New'
-    elif 'used' in text_lower or 'second' in text_lower:
-        car_info['condition'] = 'Used'
-    elif 'foreign used' in text_lower or 'ex-japan' in text_lower:
-        car_info['condition'] = 'Foreign Used'
-    
-    # Kenyan car models with typo handling
-    kenyan_car_patterns = [
-        (r'(toyota|toyota)\s*(vitz|vits|vit|viz)', lambda m: ('Toyota', 'Vitz')),
-        (r'(toyota)\s*(premio|premio|premo)', lambda m: ('Toyota', 'Premio')),
-        (r'(toyota)\s*(axio|axo)', lambda m: ('Toyota', 'Axio')),
-        (r'(toyota)\s*(fileder|fielder)', lambda m: ('Toyota', 'Fielder')),
-        (r'(toyota)\s*(wish)', lambda m: ('Toyota', 'Wish')),
-        (r'(toyota)\s*(probox)', lambda m: ('Toyota', 'Probox')),
-        (r'(subaru)\s*(forester|forestr|forestor)', lambda m: ('Subaru', 'Forester')),
-        (r'(nissan)\s*(march)', lambda m: ('Nissan', 'March')),
-        (r'(nissan)\s*(sunny|sanny)', lambda m: ('Nissan', 'Sunny')),
+    info = extract_listing(text)
+    return {key: info[key] for key in ('make', 'model', 'year', 'fuel_type', 'transmission', 'condition')}
+
+def benchmark_extraction(n=5000):
+    """Throughput of extract_listing over n synthetic listings"""
+    import random
+    random.seed(0)
+    samples = [
+        "Toyota Vitz 2015 KSh 850,000 automatic petrol, call 0712 345 678",
+        "Subaru Forestr 2012 diesel manual 1.2m ono foreign used, contact +254 722 123456 or sales@dealer.co.ke",
+        "Nissan sanny 2008 locally used 450k asking price, tel 0733-111-222",
+        "Clean toyota premo 2016 1,450,000/= ex-japan CVT hybrid",
+        "Mazda Demio 2014 for sale in Nairobi, price 720000 negotiable",
     ]
+    texts = [random.choice(samples) + " " + "lorem ipsum " * random.randint(5, 40) for _ in range(n)]
     
-    for pattern, processor in kenyan_car_patterns:
-        match = re.search(pattern, text_lower, re.IGNORECASE)
-        if match:
-            try:
-                make, model = processor(match)
-                car_info['make'] = make
-                car_info['model'] = model
-                break
-            except:
-                continue
-    
-    return car_info
+    start = time.perf_counter()
+    for text in texts:
+        extract_listing(text)
+    elapsed = time.perf_counter() - start
+    print(f"{n} listings in {elapsed:.3f}s ({n / elapsed:,.0f} listings/sec)")
+    return n / elapsed
 
 # Get site from URL
 def get_site_from_url(url):
@@ -270,6 +386,434 @@ def get_site_from_url(url):
     except:
         return url.split('/')[2] if '//' in url else url.split('/')[0]
 
+# Canonical URL for de-duplication across queries
+TRACKING_PARAMS = {'fbclid', 'gclid', 'ref', 'ref_', 'source', 'igshid'}
+
+def canonical_url(url):
+    """Normalize a listing URL: lowercase host without www, no fragment, tracking params or trailing slash"""
+    try:
+        parts = urlparse(url.strip())
+        host = parts.netloc.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+        ))
+        path = parts.path.rstrip("/") or "/"
+        return urlunparse(("https", host, path, "", query, ""))
+    except Exception:
+        return url
+
+# Thread-safe rate limiter for outbound API calls
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursting up to `burst`"""
+    
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+ai_rate_limiter = RateLimiter(AI_REQUESTS_PER_SECOND, burst=AI_MAX_WORKERS)
+
+# Single SearxNG request
+def searxng_query(query, count=10, page=1, timeout=30):
+    """Send one query to SearxNG and return its raw results"""
+    params = {"q": query, "format": "json", "count": count, "pageno": page}
+    response = http_session.get(SEARXNG_URL, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json().get("results", [])
+
+def build_search_queries(query, selected_sites, pages=1):
+    """One query per (site, page); a single Kenya-wide query per page when no sites are selected"""
+    car_context = "car vehicles for sale"
+    if not selected_sites:
+        base = [f"{query} {car_context} Kenya"]
+    else:
+        base = [f"{query} {car_context} site:{urlparse(site).netloc}" for site in selected_sites]
+    return [(q, page) for q in base for page in range(1, pages + 1)]
+
+def merge_results(result_lists, max_results=None):
+    """Round-robin merge of per-query results, de-duplicated by canonical URL"""
+    merged = []
+    seen = set()
+    for rank in range(max((len(r) for r in result_lists), default=0)):
+        for results in result_lists:
+            if rank >= len(results):
+                continue
+            result = results[rank]
+            key = canonical_url(result.get('url', result.get('link', '')))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(result)
+    return merged[:max_results] if max_results else merged
+
+def fan_out_search(query, selected_sites, max_results=10, pages=1, max_workers=SEARCH_MAX_WORKERS):
+    """Run per-site/per-page SearxNG queries concurrently on a bounded pool
+    
+    Returns (merged_results, errors). Wall time is that of the slowest query.
+    """
+    queries = build_search_queries(query, selected_sites, pages)
+    per_query = max(max_results // max(len(queries) // pages, 1), 5)
+    
+    result_lists = [[] for _ in queries]
+    errors = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+        futures = {
+            executor.submit(searxng_query, q, per_query, page): i
+            for i, (q, page) in enumerate(queries)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                result_lists[i] = future.result()
+            except Exception as e:
+                errors.append(f"{queries[i][0]} (page {queries[i][1]}): {e}")
+                logger.warning(f"Fan-out query failed: {queries[i][0]}: {e}")
+    
+    return merge_results(result_lists, max_results), errors
+
+# ============== BATCHED AI ENRICHMENT ==============
+# Listings are packed into a few chat completions under a token budget, and
+# every answer is cached on disk by a hash of the listing text, so repeating
+# a search costs no LLM calls.
+
+AI_MODEL = "llama-3.1-70b-versatile"
+AI_PROMPT_VERSION = 2
+AI_TEXT_CHARS = 1200            # listing text sent per item
+AI_BATCH_TOKEN_BUDGET = 6000    # estimated prompt tokens per request
+AI_BATCH_MAX_LISTINGS = 12
+AI_CACHE_DIR = Path(tempfile.gettempdir()) / "smartrev_ai_cache"
+
+# Field -> coercion; anything else the model returns is dropped
+AI_FIELDS = {
+    'price': lambda v: float(str(v).replace(',', '')),
+    'make': str,
+    'model': str,
+    # str like the regex parser, so AI and regex listings compare equal in dedup
+    'year': lambda v: str(v)[:4] if 1950 <= int(str(v)[:4]) <= 2035 else None,
+    'fuel_type': lambda v: str(v).title() if str(v).lower() in ('petrol', 'diesel', 'hybrid', 'electric') else None,
+    'transmission': lambda v: str(v).title() if str(v).lower() in ('automatic', 'manual') else None,
+    'condition': lambda v: str(v).title() if str(v).lower() in ('new', 'used', 'foreign used') else None,
+    'location': str,
+    'phones': lambda v: ", ".join(v[:3]) if isinstance(v, list) else str(v),
+    'features': lambda v: ", ".join(map(str, v)) if isinstance(v, list) else str(v),
+}
+
+AI_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "listings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "price": {"type": ["number", "null"], "description": "KSh, e.g. 1.2m -> 1200000"},
+                    "make": {"type": ["string", "null"]},
+                    "model": {"type": ["string", "null"]},
+                    "year": {"type": ["integer", "null"]},
+                    "fuel_type": {"enum": ["petrol", "diesel", "hybrid", "electric", None]},
+                    "transmission": {"enum": ["automatic", "manual", None]},
+                    "condition": {"enum": ["new", "used", "foreign used", None]},
+                    "location": {"type": ["string", "null"], "description": "town or area in Kenya"},
+                    "phones": {"type": "array", "items": {"type": "string"}},
+                    "features": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["id"],
+                "additionalProperties": False,
+            },
+        }
+    },
+    "required": ["listings"],
+}
+
+AI_SYSTEM_PROMPT = (
+    "You are an expert at analyzing Kenyan car listings. Extract accurate information considering "
+    "common Kenyan terminology and typos (vitz/vits/viz, 800k, 1.2m, 07xx/01xx/+254 phones). "
+    "Reply with a single JSON object matching this schema, one entry per listing id, "
+    "using null when a field is not stated:\n" + json.dumps(AI_RESPONSE_SCHEMA)
+)
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def ai_cache_key(text):
+    raw = f"{AI_MODEL}|{AI_PROMPT_VERSION}|{text[:AI_TEXT_CHARS]}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+@st.cache_resource
+def get_ai_memory_cache():
+    """Memory tier over the disk cache, kept across reruns"""
+    return {}
+
+def ai_cache_get(key):
+    memory = get_ai_memory_cache()
+    if key in memory:
+        return memory[key]
+    try:
+        with open(AI_CACHE_DIR / f"{key}.json", 'r', encoding='utf-8') as f:
+            memory[key] = json.load(f)
+        return memory[key]
+    except (OSError, ValueError):
+        return None
+
+def ai_cache_put(key, fields):
+    get_ai_memory_cache()[key] = fields
+    try:
+        AI_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = AI_CACHE_DIR / f"{key}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(fields, f)
+        os.replace(tmp_path, AI_CACHE_DIR / f"{key}.json")
+    except OSError as e:
+        logger.warning(f"Could not write AI cache: {e}")
+
+def clean_ai_fields(raw):
+    """Keep schema fields only, coerced to the types parse_car_from_json produces"""
+    fields = {}
+    for key, coerce in AI_FIELDS.items():
+        value = raw.get(key)
+        if value in (None, "", [], "null", "N/A"):
+            continue
+        try:
+            value = coerce(value)
+        except (TypeError, ValueError):
+            continue
+        if value:
+            fields[key] = value
+    return fields
+
+def pack_batches(items, token_budget=AI_BATCH_TOKEN_BUDGET, max_items=AI_BATCH_MAX_LISTINGS):
+    """Greedy packing of (id, text) pairs into batches under the prompt token budget"""
+    overhead = estimate_tokens(AI_SYSTEM_PROMPT)
+    batches, batch, used = [], [], overhead
+    for item_id, text in items:
+        cost = estimate_tokens(text) + 8
+        if batch and (used + cost > token_budget or len(batch) >= max_items):
+            batches.append(batch)
+            batch, used = [], overhead
+        batch.append((item_id, text))
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def enrich_batch(client, batch):
+    """One chat completion for a batch; returns {id: cleaned fields}"""
+    listings = "\n\n".join(f"### LISTING {item_id}\n{text}" for item_id, text in batch)
+    response = client.chat.completions.create(
+        model=AI_MODEL,
+        messages=[
+            {"role": "system", "content": AI_SYSTEM_PROMPT},
+            {"role": "user", "content": listings}
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.1,
+        max_tokens=min(8192, 160 * len(batch) + 64)
+    )
+    data = json.loads(response.choices[0].message.content)
+    wanted = {item_id for item_id, _ in batch}
+    parsed = {}
+    for entry in data.get("listings", []):
+        if isinstance(entry, dict) and entry.get("id") in wanted:
+            parsed[entry["id"]] = clean_ai_fields(entry)
+    return parsed
+
+def merge_ai_fields(car_data, fields):
+    for key, value in fields.items():
+        car_data[key] = value
+    if 'price' in fields:
+        car_data['price_display'] = f"KSh {fields['price']:,.0f}"
+    return car_data
+
+def enrich_listings(car_infos, texts, max_workers=AI_MAX_WORKERS, limiter=ai_rate_limiter):
+    """Batched, cached AI enrichment of parsed listings
+    
+    Returns (car_infos, stats) with stats = {'cached', 'calls', 'failed'}.
+    """
+    stats = {'cached': 0, 'calls': 0, 'failed': 0}
+    keys = [ai_cache_key(text) for text in texts]
+    
+    pending = {}
+    for i, key in enumerate(keys):
+        fields = ai_cache_get(key)
+        if fields is not None:
+            merge_ai_fields(car_infos[i], fields)
+            car_infos[i]['ai_enhanced'] = True
+            stats['cached'] += 1
+        else:
+            # Identical texts share one slot in the request
+            pending.setdefault(key, []).append(i)
+    
+    client = get_groq_client() if pending else None
+    if not client:
+        return car_infos, stats
+    
+    slots = list(pending)
+    items = [(slot, texts[pending[key][0]][:AI_TEXT_CHARS]) for slot, key in enumerate(slots)]
+    batches = pack_batches(items)
+    
+    def run(batch):
+        limiter.acquire()
+        return batch, enrich_batch(client, batch)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run, batch) for batch in batches]
+        for future in as_completed(futures):
+            stats['calls'] += 1
+            try:
+                batch, parsed = future.result()
+            except Exception as e:
+                logger.warning(f"AI enrichment batch failed: {e}")
+                stats['failed'] += 1
+                continue
+            for slot, _ in batch:
+                if slot not in parsed:
+                    continue
+                key = slots[slot]
+                ai_cache_put(key, parsed[slot])
+                for i in pending[key]:
+                    merge_ai_fields(car_infos[i], parsed[slot])
+                    car_infos[i]['ai_enhanced'] = True
+    
+    return car_infos, stats
+
+# ============== NEAR-DUPLICATE DETECTION ==============
+# Cross-posted cars are clustered with union-find. Candidate pairs come only
+# from shared blocking keys (SimHash band, phone number, make/model/year/price
+# bucket), so the work grows with the number of listings, not its square.
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4              # pairs within SIMHASH_BANDS - 1 bits share a band
+SIMHASH_NEAR = 3               # text alone: near-identical
+PRICE_TOLERANCE = 0.03
+MAX_BLOCK_SIZE = 50            # skip keys shared by a whole dealer inventory
+SHINGLE_RE = re.compile(r'[a-z0-9]+')
+PHONE_RE = re.compile(r'(?<![\w+])(?:\+?254\s?|0)[17]\d{2}[\s-]?\d{3}[\s-]?\d{3}(?!\d)')
+DEDUP_STOPWORDS = {'for', 'sale', 'in', 'kenya', 'nairobi', 'the', 'a', 'and', 'car', 'cars', 'ksh', 'kes', 'jiji', 'pigiame', 'cheki'}
+
+def listing_shingles(text):
+    """Word 2-grams plus single words of the normalized listing text"""
+    # "0712 345 678" and "+254712345678" become the single token 0712345678
+    text = PHONE_RE.sub(lambda m: f" {_normalize_phone(m.group())} ", text)
+    words = [w for w in SHINGLE_RE.findall(text.lower()) if w not in DEDUP_STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+def simhash(text):
+    shingles = listing_shingles(text)
+    if not shingles:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(sh.encode('utf-8'), digest_size=8).digest(), 'little') for sh in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int32) * 2 > len(shingles)
+    return int(np.packbits(votes, bitorder='little').view('<u8')[0])
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def _phone_keys(car):
+    phones = car.get('phones') or ''
+    return {p for p in re.split(r'[,\s]+', phones) if p.isdigit() and len(p) >= 9} if phones != "Not provided" else set()
+
+def _price_close(a, b):
+    return a and b and abs(a - b) <= PRICE_TOLERANCE * max(a, b)
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+    
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+    
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+def assign_duplicate_clusters(car_details):
+    """Tag each listing with cluster_id, cluster_size and is_primary; returns the number of unique vehicles
+    
+    Two listings are merged when their title+description SimHashes are nearly
+    identical, or when the price is within 3% and they share a phone number,
+    or (when a side has no phone) the same make/model/year. The key rules
+    don't depend on the text: cross-posts are often rewritten.
+    """
+    n = len(car_details)
+    signatures = [simhash(f"{c.get('title', '')} {c.get('description', '')}") for c in car_details]
+    phones = [_phone_keys(c) for c in car_details]
+    
+    blocks = {}
+    for i, car in enumerate(car_details):
+        sig = signatures[i]
+        width = SIMHASH_BITS // SIMHASH_BANDS
+        for band in range(SIMHASH_BANDS):
+            blocks.setdefault(('sim', band, (sig >> (band * width)) & ((1 << width) - 1)), []).append(i)
+        for phone in phones[i]:
+            blocks.setdefault(('phone', phone), []).append(i)
+        price = car.get('price')
+        if car.get('make') and price:
+            # Neighbouring buckets overlap so prices near a boundary still meet
+            bucket = int(np.log(price) / np.log(1 + PRICE_TOLERANCE))
+            for b in (bucket, bucket + 1):
+                blocks.setdefault(('spec', car.get('make'), car.get('model'), car.get('year'), b), []).append(i)
+    
+    uf = _UnionFind(n)
+    checked = set()
+    for key, members in blocks.items():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for x, i in enumerate(members):
+            for j in members[x + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if hamming(signatures[i], signatures[j]) <= SIMHASH_NEAR:
+                    uf.union(i, j)
+                    continue
+                a, b = car_details[i], car_details[j]
+                if not _price_close(a.get('price'), b.get('price')):
+                    continue
+                if phones[i] and phones[j]:
+                    # Both list contacts: only the same seller can be the same car
+                    if phones[i] & phones[j]:
+                        uf.union(i, j)
+                elif (a.get('make') and a.get('model') and a.get('year')
+                      and a.get('make') == b.get('make') and a.get('model') == b.get('model')
+                      and a.get('year') == b.get('year')):
+                    uf.union(i, j)
+    
+    roots = [uf.find(i) for i in range(n)]
+    sizes = {}
+    for root in roots:
+        sizes[root] = sizes.get(root, 0) + 1
+    for i, car in enumerate(car_details):
+        car['cluster_id'] = roots[i]
+        car['cluster_size'] = sizes[roots[i]]
+        car['is_primary'] = roots[i] == i
+    return len(sizes)
+
 # Parse car listing from JSON data
 def parse_car_from_json(result, use_ai=False):
     """Parse car listing primarily from JSON data"""
@@ -281,10 +825,10 @@ def parse_car_from_json(result, use_ai=False):
         # Combine title and content for parsing
         combined_text = f"{title} {content}"
         
-        # Extract details from JSON data
-        price = extract_kenyan_price(combined_text)
-        contacts = extract_kenyan_contacts(combined_text)
-        car_details = extract_kenyan_car_details(combined_text)
+        # Extract details from JSON data in one pass
+        car_details = extract_listing(combined_text)
+        price = car_details['price']
+        contacts = car_details
         
         car_info = {
             "title": title,
@@ -308,7 +852,6 @@ def parse_car_from_json(result, use_ai=False):
         # AI enhancement if available
         if use_ai:
             car_info = ai_enhance_car_analysis(car_info, combined_text)
-            car_info['ai_enhanced'] = True
         
         return car_info
         
@@ -327,113 +870,640 @@ def parse_car_from_json(result, use_ai=False):
             "error": str(e)
         }
 
+# ============== SEARCH RESULT CACHE ==============
+# Raw SearxNG results are cached on disk per (normalized query, site set,
+# count, pages, mode). Fresh entries are served as-is; stale ones are served
+# instantly while a background thread refetches them.
+
+SEARCH_CACHE_DIR = Path(tempfile.gettempdir()) / "smartrev_search_cache"
+SEARCH_CACHE_VERSION = 1
+SEARCH_CACHE_TTL = 15 * 60            # seconds an entry is considered fresh
+SEARCH_CACHE_MAX_STALE = 24 * 60 * 60  # older entries are refetched in the foreground
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+def search_cache_key(query, selected_sites, max_results, fan_out=True, pages=1):
+    sites = sorted(urlparse(site).netloc.lower() for site in selected_sites or [])
+    raw = json.dumps([SEARCH_CACHE_VERSION, normalize_query(query), sites, max_results, bool(fan_out), pages])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class SearchCache:
+    """Memory + disk JSON cache of search payloads with TTL and stale-while-revalidate"""
+    
+    def __init__(self, cache_dir=SEARCH_CACHE_DIR, ttl=SEARCH_CACHE_TTL, max_stale=SEARCH_CACHE_MAX_STALE):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.memory = {}
+        self.lock = threading.Lock()
+        self.revalidating = set()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search-revalidate")
+    
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, key):
+        """(payload, age_seconds) or (None, None)"""
+        with self.lock:
+            entry = self.memory.get(key)
+        if entry is None:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                with self.lock:
+                    self.memory[key] = entry
+            except (OSError, ValueError):
+                return None, None
+        return entry['payload'], time.time() - entry['stored_at']
+    
+    def put(self, key, payload):
+        entry = {'stored_at': time.time(), 'payload': payload}
+        with self.lock:
+            self.memory[key] = entry
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write search cache: {e}")
+    
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+    
+    def revalidate(self, key, fetch):
+        """Refetch in the background; at most one refresh per key in flight"""
+        with self.lock:
+            if key in self.revalidating:
+                return
+            self.revalidating.add(key)
+        
+        def run():
+            try:
+                payload = fetch()
+                if payload['results']:
+                    self.put(key, payload)
+            except Exception as e:
+                logger.warning(f"Background revalidation failed: {e}")
+            finally:
+                with self.lock:
+                    self.revalidating.discard(key)
+        
+        self.executor.submit(run)
+    
+    def get_or_fetch(self, key, fetch):
+        """Return (payload, status) where status is 'fresh', 'stale' or 'miss'"""
+        payload, age = self.get(key)
+        if payload is not None and age < self.ttl:
+            return payload, 'fresh'
+        if payload is not None and age < self.max_stale:
+            self.revalidate(key, fetch)
+            return payload, 'stale'
+        
+        payload = fetch()
+        # Never cache an outage: empty results with errors would pin a failure
+        if payload['results'] or not payload['errors']:
+            self.put(key, payload)
+        return payload, 'miss'
+
+@st.cache_resource
+def get_search_cache():
+    """One cache per process: module globals are rebuilt on every Streamlit rerun"""
+    return SearchCache()
+
+def fetch_search_results(query, selected_sites, max_results=10, fan_out=True, pages=1):
+    """Run the SearxNG search without touching the UI (safe from background threads)"""
+    if fan_out:
+        results, errors = fan_out_search(query, selected_sites, max_results, pages)
+        return {'results': results, 'errors': errors, 'query': query}
+    
+    # Build query - if no sites selected, just add Kenya
+    car_context = "car vehicles for sale"
+    if not selected_sites:
+        enhanced_query = f"{query} {car_context} Kenya"
+    else:
+        site_queries = " OR ".join([f"site:{urlparse(site).netloc}" for site in selected_sites])
+        enhanced_query = f"({query} {car_context}) ({site_queries})"
+    return {'results': searxng_query(enhanced_query, max_results), 'errors': [], 'query': enhanced_query}
+
+LIVE_BATCH_SIZE = 25
+LIVE_COLUMNS = ['site', 'title', 'price_display', 'make', 'model', 'year', 'phones', 'ai_enhanced']
+
+def live_table(car_details):
+    """Compact frame of parsed listings for the streaming results table"""
+    df = pd.DataFrame(car_details)
+    df.index += 1
+    return df.reindex(columns=LIVE_COLUMNS).reset_index(names='#')
+
 # Enhanced search function
-def search_kenyan_car_listings(query, selected_sites, max_results=10, use_ai=False):
+def search_kenyan_car_listings(query, selected_sites, max_results=10, use_ai=False, fan_out=True, pages=1, use_cache=True):
     """Search for car listings using JSON-first approach"""
     try:
-        # Build query - if no sites selected, just add Kenya
-        car_context = "car vehicles for sale"
-        
-        if not selected_sites:
-            enhanced_query = f"{query} {car_context} Kenya"
+        if fan_out:
+            st.info(f"🔍 Fan-out search: {len(build_search_queries(query, selected_sites, pages))} concurrent queries...")
+        elif not selected_sites:
             st.info("🔍 Searching across Kenya...")
         else:
-            site_queries = " OR ".join([f"site:{urlparse(site).netloc}" for site in selected_sites])
-            enhanced_query = f"({query} {car_context}) ({site_queries})"
             st.info(f"🔍 Searching {len(selected_sites)} selected sites...")
         
-        # Show the actual query being sent
-        st.write(f"**🔍 Search Query:** `{enhanced_query}`")
+        def fetch():
+            return fetch_search_results(query, selected_sites, max_results, fan_out, pages)
         
-        params = {"q": enhanced_query, "format": "json", "count": max_results}
-        response = requests.get(SEARXNG_URL, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get("results", [])
+        start = time.time()
+        if use_cache:
+            key = search_cache_key(query, selected_sites, max_results, fan_out, pages)
+            payload, status = get_search_cache().get_or_fetch(key, fetch)
+        else:
+            payload, status = fetch(), 'miss'
+        results = payload['results']
+        
+        if status == 'fresh':
+            st.caption(f"⚡ Served from cache in {time.time() - start:.2f}s")
+        elif status == 'stale':
+            st.caption(f"⚡ Served cached results in {time.time() - start:.2f}s, refreshing in the background")
+        else:
+            st.write(f"**⏱️ Search time:** {time.time() - start:.1f}s")
+        
+        if not fan_out:
+            # Show the actual query being sent
+            st.write(f"**🔍 Search Query:** `{payload['query']}`")
+        for error in payload['errors']:
+            st.warning(f"Query failed: {error}")
         
         # Show raw results count
         st.write(f"**📦 Raw Results Found:** {len(results)}")
 
+        # Parsed rows stream into one table placeholder in batches; raw JSON is
+        # kept for the on-demand inspector instead of one expander per result
+        st.session_state.raw_results = results
+        st.subheader("🔄 Live Processing")
+        progress = st.progress(0.0, text="Parsing listings...")
+        table = st.empty()
+        
         car_details = []
+        for start_idx in range(0, len(results), LIVE_BATCH_SIZE):
+            batch = results[start_idx:start_idx + LIVE_BATCH_SIZE]
+            car_details.extend(parse_car_from_json(result, use_ai=False) for result in batch)
+            progress.progress(len(car_details) / len(results), text=f"Parsed {len(car_details)}/{len(results)} listings")
+            table.dataframe(live_table(car_details), use_container_width=True, hide_index=True)
         
-        # Create container for live results
-        results_container = st.container()
-        
-        with results_container:
-            st.subheader("🔄 Live Processing")
-            
-            for i, result in enumerate(results):
-                # Show raw result immediately
-                with st.expander(f"📦 Raw Result {i+1}", expanded=False):
-                    st.json(result)
-                
-                # Parse the result
-                with st.spinner(f"Parsing result {i+1}..."):
-                    car_info = parse_car_from_json(result, use_ai)
-                
-                if car_info:
-                    car_details.append(car_info)
-                    
-                    # Show parsed result
-                    with st.expander(f"✅ Parsed: {car_info['title'][:50]}...", expanded=False):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"**Site:** {car_info['site']}")
-                            st.write(f"**Price:** {car_info['price_display']}")
-                            st.write(f"**Make/Model:** {car_info['make']} {car_info['model']}")
-                        with col2:
-                            st.write(f"**Contacts:** {car_info['phones']}")
-                            if car_info.get('ai_enhanced'):
-                                st.success("🤖 AI Enhanced")
-                
-                st.markdown("---")
+        if use_ai and get_groq_client():
+            progress.progress(1.0, text=f"🤖 AI enhancing {len(car_details)} listings...")
+            texts = [f"{r.get('title', '')} {r.get('content', r.get('snippet', ''))}" for r in results]
+            car_details, ai_stats = enrich_listings(car_details, texts)
+            table.dataframe(live_table(car_details), use_container_width=True, hide_index=True)
+            st.caption(f"🤖 AI: {ai_stats['cached']} cached, {ai_stats['calls']} batched calls"
+                       + (f", {ai_stats['failed']} failed" if ai_stats['failed'] else ""))
+        progress.empty()
         
+        car_details = [c for c in car_details if c]
+        unique = assign_duplicate_clusters(car_details)
+        if unique < len(car_details):
+            st.caption(f"🧬 {len(car_details) - unique} cross-posted duplicates grouped into {unique} unique vehicles")
         return car_details
 
     except Exception as e:
         st.error(f"Search error: {str(e)}")
         return []
 
+# ============== PRICE ANALYTICS ==============
+# Column-wise pandas/NumPy over the listing frame: segment statistics come
+# from groupby aggregations and transforms, never from per-row Python, so the
+# same code serves one search or the whole listing store.
+
+SEGMENT_COLUMNS = ['make', 'model', 'year', 'fuel_type', 'transmission', 'site']
+PERCENTILES = [0.10, 0.25, 0.50, 0.75, 0.90]
+MIN_SEGMENT_SIZE = 3      # smaller segments fall back to a broader one for deal scores
+IQR_FACTOR = 1.5
+
+def price_frame(listings):
+    """Priced listings as a DataFrame, one row per vehicle when duplicate clusters are known"""
+    df = listings if isinstance(listings, pd.DataFrame) else pd.DataFrame(listings)
+    if df.empty or 'price' not in df:
+        return df.iloc[0:0]
+    df = df.copy()
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    if 'cluster_id' in df:
+        # One price per physical car: cross-posts of a vehicle count once
+        df['price'] = df.groupby('cluster_id')['price'].transform('median')
+        df = df.drop_duplicates('cluster_id')
+    df = df[df['price'] > 0]
+    for col in SEGMENT_COLUMNS:
+        if col not in df:
+            df[col] = None
+    df['year'] = pd.to_numeric(df['year'], errors='coerce')
+    return df
+
+def segment_stats(df, by=('make', 'model')):
+    """Count, mean and percentiles of price per segment"""
+    by = list(by)
+    grouped = df.groupby(by, dropna=False)['price']
+    stats = grouped.agg(['count', 'mean', 'std'])
+    quantiles = grouped.quantile(PERCENTILES).unstack()
+    quantiles.columns = [f"p{int(q * 100)}" for q in quantiles.columns]
+    stats = stats.join(quantiles)
+    stats['iqr'] = stats['p75'] - stats['p25']
+    return stats.reset_index().sort_values('count', ascending=False)
+
+def flag_outliers(df, by=('make', 'model')):
+    """Boolean Series: price outside [Q1 - 1.5 IQR, Q3 + 1.5 IQR] of its segment"""
+    grouped = df.groupby(list(by), dropna=False)['price']
+    q1 = grouped.transform('quantile', 0.25)
+    q3 = grouped.transform('quantile', 0.75)
+    iqr = q3 - q1
+    large_enough = grouped.transform('count') >= 4
+    return large_enough & ((df['price'] < q1 - IQR_FACTOR * iqr) | (df['price'] > q3 + IQR_FACTOR * iqr))
+
+def deal_scores(df, levels=(('make', 'model', 'year'), ('make', 'model'), ('make',))):
+    """(segment_median, deal_score) per listing; score is % below the segment median
+    
+    Each listing is compared against the most specific segment with at least
+    MIN_SEGMENT_SIZE listings, falling back to the overall median.
+    """
+    median = pd.Series(df['price'].median(), index=df.index)
+    resolved = pd.Series(False, index=df.index)
+    for level in levels:
+        grouped = df.groupby(list(level), dropna=False)['price']
+        usable = (grouped.transform('count') >= MIN_SEGMENT_SIZE) & ~resolved & df[list(level)].notna().all(axis=1)
+        median = median.where(~usable, grouped.transform('median'))
+        resolved |= usable
+    score = (median - df['price']) / median * 100
+    return median, score.round(1)
+
+def depreciation_curves(df, min_points=3):
+    """(curve, rates): median price by make/model/year, and a log-linear annual depreciation rate per model
+    
+    The rate fit is a least-squares slope of log(median price) against year,
+    computed from grouped sums rather than one regression per model.
+    """
+    dated = df[df['year'].notna() & df['make'].notna()]
+    curve = (dated.groupby(['make', 'model', 'year'], dropna=False)['price']
+             .agg(['median', 'count']).reset_index())
+    
+    pts = curve.assign(x=curve['year'].astype(float), y=np.log(curve['median']))
+    pts = pts.assign(xy=pts['x'] * pts['y'], xx=pts['x'] ** 2)
+    sums = pts.groupby(['make', 'model'], dropna=False)[['x', 'y', 'xy', 'xx']].sum()
+    n = pts.groupby(['make', 'model'], dropna=False).size()
+    denom = n * sums['xx'] - sums['x'] ** 2
+    slope = (n * sums['xy'] - sums['x'] * sums['y']) / denom.where(denom != 0)
+    rates = pd.DataFrame({
+        'years_covered': n,
+        'annual_depreciation_pct': ((1 - np.exp(-slope)) * 100).round(1)
+    })[n >= min_points].reset_index()
+    return curve, rates.sort_values('years_covered', ascending=False)
+
+def analyze_listings(listings, segment_by=('make', 'model')):
+    """Listing frame annotated with outlier flag and deal score, plus segment and depreciation tables"""
+    df = price_frame(listings)
+    if df.empty:
+        return None
+    df['is_outlier'] = flag_outliers(df, segment_by)
+    clean = df[~df['is_outlier']]
+    df['segment_median'], df['deal_score'] = deal_scores(df)
+    curve, rates = depreciation_curves(clean)
+    return {
+        'listings': df,
+        'segments': segment_stats(clean, segment_by),
+        'depreciation': curve,
+        'depreciation_rates': rates,
+    }
+
 # Price analysis and visualization
 def create_price_analysis(car_details):
     """Create comprehensive price analysis and visualizations"""
     if not car_details:
         return None
     
-    df = pd.DataFrame(car_details)
-    valid_prices = df[df['price'].notna()]
-    
-    if len(valid_prices) == 0:
+    clusters = {c.get('cluster_id', i) for i, c in enumerate(car_details)}
+    df = price_frame(car_details)
+    if len(df) == 0:
         return None
     
+    prices = df['price']
+    quantiles = prices.quantile(PERCENTILES)
     analysis = {
-        'average_price': valid_prices['price'].mean(),
-        'median_price': valid_prices['price'].median(),
-        'min_price': valid_prices['price'].min(),
-        'max_price': valid_prices['price'].max(),
+        'average_price': prices.mean(),
+        'median_price': quantiles[0.5],
+        'min_price': prices.min(),
+        'max_price': prices.max(),
+        'p10': quantiles[0.1],
+        'p25': quantiles[0.25],
+        'p75': quantiles[0.75],
+        'p90': quantiles[0.9],
         'total_listings': len(car_details),
-        'priced_listings': len(valid_prices),
-        'price_std': valid_prices['price'].std()
+        'unique_vehicles': len(clusters),
+        'priced_listings': len(df),
+        'outliers': int(flag_outliers(df).sum()),
+        'price_std': prices.std()
     }
     
     return analysis
 
-# Instance health check
-def check_instance_health():
-    """Check if SearxNG instance is ready"""
-    with st.spinner("🔄 Starting SmartRev search engine... (4 seconds)"):
-        start_time = time.time()
+def benchmark_analytics(n=100_000):
+    """Time analyze_listings on n synthetic listings"""
+    rng = np.random.default_rng(0)
+    makes = ['Toyota', 'Nissan', 'Subaru', 'Mazda', 'Honda', 'Mitsubishi']
+    models = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+    year = rng.integers(2005, 2024, n)
+    df = pd.DataFrame({
+        'make': rng.choice(makes, n),
+        'model': rng.choice(models, n),
+        'year': year,
+        'fuel_type': rng.choice(['Petrol', 'Diesel', 'Hybrid', None], n),
+        'transmission': rng.choice(['Automatic', 'Manual'], n),
+        'site': rng.choice(list(KENYAN_SITES), n),
+        'price': np.round(3_000_000 * 0.9 ** (2024 - year) * rng.lognormal(0, 0.25, n), -3),
+    })
+    start = time.perf_counter()
+    result = analyze_listings(df)
+    elapsed = time.perf_counter() - start
+    print(f"{n:,} listings analyzed in {elapsed:.2f}s; "
+          f"{len(result['segments'])} segments, {int(result['listings']['is_outlier'].sum())} outliers")
+    print(result['depreciation_rates'].head())
+
+# ============== LISTING STORE ==============
+# Every search result is upserted into a local SQLite database keyed by
+# canonical URL, with first/last-seen timestamps and a price history row
+# whenever the asking price changes. Market analytics are SQL aggregates over
+# everything collected so far rather than over the latest search only.
+
+LISTING_DB_PATH = Path(__file__).with_name("smartrev_listings.db")
+
+LISTING_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    url_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT,
+    site TEXT,
+    make TEXT,
+    model TEXT,
+    year INTEGER,
+    fuel_type TEXT,
+    transmission TEXT,
+    condition TEXT,
+    price REAL,
+    phones TEXT,
+    emails TEXT,
+    description TEXT,
+    last_query TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    times_seen INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS price_history (
+    url_key TEXT NOT NULL REFERENCES listings(url_key),
+    price REAL NOT NULL,
+    observed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_listings_make_model_year ON listings(make, model, year);
+CREATE INDEX IF NOT EXISTS idx_listings_site ON listings(site);
+CREATE INDEX IF NOT EXISTS idx_listings_last_seen ON listings(last_seen);
+CREATE INDEX IF NOT EXISTS idx_price_history_url ON price_history(url_key, observed_at);
+"""
+
+LISTING_COLUMNS = ['title', 'site', 'make', 'model', 'year', 'fuel_type', 'transmission',
+                   'condition', 'price', 'phones', 'emails', 'description']
+
+class ListingStore:
+    """SQLite store of every listing seen, with per-listing price history"""
+    
+    def __init__(self, path=LISTING_DB_PATH):
+        self.path = str(path)
+        with self._connect() as conn:
+            conn.executescript(LISTING_SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation: Streamlit reruns on new threads.
+        # sqlite3's own context manager only commits, so close explicitly.
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def upsert_listings(self, car_details, query=None):
+        """Insert new listings, refresh known ones; returns {'new', 'updated', 'price_changes'}"""
+        now = time.time()
+        rows = {}
+        for car in car_details:
+            if not car or not car.get('url') or car.get('error'):
+                continue
+            row = {col: car.get(col) for col in LISTING_COLUMNS}
+            for col in ('phones', 'emails'):
+                if row[col] == "Not provided":
+                    row[col] = None
+            row.update(url_key=canonical_url(car['url']), url=car['url'], last_query=query, now=now)
+            rows[row['url_key']] = row
         
-        for i in range(4):
-            try:
-                response = requests.get(SEARXNG_URL, timeout=1)
-                if response.status_code == 200:
-                    return True
-            except:
-                pass
-            time.sleep(1 - (time.time() - start_time) % 1)
+        stats = {'new': 0, 'updated': 0, 'price_changes': 0}
+        if not rows:
+            return stats
+        
+        with self._connect() as conn:
+            placeholders = ",".join("?" * len(rows))
+            known = dict(conn.execute(
+                f"SELECT url_key, price FROM listings WHERE url_key IN ({placeholders})", list(rows)
+            ).fetchall())
+            
+            conn.executemany(f"""
+                INSERT INTO listings (url_key, url, last_query, first_seen, last_seen, {", ".join(LISTING_COLUMNS)})
+                VALUES (:url_key, :url, :last_query, :now, :now, {", ".join(":" + c for c in LISTING_COLUMNS)})
+                ON CONFLICT(url_key) DO UPDATE SET
+                    url = excluded.url,
+                    last_query = COALESCE(excluded.last_query, last_query),
+                    last_seen = excluded.last_seen,
+                    times_seen = times_seen + 1,
+                    {", ".join(f"{c} = COALESCE(excluded.{c}, {c})" for c in LISTING_COLUMNS)}
+            """, list(rows.values()))
+            
+            history = []
+            for key, row in rows.items():
+                if key not in known:
+                    stats['new'] += 1
+                else:
+                    stats['updated'] += 1
+                if row['price'] is not None and known.get(key) != row['price']:
+                    history.append((key, row['price'], now))
+                    if key in known and known[key] is not None:
+                        stats['price_changes'] += 1
+            conn.executemany("INSERT INTO price_history (url_key, price, observed_at) VALUES (?, ?, ?)", history)
         
-        return True
+        return stats
+    
+    @staticmethod
+    def _filters(make=None, model=None, year_min=None, year_max=None, site=None, since_days=None):
+        clauses, params = ["price IS NOT NULL"], []
+        for column, value in (('make', make), ('model', model), ('site', site)):
+            if value:
+                clauses.append(f"{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if year_min:
+            clauses.append("year >= ?")
+            params.append(year_min)
+        if year_max:
+            clauses.append("year <= ?")
+            params.append(year_max)
+        if since_days:
+            clauses.append("last_seen >= ?")
+            params.append(time.time() - since_days * 86400)
+        return " AND ".join(clauses), params
+    
+    def price_analysis(self, **filters):
+        """Same keys as create_price_analysis, computed in SQL over all stored listings"""
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+            n, avg, lo, hi, var = conn.execute(f"""
+                SELECT COUNT(*), AVG(price), MIN(price), MAX(price),
+                       AVG(price * price) - AVG(price) * AVG(price)
+                FROM listings WHERE {where}
+            """, params).fetchone()
+            if not n:
+                return None
+            median = conn.execute(f"""
+                SELECT AVG(price) FROM (
+                    SELECT price FROM listings WHERE {where}
+                    ORDER BY price LIMIT 2 - ? % 2 OFFSET (? - 1) / 2
+                )
+            """, params + [n, n]).fetchone()[0]
+        return {
+            'average_price': avg,
+            'median_price': median,
+            'min_price': lo,
+            'max_price': hi,
+            'total_listings': total,
+            'priced_listings': n,
+            'price_std': (max(var, 0) * n / (n - 1)) ** 0.5 if n > 1 else None
+        }
+    
+    def market_summary(self, group_by=('make', 'model', 'year'), min_listings=1, **filters):
+        """Per-group count/avg/min/max asking price as a DataFrame"""
+        columns = ", ".join(c for c in group_by if c in ('make', 'model', 'year', 'site', 'fuel_type', 'transmission', 'condition'))
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            return pd.read_sql_query(f"""
+                SELECT {columns}, COUNT(*) AS listings, AVG(price) AS avg_price,
+                       MIN(price) AS min_price, MAX(price) AS max_price,
+                       datetime(MAX(last_seen), 'unixepoch') AS last_seen
+                FROM listings WHERE {where}
+                GROUP BY {columns} HAVING COUNT(*) >= ?
+                ORDER BY listings DESC
+            """, conn, params=params + [min_listings])
+    
+    def price_changes(self, limit=50, **filters):
+        """Listings whose asking price changed, with first and latest observed price"""
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            return pd.read_sql_query(f"""
+                SELECT l.title, l.site, l.url, l.make, l.model, l.year,
+                       h.first_price, l.price AS current_price, h.observations,
+                       datetime(l.first_seen, 'unixepoch') AS first_seen
+                FROM listings l
+                JOIN (
+                    SELECT url_key, COUNT(*) AS observations,
+                           (SELECT price FROM price_history p2 WHERE p2.url_key = p.url_key
+                            ORDER BY observed_at LIMIT 1) AS first_price
+                    FROM price_history p GROUP BY url_key HAVING COUNT(*) > 1
+                ) h ON h.url_key = l.url_key
+                WHERE {where}
+                ORDER BY l.last_seen DESC LIMIT ?
+            """, conn, params=params + [limit])
+    
+    def load_frame(self, **filters):
+        """Priced stored listings as a DataFrame for analyze_listings"""
+        where, params = self._filters(**filters)
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                f"SELECT url, title, {', '.join(SEGMENT_COLUMNS)}, price, last_seen FROM listings WHERE {where}",
+                conn, params=params
+            )
+    
+    def price_history(self, url):
+        with self._connect() as conn:
+            return pd.read_sql_query("""
+                SELECT datetime(observed_at, 'unixepoch') AS observed_at, price
+                FROM price_history WHERE url_key = ? ORDER BY observed_at
+            """, conn, params=[canonical_url(url)])
+
+@st.cache_resource
+def get_listing_store():
+    return ListingStore()
+
+def show_segment_analytics(analytics, key="search"):
+    """Segment breakdown, depreciation curve and best deals"""
+    with st.expander("🔬 Segment Analytics", expanded=False):
+        segment_by = st.multiselect("Segment by", SEGMENT_COLUMNS, default=['make', 'model'], key=f"segment_by_{key}")
+        listings = analytics['listings']
+        if segment_by:
+            st.dataframe(segment_stats(listings[~listings['is_outlier']], segment_by).round(0), use_container_width=True)
+        
+        curve = analytics['depreciation']
+        if len(curve) > 1:
+            curve = curve.assign(vehicle=curve['make'].fillna('') + ' ' + curve['model'].fillna(''))
+            fig = px.line(curve.sort_values('year'), x='year', y='median', color='vehicle', markers=True,
+                          labels={'median': 'Median price (KSh)', 'year': 'Year'}, title="Price by model year")
+            st.plotly_chart(fig, use_container_width=True, key=f"depreciation_{key}")
+        if len(analytics['depreciation_rates']):
+            st.write("**Annual depreciation:**")
+            st.dataframe(analytics['depreciation_rates'], use_container_width=True)
+        
+        st.write("**Best deals vs segment median:**")
+        deals = listings[~listings['is_outlier']].nlargest(10, 'deal_score')
+        st.dataframe(
+            deals[['title', 'site', 'make', 'model', 'year', 'price', 'segment_median', 'deal_score']],
+            use_container_width=True,
+            column_config={"deal_score": st.column_config.NumberColumn("Deal score", format="%.1f%%",
+                                                                        help="% below the segment median price")}
+        )
+
+# Instance health check
+# The SearxNG host sleeps when idle; probes run on a daemon thread so the page
+# renders immediately while the instance wakes up.
+HEALTH_PROBES = 4
+HEALTH_RECHECK_SECONDS = 60
+
+@st.cache_resource
+def get_instance_health():
+    """Probe state shared across reruns and sessions: (status dict, lock)"""
+    return {'status': 'unknown', 'checked_at': None, 'latency': None}, threading.Lock()
+
+def _probe_instance(health, lock):
+    for i in range(HEALTH_PROBES):
+        start = time.time()
+        try:
+            response = http_session.get(SEARXNG_URL, timeout=1 + i)
+            if response.status_code == 200:
+                with lock:
+                    health.update(status='ready', checked_at=time.time(), latency=time.time() - start)
+                return
+        except Exception:
+            pass
+        time.sleep(max(0, 1 - (time.time() - start)))
+    with lock:
+        health.update(status='unreachable', checked_at=time.time(), latency=None)
+
+def check_instance_health():
+    """Start a background probe of the SearxNG instance unless one is running or recent"""
+    health, lock = get_instance_health()
+    with lock:
+        recent = health['checked_at'] and time.time() - health['checked_at'] < HEALTH_RECHECK_SECONDS
+        if health['status'] == 'checking' or (recent and health['status'] == 'ready'):
+            return dict(health)
+        health['status'] = 'checking'
+        snapshot = dict(health)
+    threading.Thread(target=_probe_instance, args=(health, lock), daemon=True, name="searxng-health").start()
+    return snapshot
 
 # Streamlit app
 def main():
@@ -447,10 +1517,8 @@ def main():
     st.title("🚗 SmartRev - Kenya Car Finder")
     st.markdown("**Find and analyze car listings across Kenyan websites**")
     
-    # Instance health check on load
-    if 'instance_ready' not in st.session_state:
-        check_instance_health()
-        st.session_state.instance_ready = True
+    # Instance health check runs in the background
+    health = check_instance_health()
     
     # Sidebar configuration
     with st.sidebar:
@@ -473,6 +1541,30 @@ def main():
                 if st.checkbox(site_name, value=False, key=f"site_{site_name}"):
                     selected_sites.append(site_url)
         
+        st.subheader("⚡ Search Mode")
+        fan_out = st.checkbox(
+            "Parallel fan-out search",
+            value=True,
+            help="One concurrent query per site/page, merged and de-duplicated by URL"
+        )
+        pages = st.slider("Result pages per site", 1, 3, 1, disabled=not fan_out)
+        
+        use_cache = st.checkbox(
+            "Use cached results",
+            value=True,
+            help=f"Reuse results for up to {SEARCH_CACHE_TTL // 60} min; older results are shown instantly and refreshed in the background"
+        )
+        if st.button("🗑️ Clear search cache"):
+            get_search_cache().clear()
+            st.success("Search cache cleared")
+        
+        if health['status'] == 'ready':
+            st.caption(f"🟢 Search engine ready ({health['latency']:.1f}s)")
+        elif health['status'] == 'unreachable':
+            st.caption("🔴 Search engine not responding - searches may be slow")
+        else:
+            st.caption("🟡 Waking search engine...")
+        
         st.subheader("🤖 AI Enhancement")
         use_ai = st.checkbox(
             "Enable AI Data Enhancement", 
@@ -525,8 +1617,28 @@ def main():
     if search_clicked and query:
         with st.spinner("Searching Kenyan car listings..."):
             car_details = search_kenyan_car_listings(
-                query, selected_sites, max_results=15, use_ai=st.session_state.use_ai_enhancement
+                query, selected_sites, max_results=15, use_ai=st.session_state.use_ai_enhancement,
+                fan_out=fan_out, pages=pages, use_cache=use_cache
             )
+        st.session_state.search_results = {'query': query, 'car_details': car_details}
+        
+        if car_details:
+            try:
+                store_stats = get_listing_store().upsert_listings(car_details, query)
+                st.caption(f"🗄️ Saved to listing store: {store_stats['new']} new, {store_stats['updated']} seen before, "
+                           f"{store_stats['price_changes']} price changes")
+            except sqlite3.Error as e:
+                logger.warning(f"Listing store update failed: {e}")
+    
+    elif not query and search_clicked:
+        st.warning("Please enter your search query")
+    
+    # Results live in session state so filters and the raw inspector survive reruns
+    search_results = st.session_state.get('search_results')
+    if search_results:
+        query = search_results['query']
+        car_details = search_results['car_details']
+        store = get_listing_store()
         
         if not car_details:
             st.warning("""
@@ -549,7 +1661,10 @@ def main():
             
             with col1:
                 total_listings = len(car_details)
-                st.metric("Total Listings", total_listings)
+                unique_vehicles = df['cluster_id'].nunique() if 'cluster_id' in df else total_listings
+                st.metric("Total Listings", total_listings,
+                          delta=f"{unique_vehicles} unique" if unique_vehicles < total_listings else None,
+                          delta_color="off")
             
             with col2:
                 priced_listings = len([c for c in car_details if c['price']])
@@ -586,13 +1701,20 @@ def main():
                     st.metric("Price Range", f"KSh {price_analysis['min_price']:,.0f} - {price_analysis['max_price']:,.0f}")
                 
                 with col4:
-                    st.metric("Listings Priced", f"{price_analysis['priced_listings']}/{price_analysis['total_listings']}")
+                    st.metric("Vehicles Priced", f"{price_analysis['priced_listings']}/{price_analysis['unique_vehicles']}")
+                
+                st.caption(f"Middle 50%: KSh {price_analysis['p25']:,.0f} - {price_analysis['p75']:,.0f} · "
+                           f"{price_analysis['outliers']} price outliers")
+                
+                analytics = analyze_listings(car_details)
+                if analytics:
+                    show_segment_analytics(analytics)
             
             # Results tabs
-            tab1, tab2 = st.tabs(["📋 Final Results", "💾 Export Data"])
+            tab1, tab2, tab3, tab4 = st.tabs(["📋 Final Results", "💾 Export Data", "📈 Market History", "🧾 Raw JSON"])
             
             with tab1:
-                display_columns = ['site', 'title', 'price_display', 'make', 'model', 'year']
+                display_columns = ['site', 'title', 'price_display', 'make', 'model', 'year', 'cluster_size']
                 display_df = df[display_columns].copy()
                 
                 st.dataframe(
@@ -600,7 +1722,8 @@ def main():
                     use_container_width=True,
                     column_config={
                         "price_display": st.column_config.TextColumn("Price (KSh)"),
-                        "site": st.column_config.TextColumn("Website")
+                        "site": st.column_config.TextColumn("Website"),
+                        "cluster_size": st.column_config.NumberColumn("Posts", help="Listings of the same vehicle across sites")
                     }
                 )
             
@@ -622,9 +1745,63 @@ def main():
                 
                 st.write("**Sample data:**")
                 st.dataframe(export_df.head(3))
-    
-    elif not query and search_clicked:
-        st.warning("Please enter your search query")
+            
+            with tab3:
+                st.subheader("📈 Market History")
+                
+                # Default the filter to the make/model this search was mostly about
+                top = df.dropna(subset=['make']).groupby(['make', 'model'], dropna=False).size()
+                top_make, top_model = top.idxmax() if len(top) else (None, None)
+                # Make-only groups carry NaN as the model, and NaN is truthy
+                top_make = "" if pd.isna(top_make) else top_make
+                top_model = "" if pd.isna(top_model) else top_model
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    hist_make = st.text_input("Make", value=top_make, key="hist_make")
+                with col2:
+                    hist_model = st.text_input("Model", value=top_model, key="hist_model")
+                with col3:
+                    since_days = st.selectbox("Seen within", [7, 30, 90, 365, None], index=2,
+                                              format_func=lambda d: f"{d} days" if d else "All time")
+                
+                filters = dict(make=hist_make or None, model=hist_model or None, since_days=since_days)
+                stored = store.price_analysis(**filters)
+                if stored:
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Average Price", f"KSh {stored['average_price']:,.0f}")
+                    with col2:
+                        st.metric("Median Price", f"KSh {stored['median_price']:,.0f}")
+                    with col3:
+                        st.metric("Price Range", f"KSh {stored['min_price']:,.0f} - {stored['max_price']:,.0f}")
+                    with col4:
+                        st.metric("Priced Listings", f"{stored['priced_listings']} of {stored['total_listings']} stored")
+                    
+                    st.write("**By make / model / year:**")
+                    st.dataframe(store.market_summary(**filters), use_container_width=True)
+                    
+                    stored_analytics = analyze_listings(store.load_frame(**filters))
+                    if stored_analytics:
+                        show_segment_analytics(stored_analytics, key="stored")
+                    
+                    changes = store.price_changes(**filters)
+                    if len(changes):
+                        st.write("**Price changes:**")
+                        st.dataframe(changes, use_container_width=True)
+                else:
+                    st.info("No stored listings match these filters yet")
+            
+            with tab4:
+                raw_results = st.session_state.get('raw_results', [])
+                if raw_results:
+                    idx = st.number_input("Result #", min_value=1, max_value=len(raw_results), value=1, step=1)
+                    st.json(raw_results[idx - 1])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if "--bench-extract" in sys.argv:
+        benchmark_extraction()
+    elif "--bench-analytics" in sys.argv:
+        benchmark_analytics()
+    else:
+        main()
\ No newline at end of file
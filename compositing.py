@@ -0,0 +1,203 @@
+"""
+Alpha compositing primitives shared by the renderers (ppt.py, polo.py, tk_combined.py).
+
+All blends are in-place "over" operations on uint8 frames using integer
+math (uint16 temporaries, exact rounding division by 255), clipped to the
+destination so sprites may hang off any edge.
+
+Run `python compositing.py` for a benchmark against the float code paths
+these helpers replaced.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def _div255(x: np.ndarray) -> np.ndarray:
+    """Rounded x / 255 for x in [0, 255*255], in place on a uint16 array."""
+    x += 128
+    x += x >> 8
+    x >>= 8
+    return x
+
+
+def clip_roi(dst_shape, src_shape, x: int, y: int) -> Optional[Tuple[tuple, tuple]]:
+    """Intersect a (src_h, src_w) sprite placed at (x, y) with the destination.
+
+    Returns (dst_slices, src_slices) or None when nothing overlaps.
+    """
+    dst_h, dst_w = dst_shape[:2]
+    src_h, src_w = src_shape[:2]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + src_w, dst_w), min(y + src_h, dst_h)
+    if x0 >= x1 or y0 >= y1:
+        return None
+
+    dst_sl = (slice(y0, y1), slice(x0, x1))
+    src_sl = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+    return dst_sl, src_sl
+
+
+def premultiply(rgba: np.ndarray) -> np.ndarray:
+    """Straight-alpha RGBA uint8 -> premultiplied RGBA uint8 (new array)."""
+    out = np.empty_like(rgba)
+    tmp = rgba[:, :, :3].astype(np.uint16)
+    tmp *= rgba[:, :, 3:4]
+    out[:, :, :3] = _div255(tmp)
+    out[:, :, 3] = rgba[:, :, 3]
+    return out
+
+
+def scale_alpha(rgba: np.ndarray, opacity: float, premultiplied: bool = False) -> np.ndarray:
+    """Return a copy of rgba with its opacity multiplied by `opacity` (0..1)."""
+    op = int(round(max(0.0, min(1.0, opacity)) * 255))
+    tmp = rgba.astype(np.uint16) if premultiplied else rgba[:, :, 3].astype(np.uint16)
+    tmp *= op
+    if premultiplied:
+        return _div255(tmp).astype(np.uint8)
+    out = rgba.copy()
+    out[:, :, 3] = _div255(tmp)
+    return out
+
+
+def crop_to_alpha(rgba: np.ndarray) -> Tuple[np.ndarray, int, int]:
+    """Trim fully transparent borders; returns (view, x, y) so full-canvas layers blend only their content."""
+    alpha = rgba[:, :, 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not len(rows):
+        return rgba[:0, :0], 0, 0
+    cols = np.flatnonzero(alpha.any(axis=0))
+    y0, y1 = rows[0], rows[-1] + 1
+    x0, x1 = cols[0], cols[-1] + 1
+    return rgba[y0:y1, x0:x1], int(x0), int(y0)
+
+
+@dataclass
+class Sprite:
+    """Premultiplied RGBA pixels, ready to be blended repeatedly."""
+    pixels: np.ndarray
+
+    @classmethod
+    def from_rgba(cls, rgba: np.ndarray) -> "Sprite":
+        return cls(premultiply(np.ascontiguousarray(rgba, dtype=np.uint8)))
+
+    @classmethod
+    def from_image(cls, img) -> "Sprite":
+        """Build from a PIL image (converted to RGBA)."""
+        return cls.from_rgba(np.asarray(img.convert("RGBA")))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.pixels.shape[1], self.pixels.shape[0]
+
+
+def blend_over(dst: np.ndarray, src, x: int = 0, y: int = 0,
+               opacity: float = 1.0, premultiplied: bool = True) -> np.ndarray:
+    """Composite src over dst in place at (x, y) and return dst.
+
+    dst: uint8 HxWx3 or HxWx4 frame. A 4-channel dst keeps accumulating
+        coverage in its alpha channel (a = a_s + a_d * (1 - a_s)).
+    src: Sprite, or uint8 HxWx4 array (premultiplied unless premultiplied=False).
+    opacity: extra multiplier applied to the whole sprite.
+    """
+    if isinstance(src, Sprite):
+        src, premultiplied = src.pixels, True
+
+    roi = clip_roi(dst.shape, src.shape, x, y)
+    if roi is None or opacity <= 0:
+        return dst
+    dst_sl, src_sl = roi
+
+    s = src[src_sl]
+    d = dst[dst_sl]
+    channels = d.shape[2]
+
+    op = int(round(min(1.0, opacity) * 255))
+    alpha = s[:, :, 3:4].astype(np.uint16)
+
+    color = s[:, :, :3].astype(np.uint16)
+    if op < 255:
+        alpha *= op
+        _div255(alpha)
+        if premultiplied:
+            color *= op
+            _div255(color)
+    if not premultiplied:
+        color *= alpha
+        _div255(color)
+
+    inv = 255 - alpha
+    rest = d[:, :, :3].astype(np.uint16)
+    rest *= inv
+    _div255(rest)
+    rest += color
+    d[:, :, :3] = rest
+
+    if channels == 4:
+        a = d[:, :, 3:4].astype(np.uint16)
+        a *= inv
+        _div255(a)
+        a += alpha
+        d[:, :, 3:4] = a
+
+    return dst
+
+
+# ============== BENCHMARK ==============
+
+def _float_roi_blend(frame, rgba, x, y):
+    """ppt.render_frame text path before this module."""
+    h, w = rgba.shape[:2]
+    alpha = rgba[:, :, 3:4].astype(np.float32) / 255.0
+    rgb_layer = rgba[:, :, :3].astype(np.float32)
+    roi = frame[y:y + h, x:x + w].astype(np.float32)
+    frame[y:y + h, x:x + w] = (rgb_layer * alpha + roi * (1 - alpha)).astype(np.uint8)
+
+
+def _float_full_frame_blend(canvas, layer):
+    """polo.PolotnoRenderer path before this module (full-frame float64)."""
+    alpha = layer[:, :, 3:4] / 255.0
+    return (layer * alpha + canvas * (1 - alpha)).astype(np.uint8)
+
+
+def benchmark(width: int = 1920, height: int = 1080, repeats: int = 20):
+    import time
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    frame4 = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    text = rng.integers(0, 256, (200, 800, 4), dtype=np.uint8)
+    layer = np.zeros((height, width, 4), dtype=np.uint8)
+    layer[100:300, 200:1000] = text[:, :800]
+    logo = rng.integers(0, 256, (500, 500, 4), dtype=np.uint8)
+    logo_sprite = Sprite.from_rgba(logo)
+
+    def timeit(fn):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (time.perf_counter() - start) / repeats * 1000
+
+    cases = [
+        ("text ROI 800x200 (ppt)",
+         lambda: _float_roi_blend(frame, text, 100, 100),
+         lambda: blend_over(frame, text, 100, 100, premultiplied=False)),
+        ("full-frame layer (polo)",
+         lambda: _float_full_frame_blend(frame4, layer),
+         lambda: blend_over(frame4, *crop_to_alpha(layer), premultiplied=False)),
+        ("logo 500x500 @ 80% (tk_combined)",
+         lambda: _float_roi_blend(frame, scale_alpha(logo, 0.8), 50, 50),
+         lambda: blend_over(frame, logo_sprite, 50, 50, opacity=0.8)),
+    ]
+
+    print(f"{'case':36} {'float ms':>10} {'uint8 ms':>10} {'speedup':>8}")
+    for name, old, new in cases:
+        t_old, t_new = timeit(old), timeit(new)
+        print(f"{name:36} {t_old:10.2f} {t_new:10.2f} {t_old / t_new:7.1f}x")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,232 @@
+"""
+Asynchronous Groq chat-completions client for the ad generators.
+
+- One httpx.AsyncClient (keep-alive, HTTP connection reuse) on a background
+  event loop, so Streamlit's synchronous script can submit several
+  independent calls and collect them later.
+- Identical in-flight payloads are coalesced onto one request.
+- Responses are cached in SQLite keyed by (model, messages, temperature,
+  max_tokens), so reruns with the same prompt cost nothing.
+- Request and token buckets keep bulk generation under the account's
+  per-minute quotas instead of bouncing off 429s.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import httpx
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_REQUESTS_PER_MINUTE = 30
+GROQ_TOKENS_PER_MINUTE = 6000
+RESPONSE_CACHE_DIR = Path.home() / ".cache" / "groq_client"
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
+MAX_RETRIES = 3
+
+
+def private_cache_dir():
+    """RESPONSE_CACHE_DIR owned by this user with 0700 permissions, else a fresh private temp dir
+
+    Cached ad copy must not be readable (or plantable) by other local users.
+    """
+    try:
+        RESPONSE_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        info = RESPONSE_CACHE_DIR.stat()
+        if not hasattr(os, "getuid") or info.st_uid == os.getuid():
+            if info.st_mode & 0o077:
+                RESPONSE_CACHE_DIR.chmod(0o700)
+            return RESPONSE_CACHE_DIR
+    except OSError:
+        pass
+    return Path(tempfile.mkdtemp(prefix="groq_client_"))
+
+
+def payload_key(payload):
+    """Cache / coalescing key: what determines the completion, nothing else"""
+    raw = json.dumps(
+        [payload.get("model"), payload.get("messages"), payload.get("temperature"), payload.get("max_tokens")],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def retry_after_seconds(value, default):
+    """Retry-After is either delta-seconds or an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def estimate_tokens(payload):
+    """Rough prompt (~4 chars/token) plus completion budget, for the token bucket"""
+    chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+    return chars // 4 + payload.get("max_tokens", 256)
+
+
+# ============== RATE LIMITING ==============
+
+class TokenBucket:
+    """Continuous-refill bucket; acquire() sleeps until enough capacity exists"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1.0):
+        amount = min(float(amount), self.capacity)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+
+# ============== RESPONSE CACHE ==============
+
+class ResponseCache:
+    """SQLite cache of completion text; one connection per operation"""
+
+    def __init__(self, path=None, ttl=RESPONSE_CACHE_TTL):
+        self.path = Path(path) if path else private_cache_dir() / "responses.db"
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content FROM responses WHERE key = ? AND created_at > ?", (key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, content):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, time.time()),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+
+# ============== CLIENT ==============
+
+class AsyncGroqClient:
+    """Coalescing, cached, rate-limited Groq client running on its own event loop
+
+    complete() is the coroutine; submit() schedules it from synchronous code
+    and returns a concurrent.futures.Future. Errors (httpx.HTTPError,
+    ValueError for an empty reply) propagate to the caller.
+    """
+
+    def __init__(self, api_key, requests_per_minute=GROQ_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=GROQ_TOKENS_PER_MINUTE, cache=None, max_connections=8):
+        self.headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+        self.cache = cache if cache is not None else ResponseCache()
+        self.stats = {"cached": 0, "coalesced": 0, "calls": 0, "retries": 0}
+        self._inflight = {}
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="groq-client", daemon=True)
+        self._thread.start()
+
+        async def setup():
+            self.http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+            self.request_bucket = TokenBucket(requests_per_minute)
+            self.token_bucket = TokenBucket(tokens_per_minute)
+
+        asyncio.run_coroutine_threadsafe(setup(), self.loop).result()
+
+    async def _post(self, payload, timeout):
+        await self.request_bucket.acquire()
+        await self.token_bucket.acquire(estimate_tokens(payload))
+        for attempt in range(MAX_RETRIES):
+            self.stats["calls"] += 1
+            r = await self.http.post(GROQ_URL, json=payload, headers=self.headers, timeout=timeout)
+            if r.status_code == 429 and attempt < MAX_RETRIES - 1:
+                # Quota shared with other processes: honour the server's pacing
+                self.stats["retries"] += 1
+                await asyncio.sleep(retry_after_seconds(r.headers.get("retry-after"), 2 ** attempt))
+                continue
+            r.raise_for_status()
+            choices = r.json().get("choices", [])
+            content = (choices[0].get("message", {}).get("content") or "").strip() if choices else ""
+            if not content:
+                raise ValueError("Groq returned an empty completion")
+            return content
+
+    async def complete(self, payload, timeout=20):
+        key = payload_key(payload)
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            self.stats["cached"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        async def fetch():
+            try:
+                content = await self._post(payload, timeout)
+                await asyncio.to_thread(self.cache.put, key, content)
+                return content
+            finally:
+                self._inflight.pop(key, None)
+
+        task = self._inflight[key] = asyncio.ensure_future(fetch())
+        return await asyncio.shield(task)
+
+    def submit(self, payload, timeout=20):
+        return asyncio.run_coroutine_threadsafe(self.complete(payload, timeout), self.loop)
+
+    def complete_many(self, payloads, timeout=20):
+        """Run independent payloads concurrently; results (or exceptions) in input order"""
+        async def gather():
+            return await asyncio.gather(*(self.complete(p, timeout) for p in payloads), return_exceptions=True)
+
+        return asyncio.run_coroutine_threadsafe(gather(), self.loop).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.http.aclose(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
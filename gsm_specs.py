@@ -0,0 +1,442 @@
+"""
+GSM spec retrieval shared by tkphones.py and tkgsm.py.
+
+A device lookup is search -> (info || images): once the search id is known
+the info and images calls run concurrently. Normalized spec records are
+persisted in a local SQLite store keyed by GSM id with a long TTL, so a
+device is fetched from the API at most once a month. fetch_devices() resolves
+hundreds of names with a bounded number of requests in flight per host.
+
+Device names resolve through a local trigram index built from past search
+responses; the remote search is only called on a miss.
+"""
+
+import heapq
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+
+GSM_API = "https://tkphsp2.vercel.app/gsm"
+REQUEST_TIMEOUT = 10
+HOST_CONCURRENCY = 6          # requests in flight per host, across all threads
+BATCH_WORKERS = 16            # devices resolved concurrently by fetch_devices
+SPEC_TTL = 30 * 86400         # seconds a stored spec record stays fresh
+SPEC_STORE_PATH = Path(tempfile.gettempdir()) / "gsm_specs.db"
+SPEC_RECORD_VERSION = 1
+
+session = requests.Session()
+session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=HOST_CONCURRENCY * 2))
+
+_host_slots = {}
+_host_lock = threading.Lock()
+
+# Two calls per device run side by side; kept separate from callers' pools
+_pipeline = ThreadPoolExecutor(max_workers=HOST_CONCURRENCY * 2, thread_name_prefix="gsm-pipeline")
+
+
+def _host_semaphore(url):
+    host = urlparse(url).netloc
+    with _host_lock:
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(HOST_CONCURRENCY)
+        return _host_slots[host]
+
+
+def get_json(url, params=None):
+    """GET with per-host concurrency bounded by HOST_CONCURRENCY"""
+    with _host_semaphore(url):
+        response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+# ============== NORMALIZATION ==============
+
+def image_id_for(base_id):
+    """'xiaomi_poco_x3_pro-10802.php' -> 'xiaomi_poco_x3_pro-pictures-10802.php' (images endpoint id)"""
+    if "-" not in base_id:
+        return base_id
+    name, num = base_id.rsplit("-", 1)
+    return f"{name.replace('.php', '')}-pictures-{num}"
+
+
+def _section(info, key):
+    value = info.get(key, {})
+    if isinstance(value, list):
+        value = value[0] if value and isinstance(value[0], dict) else {}
+    return value if isinstance(value, dict) else {}
+
+
+def _first_text(value):
+    """First non-empty string in a spec value that may be a str, list or dict"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            text = _first_text(item)
+            if text:
+                return text
+    return ""
+
+
+def normalize_specs(base_id, info, images, hit=None):
+    """Flat spec record with the keys tkgsm's phone_data uses plus image URLs
+
+    Missing values are "N/A" so SpecsAnalyzer can skip them.
+    """
+    hit = hit or {}
+    platform = _section(info, "platform")
+    memory_raw = _section(info, "memory").get("internal", "") or ""
+    first_variant = memory_raw.split(",")[0].strip()
+    storage = re.search(r"(\d+\s*[GT]B)(?!\s*RAM)", first_variant)
+    ram = re.search(r"(\d+\s*GB)\s*RAM", first_variant)
+    battery = re.search(r"(\d+)\s*mAh", str(_section(info, "battery").get("battType", "")))
+    camera = _first_text(info.get("mainCamera", info.get("main_camera", "")))
+    camera_mp = re.findall(r"(\d+(?:\.\d+)?)\s*MP", camera)
+
+    img_list = images.get("images", []) if isinstance(images, dict) else []
+    if len(img_list) > 1:
+        image_url = img_list[1]  # Priority: Lifestyle Shot
+    elif img_list:
+        image_url = img_list[0]
+    else:
+        image_url = hit.get("image")
+
+    return {
+        "id": base_id,
+        "version": SPEC_RECORD_VERSION,
+        "name": hit.get("name") or info.get("name") or base_id,
+        "image_url": image_url,
+        "images": img_list,
+        "chipset": (platform.get("chipset") or "N/A").split("(")[0].strip() or "N/A",
+        "os": platform.get("os") or "N/A",
+        "screen": (_section(info, "display").get("size") or "N/A").split(",")[0].strip(),
+        "memory": first_variant or "N/A",
+        "storage": storage.group(1).replace(" ", "") if storage else "N/A",
+        "ram": ram.group(1).replace(" ", "") if ram else "N/A",
+        "main_camera": " + ".join(f"{mp}MP" for mp in camera_mp) if camera_mp else (camera or "N/A"),
+        "battery": f"{battery.group(1)} mAh" if battery else "N/A",
+        "fetched_at": time.time(),
+    }
+
+
+# ============== SPEC STORE ==============
+
+class SpecStore:
+    """SQLite store of normalized spec records keyed by GSM id"""
+
+    def __init__(self, path=SPEC_STORE_PATH, ttl=SPEC_TTL):
+        self.path = str(path)
+        self.ttl = ttl
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS specs (
+                    gsm_id TEXT PRIMARY KEY,
+                    record TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits; close explicitly
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, gsm_id):
+        """Fresh record or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT record, fetched_at FROM specs WHERE gsm_id = ?", (gsm_id,)).fetchone()
+        if not row or time.time() - row[1] > self.ttl:
+            return None
+        record = json.loads(row[0])
+        return record if record.get("version") == SPEC_RECORD_VERSION else None
+
+    def put(self, record):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO specs (gsm_id, record, fetched_at) VALUES (?, ?, ?)",
+                (record["id"], json.dumps(record), record["fetched_at"]),
+            )
+
+    def purge_expired(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM specs WHERE fetched_at < ?", (time.time() - self.ttl,)).rowcount
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_spec_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SpecStore()
+        return _store
+
+
+# ============== LOOKUPS ==============
+
+def search_devices(query):
+    """Remote name search: [{"id", "name", "image", ...}]"""
+    return get_json(f"{GSM_API}/search", params={"q": query}) or []
+
+
+def fetch_spec_record(base_id, hit=None, store=None):
+    """Spec record for a GSM id: store first, else info and images fetched concurrently"""
+    store = store or get_spec_store()
+    record = store.get(base_id)
+    if record:
+        return record
+
+    info_future = _pipeline.submit(get_json, f"{GSM_API}/info/{base_id}")
+    images_future = _pipeline.submit(get_json, f"{GSM_API}/images/{image_id_for(base_id)}")
+    info = info_future.result()
+    try:
+        images = images_future.result()
+    except Exception:
+        images = {}  # Specs without pictures are still worth keeping
+
+    record = normalize_specs(base_id, info, images, hit)
+    store.put(record)
+    return record
+
+
+# ============== LOCAL DEVICE INDEX ==============
+# Every remote search response is folded into a local name index (persisted
+# next to the spec store). Queries are answered from it when one device is a
+# clear match; the remote search is only a fallback for misses.
+
+INDEX_MIN_SCORE = 0.55        # trigram Dice similarity to accept a local match
+INDEX_MIN_MARGIN = 0.05       # best must beat the runner-up by this much
+INDEX_CANDIDATES = 25
+
+_NAME_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Words that select a different device of the same series
+VARIANT_WORDS = {"pro", "max", "plus", "ultra", "lite", "mini", "fe", "neo", "prime", "note", "fold", "flip", "5g"}
+
+
+def model_tokens(tokens):
+    """Tokens that pick a specific device: model numbers and variant words"""
+    return {t for t in tokens if any(c.isdigit() for c in t)} | (set(tokens) & VARIANT_WORDS)
+
+
+def normalize_name(name):
+    """'Galaxy S23+ 5G' -> 'galaxy s23 plus 5g'"""
+    return " ".join(_NAME_TOKEN_RE.findall(name.lower().replace("+", " plus ")))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DeviceIndex:
+    """In-memory trigram index over device names seen in search responses"""
+
+    def __init__(self, path=SPEC_STORE_PATH):
+        self.path = str(path)
+        self.lock = threading.Lock()
+        self.devices = {}      # gsm_id -> hit
+        self.names = {}        # gsm_id -> (normalized name, model tokens, trigrams)
+        self.by_trigram = {}   # trigram -> set of gsm_ids
+        self.brands = set()
+        self.aliases = {}      # normalized query -> gsm_id
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS devices (gsm_id TEXT PRIMARY KEY, hit TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS device_aliases (query TEXT PRIMARY KEY, gsm_id TEXT NOT NULL)")
+            for (hit,) in conn.execute("SELECT hit FROM devices"):
+                self._index(json.loads(hit))
+            self.aliases.update(conn.execute("SELECT query, gsm_id FROM device_aliases"))
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager only commits; close explicitly
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _index(self, hit):
+        gsm_id = hit["id"]
+        name = normalize_name(hit.get("name", ""))
+        if not name:
+            return
+        tokens = name.split()
+        grams = trigrams(name)
+        self.devices[gsm_id] = hit
+        self.names[gsm_id] = (name, model_tokens(tokens), grams)
+        self.brands.add(tokens[0])
+        for gram in grams:
+            self.by_trigram.setdefault(gram, set()).add(gsm_id)
+
+    def add_hits(self, hits):
+        """Fold a remote search response into the index and persist the new devices"""
+        with self.lock:
+            fresh = [h for h in hits if h.get("id") and h["id"] not in self.devices]
+            for hit in fresh:
+                self._index(hit)
+        if not fresh:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany("INSERT OR REPLACE INTO devices (gsm_id, hit) VALUES (?, ?)",
+                                 [(h["id"], json.dumps(h)) for h in fresh])
+        except sqlite3.Error:
+            pass
+
+    def add_alias(self, query, hit):
+        """Remember which indexed device a query resolved to"""
+        if hit.get("id") not in self.devices:
+            return
+        with self.lock:
+            self.aliases[normalize_name(query)] = hit["id"]
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO device_aliases (query, gsm_id) VALUES (?, ?)",
+                             (normalize_name(query), hit["id"]))
+        except sqlite3.Error:
+            pass
+
+    def _prepare(self, query):
+        q_name = normalize_name(query)
+        q_tokens = set(q_name.split())
+        return q_name, model_tokens(q_tokens), q_tokens & self.brands, trigrams(q_name)
+
+    def _score(self, prepared, gsm_id):
+        """Dice similarity with hard model-number and brand constraints; 0 when incompatible"""
+        q_name, q_models, q_brands, q_grams = prepared
+        name, models, grams = self.names[gsm_id]
+        # Model numbers and variant words must match both ways: "x3" never
+        # resolves to "x4", "15 pro" never to "15", nor "15" to "15 pro"
+        if q_models != models:
+            return 0.0
+        brand = name.split(" ", 1)[0]
+        if q_brands and brand not in q_brands:
+            return 0.0
+        dice = 2 * len(q_grams & grams) / (len(q_grams) + len(grams))
+        # A brand-less query ("iphone 15") is compared as if the brand was typed
+        if not q_brands:
+            with_brand = trigrams(f"{brand} {q_name}")
+            dice = max(dice, 2 * len(with_brand & grams) / (len(with_brand) + len(grams)))
+        return dice
+
+    def score(self, query, gsm_id):
+        return self._score(self._prepare(query), gsm_id)
+
+    def rank(self, query, hits=None):
+        """[(score, hit)] best first, over indexed `hits` or over indexed candidates"""
+        prepared = self._prepare(query)
+        if hits is not None:
+            ids = [h["id"] for h in hits if h.get("id") in self.names]
+        else:
+            # Rare trigrams are enough to find candidates; very common ones
+            # (" pr", "pro") only cost time unless nothing rarer exists
+            postings = sorted((self.by_trigram.get(g, ()) for g in prepared[3]), key=len)
+            limit = max(INDEX_CANDIDATES * 4, len(self.devices) // 20)
+            selective = [p for p in postings if len(p) <= limit] or postings[:1]
+            counts = {}
+            for posting in selective:
+                for gsm_id in posting:
+                    counts[gsm_id] = counts.get(gsm_id, 0) + 1
+            ids = heapq.nlargest(INDEX_CANDIDATES, counts, key=counts.get)
+        scored = [(self._score(prepared, gsm_id), self.devices[gsm_id]) for gsm_id in ids]
+        return sorted((s for s in scored if s[0] > 0), key=lambda s: -s[0])
+
+    def lookup(self, query):
+        """Hit for a clear local match, else None"""
+        gsm_id = self.aliases.get(normalize_name(query))
+        if gsm_id in self.devices:
+            return self.devices[gsm_id]
+        ranked = self.rank(query)
+        if not ranked or ranked[0][0] < INDEX_MIN_SCORE:
+            return None
+        if len(ranked) > 1 and ranked[0][0] - ranked[1][0] < INDEX_MIN_MARGIN:
+            return None  # Ambiguous: let the remote search decide
+        return ranked[0][1]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_device_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DeviceIndex()
+        return _index
+
+
+def resolve_device(query, index=None):
+    """Best search hit for a device name, or None
+
+    The local index answers first; on a miss the remote search runs and its
+    hits are ranked by the same scorer instead of trusting hits[0].
+    """
+    index = index or get_device_index()
+    hit = index.lookup(query)
+    if hit:
+        return hit
+    hits = search_devices(query)
+    if not hits:
+        return None
+    index.add_hits(hits)
+    ranked = index.rank(query, hits)
+    if not ranked:
+        return None  # No hit carries the query's model/variant: don't guess (or remember) one
+    chosen = ranked[0][1]
+    index.add_alias(query, chosen)
+    return chosen
+
+
+def get_device(query, store=None):
+    """Name -> spec record (raises when the device cannot be found or fetched)"""
+    hit = resolve_device(query)
+    if not hit:
+        raise LookupError(f"No GSM match for {query!r}")
+    return fetch_spec_record(hit["id"], hit, store)
+
+
+def fetch_devices(queries, max_workers=BATCH_WORKERS, on_result=None):
+    """Resolve many device names concurrently
+
+    Returns {query: record or {"error": message}} in input order. HTTP
+    concurrency stays bounded by HOST_CONCURRENCY however many workers run.
+    """
+    unique = list(dict.fromkeys(queries))
+    results = {}
+
+    def run(query):
+        try:
+            return query, get_device(query)
+        except Exception as e:
+            return query, {"error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique)))) as executor:
+        for query, record in executor.map(run, unique):
+            results[query] = record
+            if on_result:
+                on_result(query, record)
+
+    return {query: results[query] for query in unique}
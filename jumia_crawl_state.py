@@ -0,0 +1,146 @@
+"""
+Crawl state for the Jumia flash-sales scraper (streamlit_app.py).
+
+Per page it remembers the validators (ETag / Last-Modified) and a content
+hash with the products parsed from it, so an unchanged page costs either a
+304 or a hash compare instead of a parse. Per product it keeps a fingerprint
+of (title, price, discount) so each crawl can be reported as a diff feed of
+added, removed and repriced products.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+CRAWL_STATE_VERSION = 1
+CRAWL_STATE_PATH = Path(tempfile.gettempdir()) / "jumia_crawl_state.json"
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def product_key(product):
+    """Identity of a product across crawls (listing cards carry no stable id)"""
+    return " ".join(product["title"].lower().split())
+
+
+def product_fingerprint(product):
+    raw = f"{product['title']}|{product['price']}|{product['description']}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    """JSON-backed page and product state; mutated from the script thread only"""
+
+    def __init__(self, path=CRAWL_STATE_PATH):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.products = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CRAWL_STATE_VERSION:
+                self.pages = data["pages"]
+                self.products = data["products"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    # ----- pages -----
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since for a page fetched before"""
+        page = self.pages.get(url, {})
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def cached_products(self, url, digest=None):
+        """Products of an unchanged page: after a 304 (digest=None) or when the body hash matches"""
+        page = self.pages.get(url)
+        if page is None or (digest is not None and page.get("hash") != digest):
+            return None
+        return page["products"]
+
+    def record_page(self, url, response_headers, digest, products):
+        with self.lock:
+            self.pages[url] = {
+                "etag": response_headers.get("ETag"),
+                "last_modified": response_headers.get("Last-Modified"),
+                "hash": digest,
+                "products": products,
+                "fetched_at": time.time(),
+            }
+
+    # ----- products -----
+
+    def diff(self, products, complete=True):
+        """Compare a crawl with the last one and remember it
+
+        Returns {"added", "removed", "repriced", "changed", "unchanged"}. Products
+        are only reported removed when the crawl covered every page (complete).
+        repriced holds {"product", "old_price"}; changed covers other field edits
+        such as the discount badge.
+        """
+        now = time.time()
+        feed = {"added": [], "removed": [], "repriced": [], "changed": [], "unchanged": 0}
+        seen = set()
+
+        with self.lock:
+            for product in products:
+                key = product_key(product)
+                if key in seen:
+                    continue
+                seen.add(key)
+                fingerprint = product_fingerprint(product)
+                old = self.products.get(key)
+                if old is None or not old.get("active"):
+                    # New, or back after being removed
+                    feed["added"].append(product)
+                    old = self.products.setdefault(key, {"first_seen": now})
+                elif old["fingerprint"] == fingerprint:
+                    feed["unchanged"] += 1
+                elif old["price"] != product["price"]:
+                    feed["repriced"].append({"product": product, "old_price": old["price"]})
+                else:
+                    feed["changed"].append(product)
+                old.update(
+                    fingerprint=fingerprint, title=product["title"], price=product["price"],
+                    description=product["description"], last_seen=now, active=True,
+                )
+
+            if complete:
+                for key, old in self.products.items():
+                    if key not in seen and old.get("active"):
+                        old["active"] = False
+                        feed["removed"].append(
+                            {"title": old["title"], "price": old["price"], "description": old["description"]}
+                        )
+
+        return feed
+
+    def save(self):
+        with self.lock:
+            data = {"version": CRAWL_STATE_VERSION, "pages": self.pages, "products": self.products}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self.pages.clear()
+            self.products.clear()
+        self.save()
@@ -0,0 +1,207 @@
+"""
+Jumia product-listing parsers for streamlit_app.py.
+
+Both backends return the same list of {"title", "price", "description"}
+dicts for a page of HTML:
+
+- "bs4": BeautifulSoup html.parser with chained find() calls (the original path).
+- "lxml": libxml2 parse plus one descendant walk per product card, matched
+  against a precompiled (tag -> class rule) table.
+
+parse_in_browser runs the same rules as JavaScript inside a Selenium page.
+
+Run `python jumia_parser.py [page.html ...]` to benchmark them on saved
+pages (debug mode in the app saves fetched pages) or on a synthetic page.
+"""
+
+from bs4 import BeautifulSoup
+import lxml.html
+
+ARTICLE_CLASS = "prd _fb col c-prd"
+
+# field -> ordered (tag, class, exact) fallbacks. exact=True compares the whole
+# class attribute (BeautifulSoup semantics for a class string with spaces),
+# otherwise the class is one token of the attribute.
+FIELD_RULES = {
+    "title": [("h3", "name", False), ("a", "name", False)],
+    "price": [("div", "prc", False), ("span", "p24_price", False)],
+    "description": [
+        ("div", "bdg _dsct _sm", True),
+        ("p", "dscr", False),
+        ("div", "s-prc-w", False),
+        ("div", "info", False),
+        ("div", "tag _dsct", True),  # Added for discounts
+    ],
+}
+
+
+def _product(title, price, description):
+    if title == "N/A":
+        return None
+    return {"title": title, "price": price, "description": description}
+
+
+# ============== BEAUTIFULSOUP BACKEND ==============
+
+def parse_bs4(html):
+    soup = BeautifulSoup(html, "html.parser")
+    products = []
+    for listing in soup.find_all("article", class_=ARTICLE_CLASS):
+        found = {}
+        for field, rules in FIELD_RULES.items():
+            elem = None
+            for tag, cls, _ in rules:
+                elem = listing.find(tag, class_=cls)
+                if elem:
+                    break
+            found[field] = elem.get_text(strip=True) if elem else "N/A"
+        product = _product(found["title"], found["price"], found["description"])
+        if product:
+            products.append(product)
+    return products
+
+
+# ============== LXML BACKEND ==============
+
+def _compile_rules(field_rules):
+    """tag -> [(field, priority, class, exact)] so each element costs one dict lookup"""
+    by_tag = {}
+    for field, rules in field_rules.items():
+        for priority, (tag, cls, exact) in enumerate(rules):
+            by_tag.setdefault(tag, []).append((field, priority, cls, exact))
+    return by_tag
+
+RULES_BY_TAG = _compile_rules(FIELD_RULES)
+RULE_TAGS = tuple(RULES_BY_TAG)
+
+
+def _text(elem):
+    """Equivalent of BeautifulSoup get_text(strip=True)"""
+    return "".join(t.strip() for t in elem.itertext())
+
+
+def parse_lxml(html):
+    # lxml raises "Document is empty" where bs4 finds nothing; an empty page ends pagination
+    if not html or not html.strip():
+        return []
+    root = lxml.html.fromstring(html)
+    products = []
+    for article in root.iter("article"):
+        if article.get("class") != ARTICLE_CLASS:
+            continue
+        best = {}
+        # One walk over the card; keep the highest-priority match per field
+        for elem in article.iterdescendants(*RULE_TAGS):
+            cls = elem.get("class")
+            if not cls:
+                continue
+            tokens = None
+            for field, priority, rule_cls, exact in RULES_BY_TAG[elem.tag]:
+                if field in best and best[field][0] <= priority:
+                    continue
+                if exact:
+                    matched = cls == rule_cls
+                else:
+                    tokens = tokens or cls.split()
+                    matched = rule_cls in tokens
+                if matched:
+                    best[field] = (priority, elem)
+        found = {field: _text(best[field][1]) if field in best else "N/A" for field in FIELD_RULES}
+        product = _product(found["title"], found["price"], found["description"])
+        if product:
+            products.append(product)
+    return products
+
+
+# ============== IN-BROWSER BACKEND ==============
+# Same rules evaluated by the page's own DOM; returns plain JSON so the
+# Selenium path never serializes page_source.
+
+BROWSER_EXTRACT_JS = """
+const [articleClass, fieldRules] = arguments;
+const text = (el) => {
+    const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+    let out = "";
+    while (walker.nextNode()) out += walker.currentNode.nodeValue.trim();
+    return out;
+};
+const products = [];
+for (const article of document.getElementsByTagName("article")) {
+    if (article.getAttribute("class") !== articleClass) continue;
+    const found = {};
+    for (const [field, rules] of fieldRules) {
+        found[field] = "N/A";
+        for (const [tag, cls, exact] of rules) {
+            const el = Array.from(article.getElementsByTagName(tag)).find(
+                (e) => exact ? e.getAttribute("class") === cls : e.classList.contains(cls));
+            if (el) { found[field] = text(el); break; }
+        }
+    }
+    products.push(found);
+}
+return products;
+"""
+
+
+def parse_in_browser(driver):
+    """Extract products with one execute_script call on a loaded Selenium page"""
+    rules = [[field, [list(rule) for rule in field_rules]] for field, field_rules in FIELD_RULES.items()]
+    found = driver.execute_script(BROWSER_EXTRACT_JS, ARTICLE_CLASS, rules)
+    products = (_product(f["title"], f["price"], f["description"]) for f in found)
+    return [p for p in products if p]
+
+
+PARSER_BACKENDS = {"lxml": parse_lxml, "bs4": parse_bs4}
+
+
+def parse_products(html, backend="lxml"):
+    return PARSER_BACKENDS[backend](html)
+
+
+# ============== BENCHMARK ==============
+
+def synthetic_page(n=40):
+    """A flash-sales-like page: n product cards inside the usual page chrome"""
+    cards = []
+    for i in range(n):
+        discount = f'<div class="bdg _dsct _sm">{i % 50}%</div>' if i % 3 else '<div class="tag _dsct">Deal</div>'
+        cards.append(f"""
+        <article class="{ARTICLE_CLASS}">
+          <a class="core" href="/phone-{i}.html" data-id="SKU{i}">
+            <div class="img-c"><img class="img" data-src="https://ke.jumia.is/{i}.jpg" alt="Phone {i}"></div>
+            <div class="info">
+              <h3 class="name">Tecno Spark {i} 6.6" 128GB + 4GB RAM <!-- promo --> Dual SIM</h3>
+              <div class="prc">KSh {10000 + i * 137:,}</div>
+              <div class="s-prc-w"><div class="old">KSh {14000 + i * 137:,}</div>{discount}</div>
+              <div class="rev"><div class="stars _s">4.{i % 10} out of 5</div>({i * 3})</div>
+            </div>
+          </a>
+          <footer class="ft"><button class="add btn _md">Add To Cart</button></footer>
+        </article>""")
+    nav = "".join(f'<li><a href="/c{i}">Category {i}</a></li>' for i in range(150))
+    return (f"<html><head><title>Flash Sales</title></head><body><nav><ul>{nav}</ul></nav>"
+            f"<section class=\"card -fh\"><div class=\"-paxs row _no-g _4cl-3cm-shs\">{''.join(cards)}</div></section>"
+            f"<footer>{nav}</footer></body></html>")
+
+
+def benchmark(paths=(), repeats=20):
+    import time
+
+    pages = [open(p, "rb").read() for p in paths] or [synthetic_page().encode("utf-8")]
+    results = {}
+    for name, parse in PARSER_BACKENDS.items():
+        start = time.perf_counter()
+        for _ in range(repeats):
+            products = [parse(page) for page in pages]
+        results[name] = ((time.perf_counter() - start) / repeats / len(pages) * 1000, products)
+
+    reference = results["bs4"][1]
+    print(f"{'backend':8} {'ms/page':>9} {'products':>9} {'matches bs4':>12}")
+    for name, (ms, products) in results.items():
+        print(f"{name:8} {ms:9.2f} {sum(map(len, products)):9} {str(products == reference):>12}")
+    print(f"speedup: {results['bs4'][0] / results['lxml'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    import sys
+    benchmark(sys.argv[1:])
@@ -11,6 +11,7 @@ import tempfile
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 import math
+from compositing import blend_over, crop_to_alpha
 
 st.set_page_config(page_title="Polotno Studio Pro", layout="wide", page_icon="🎬")
 
@@ -437,9 +438,7 @@ class PolotnoRenderer:
         
         # Composite
         if to_numpy:
-            arr = np.array(text_layer)
-            alpha = arr[:, :, 3:4] / 255.0
-            canvas[:] = (arr * alpha + canvas * (1 - alpha)).astype(np.uint8)
+            blend_over(canvas, np.asarray(text_layer), premultiplied=False)
         else:
             canvas.paste(text_layer, (0, 0), text_layer)
     
@@ -495,21 +494,20 @@ class PolotnoRenderer:
         for child in page.get('children', []):
             anims = [Animation.from_polotno(a) for a in child.get('animations', []) if a.get('enabled')]
             
+            elem_array = self.render_element(child, to_numpy=True)
             if anims:
-                elem_array = self.render_element(child, to_numpy=True)
                 animated_elements.append((child, anims, elem_array))
             else:
-                elem_array = self.render_element(child, to_numpy=True)
-                static_elements.append(elem_array)
+                # Static layers only need their non-transparent bounding box
+                static_elements.append(crop_to_alpha(elem_array))
         
         # Build static base
         base_array = np.zeros((self.height, self.width, 4), dtype=np.uint8)
         bg_color = hex_to_rgba(page.get('background', 'rgba(255,255,255,1)'))
         base_array[:, :] = bg_color
         
-        for elem in static_elements:
-            alpha = elem[:, :, 3:4] / 255.0
-            base_array = (elem * alpha + base_array * (1 - alpha)).astype(np.uint8)
+        for elem, ex, ey in static_elements:
+            blend_over(base_array, elem, ex, ey, premultiplied=False)
         
         # Generate frames
         frames = []
@@ -547,8 +545,7 @@ class PolotnoRenderer:
                             break
                 
                 if visible:
-                    alpha = current_array[:, :, 3:4] / 255.0
-                    frame = (current_array * alpha + frame * (1 - alpha)).astype(np.uint8)
+                    blend_over(frame, *crop_to_alpha(current_array), premultiplied=False)
             
             frames.append(frame[:, :, :3])
             
@@ -2,6 +2,7 @@ import streamlit as st
 import os
 import tempfile
 import numpy as np
+import pandas as pd
 import cv2
 from pathlib import Path
 from pptx import Presentation
@@ -9,11 +10,20 @@ from pptx.enum.shapes import MSO_SHAPE_TYPE
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 from PIL import Image, ImageDraw, ImageFont
 import hashlib
+import copy
 import json
 import math
 import re
+import shutil
+import subprocess
+import time
+import functools
+import threading
 import zipfile
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from io import BytesIO
+from compositing import Sprite, blend_over
 
 st.set_page_config(page_title="PPTX Video Factory", layout="wide")
 
@@ -211,179 +221,326 @@ def extract_background(slide):
         pass
     return (255, 255, 255)
 
-def harvest_ppt(pptx_path, target_dims=None, asset_sources=None, manual_mappings=None):
-    try:
-        prs = Presentation(pptx_path)
-        if not prs.slides:
-            return None
+# Bump when the compiled layout schema changes; older cache files are ignored
+LAYOUT_CACHE_VERSION = 1
+LAYOUT_CACHE_DIR = Path(tempfile.gettempdir()) / "pptx_layout_cache"
+
+@st.cache_resource
+def _layout_memory():
+    """In-process memo tier, kept across reruns (module dicts are rebuilt on every run)."""
+    return {'hashes': {}, 'layouts': {}}
+
+def pptx_content_hash(pptx_path):
+    """SHA-256 of the PPTX bytes, memoized per (path, mtime, size)."""
+    hashes = _layout_memory()['hashes']
+    stat = os.stat(pptx_path)
+    key = (str(pptx_path), stat.st_mtime_ns, stat.st_size)
+    if key not in hashes:
+        h = hashlib.sha256()
+        with open(pptx_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        hashes[key] = h.hexdigest()
+    return hashes[key]
+
+def compile_layout(pptx_path, target_dims=None):
+    """Parse the first slide into geometry, text and style records.
+    
+    Asset matching is left to resolve_layout so the result only depends on
+    the PPTX bytes and target_dims and can be cached on disk.
+    """
+    prs = Presentation(pptx_path)
+    if not prs.slides:
+        return None
+    
+    slide = prs.slides[0]
+    emu_to_px = 96 / 914400
+    
+    orig_w = int(prs.slide_width * emu_to_px)
+    orig_h = int(prs.slide_height * emu_to_px)
+    
+    if target_dims:
+        target_w, target_h = target_dims['w'], target_dims['h']
+        scale = max(target_w / orig_w, target_h / orig_h)
+        scaled_w = int(orig_w * scale)
+        scaled_h = int(orig_h * scale)
+        offset_x = (target_w - scaled_w) // 2
+        offset_y = (target_h - scaled_h) // 2
+        canvas_w, canvas_h = target_w, target_h
+    else:
+        canvas_w, canvas_h = orig_w, orig_h
+        scale = 1.0
+        offset_x, offset_y = 0, 0
+    
+    compiled = {
+        "version": LAYOUT_CACHE_VERSION,
+        "canvas": {"w": canvas_w, "h": canvas_h},
+        "original": {"w": orig_w, "h": orig_h},
+        "scale": scale,
+        "offset": {"x": offset_x, "y": offset_y},
+        "pptx_background": extract_background(slide),
+        "elements": []
+    }
+    
+    def process_shape(shape, parent_x=0, parent_y=0):
+        identifiers = get_shape_identifier(shape)
         
-        slide = prs.slides[0]
-        emu_to_px = 96 / 914400
+        x = int((shape.left * emu_to_px * scale) + offset_x + parent_x)
+        y = int((shape.top * emu_to_px * scale) + offset_y + parent_y)
+        w = int(shape.width * emu_to_px * scale)
+        h = int(shape.height * emu_to_px * scale)
         
-        orig_w = int(prs.slide_width * emu_to_px)
-        orig_h = int(prs.slide_height * emu_to_px)
+        # Handle groups
+        if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
+            children = []
+            for child in shape.shapes:
+                child_result = process_shape(child, parent_x=x - offset_x, parent_y=y - offset_y)
+                if isinstance(child_result, list):
+                    children.extend(child_result)
+                elif child_result:
+                    children.append(child_result)
+            return children if children else None
         
-        if target_dims:
-            target_w, target_h = target_dims['w'], target_dims['h']
-            scale = max(target_w / orig_w, target_h / orig_h)
-            scaled_w = int(orig_w * scale)
-            scaled_h = int(orig_h * scale)
-            offset_x = (target_w - scaled_w) // 2
-            offset_y = (target_h - scaled_h) // 2
-            canvas_w, canvas_h = target_w, target_h
-        else:
-            canvas_w, canvas_h = orig_w, orig_h
-            scale = 1.0
-            offset_x, offset_y = 0, 0
-        
-        bg_color = extract_background(slide)
-        
-        # Build auto-match pool: folder -> extracted -> uploaded
-        auto_match_pool = {}
-        
-        if asset_sources:
-            if asset_sources.get('folder'):
-                auto_match_pool.update(get_images_from_folder(asset_sources['folder']))
-            if asset_sources.get('extracted_media'):
-                auto_match_pool.update(get_images_from_folder(asset_sources['extracted_media']))
-            if asset_sources.get('uploaded'):
-                auto_match_pool.update(asset_sources['uploaded'])
-        
-        config = {
-            "canvas": {"w": canvas_w, "h": canvas_h},
-            "original": {"w": orig_w, "h": orig_h},
-            "scale": scale,
-            "offset": {"x": offset_x, "y": offset_y},
-            "pptx_background": bg_color,
-            "asset_sources": asset_sources,
-            "auto_match_pool": list(auto_match_pool.keys()),
-            "elements": []
+        el = {
+            "id": identifiers['name'],
+            "name": identifiers['name'],
+            "alt_text": identifiers.get('alt_text'),
+            "x": x, "y": y, "w": w, "h": h,
+            "rotation": getattr(shape, 'rotation', 0) or 0,
+            "z_order": getattr(shape, 'z_order', 0) or 0,
         }
         
-        def process_shape(shape, parent_x=0, parent_y=0):
-            identifiers = get_shape_identifier(shape)
-            original_id = identifiers['name']
-            display_name = original_id
-            
-            x = int((shape.left * emu_to_px * scale) + offset_x + parent_x)
-            y = int((shape.top * emu_to_px * scale) + offset_y + parent_y)
-            w = int(shape.width * emu_to_px * scale)
-            h = int(shape.height * emu_to_px * scale)
-            
-            # Handle groups
-            if shape.shape_type == MSO_SHAPE_TYPE.GROUP:
-                children = []
-                for child in shape.shapes:
-                    child_offset_x = x - offset_x
-                    child_offset_y = y - offset_y
-                    child_result = process_shape(child, parent_x=child_offset_x, parent_y=child_offset_y)
-                    
-                    if isinstance(child_result, list):
-                        children.extend(child_result)
-                    elif child_result:
-                        children.append(child_result)
-                return children if children else None
-            
-            el = {
-                "id": original_id,
-                "name": display_name,
-                "alt_text": identifiers.get('alt_text'),
-                "x": x, "y": y, "w": w, "h": h,
-                "rotation": getattr(shape, 'rotation', 0) or 0,
-                "z_order": getattr(shape, 'z_order', 0) or 0,
-            }
-            
-            # TEXT - Always extract
-            if shape.has_text_frame and shape.text.strip():
-                text_props = extract_text_frame_properties(shape.text_frame, scale)
-                if text_props and text_props['paragraphs']:
-                    el.update({
-                        "type": "text",
-                        "text_props": text_props,
-                        "text_default": shape.text_frame.text,
-                    })
-                    return el
-            
-            # PICTURE
-            if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
-                el["type"] = "image"
-                
-                if manual_mappings and original_id in manual_mappings:
-                    el["image_path"] = manual_mappings[original_id]
-                    el["match_source"] = "manual"
-                else:
-                    matched = find_match(display_name, auto_match_pool)
-                    
-                    if not matched and identifiers.get('alt_text'):
-                        matched = find_match(identifiers['alt_text'], auto_match_pool)
-                    
-                    if matched:
-                        el["image_path"] = matched
-                        if asset_sources.get('folder') and matched in get_images_from_folder(asset_sources['folder']).values():
-                            el["match_source"] = "folder"
-                        elif asset_sources.get('extracted_media') and matched in get_images_from_folder(asset_sources['extracted_media']).values():
-                            el["match_source"] = "extracted"
-                        else:
-                            el["match_source"] = "uploaded"
-                    else:
-                        el["suggested_filename"] = get_suggested_filename(display_name, identifiers.get('alt_text'))
-                
+        # TEXT - Always extract
+        if shape.has_text_frame and shape.text.strip():
+            text_props = extract_text_frame_properties(shape.text_frame, scale)
+            if text_props and text_props['paragraphs']:
+                el.update({
+                    "kind": "text",
+                    "text_props": text_props,
+                    "text_default": shape.text_frame.text,
+                })
                 return el
-            
-            # SHAPE
-            el["type"] = "shape"
-            
-            if manual_mappings and original_id in manual_mappings:
-                el["type"] = "image"
-                el["image_path"] = manual_mappings[original_id]
-                el["match_source"] = "manual"
-                return el
-            
-            matched = find_match(display_name, auto_match_pool)
-            if not matched and identifiers.get('alt_text'):
-                matched = find_match(identifiers['alt_text'], auto_match_pool)
-            
-            if matched:
-                el["type"] = "image"
-                el["image_path"] = matched
-                if asset_sources.get('folder') and matched in get_images_from_folder(asset_sources['folder']).values():
-                    el["match_source"] = "folder"
-                elif asset_sources.get('extracted_media') and matched in get_images_from_folder(asset_sources['extracted_media']).values():
-                    el["match_source"] = "extracted"
-                else:
-                    el["match_source"] = "uploaded"
-                return el
-            
-            # Shape styling
-            try:
-                if hasattr(shape, 'fill') and shape.fill.type == 1:
-                    if hasattr(shape.fill.fore_color, 'rgb') and shape.fill.fore_color.rgb:
-                        rgb = shape.fill.fore_color.rgb
-                        el["fill_color"] = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
-            except:
-                pass
-            
-            try:
-                if shape.has_line and shape.line.color.rgb:
-                    rgb = shape.line.color.rgb
-                    el["line_color"] = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
-                    el["line_width"] = int(shape.line.width.pt * scale) if shape.line.width else 1
-            except:
-                pass
-            
+        
+        if shape.shape_type == MSO_SHAPE_TYPE.PICTURE:
+            el["kind"] = "picture"
             return el
         
-        for shape in slide.shapes:
-            result = process_shape(shape)
-            if isinstance(result, list):
-                config["elements"].extend(result)
-            elif result:
-                config["elements"].append(result)
+        el["kind"] = "shape"
         
-        config["elements"] = [el for el in config["elements"] if isinstance(el, dict)]
-        config["elements"].sort(key=lambda x: x.get('z_order', 0))
+        # Shape styling
+        try:
+            if hasattr(shape, 'fill') and shape.fill.type == 1:
+                if hasattr(shape.fill.fore_color, 'rgb') and shape.fill.fore_color.rgb:
+                    rgb = shape.fill.fore_color.rgb
+                    el["fill_color"] = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
+        except:
+            pass
         
-        return config
+        try:
+            if shape.has_line and shape.line.color.rgb:
+                rgb = shape.line.color.rgb
+                el["line_color"] = (int(rgb[0]), int(rgb[1]), int(rgb[2]))
+                el["line_width"] = int(shape.line.width.pt * scale) if shape.line.width else 1
+        except:
+            pass
+        
+        return el
+    
+    for shape in slide.shapes:
+        result = process_shape(shape)
+        if isinstance(result, list):
+            compiled["elements"].extend(result)
+        elif result:
+            compiled["elements"].append(result)
+    
+    compiled["elements"] = [el for el in compiled["elements"] if isinstance(el, dict)]
+    compiled["elements"].sort(key=lambda x: x.get('z_order', 0))
+    
+    return compiled
+
+def _restore_tuples(compiled):
+    """JSON turns colour tuples into lists; render_frame expects tuples."""
+    compiled["pptx_background"] = tuple(compiled["pptx_background"])
+    for el in compiled["elements"]:
+        for key in ("fill_color", "line_color"):
+            if isinstance(el.get(key), list):
+                el[key] = tuple(el[key])
+    return compiled
+
+def layout_cache_path(content_hash, target_dims=None):
+    dims = f"{target_dims['w']}x{target_dims['h']}" if target_dims else "orig"
+    return LAYOUT_CACHE_DIR / f"v{LAYOUT_CACHE_VERSION}_{content_hash}_{dims}.json"
+
+def get_compiled_layout(pptx_path, target_dims=None):
+    """Compiled layout keyed by PPTX content hash: memory -> disk JSON -> python-pptx."""
+    content_hash = pptx_content_hash(pptx_path)
+    cache_path = layout_cache_path(content_hash, target_dims)
+    key = cache_path.name
+    layouts = _layout_memory()['layouts']
+    
+    if key in layouts:
+        return layouts[key]
+    
+    compiled = None
+    if cache_path.exists():
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == LAYOUT_CACHE_VERSION:
+                compiled = _restore_tuples(data)
+        except (OSError, ValueError):
+            compiled = None
+    
+    if compiled is None:
+        compiled = compile_layout(pptx_path, target_dims)
+        if compiled is None:
+            return None
+        compiled["content_hash"] = content_hash
+        try:
+            LAYOUT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(compiled, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    
+    layouts[key] = compiled
+    return compiled
+
+def build_match_pool(asset_sources):
+    """Auto-match pool (folder -> extracted -> uploaded) plus path sets for match_source."""
+    folder_images = get_images_from_folder(asset_sources['folder']) if asset_sources.get('folder') else {}
+    extracted_images = get_images_from_folder(asset_sources['extracted_media']) if asset_sources.get('extracted_media') else {}
+    
+    auto_match_pool = {}
+    auto_match_pool.update(folder_images)
+    auto_match_pool.update(extracted_images)
+    if asset_sources.get('uploaded'):
+        auto_match_pool.update(asset_sources['uploaded'])
+    
+    source_sets = {
+        'folder': set(folder_images.values()),
+        'extracted_media': set(extracted_images.values()),
+    }
+    return auto_match_pool, source_sets
+
+def apply_manual_mapping(resolved, image_path):
+    """Turn a (resolved or compiled) element into a manually mapped image, in place."""
+    for key in ("fill_color", "line_color", "line_width"):
+        resolved.pop(key, None)
+    resolved["type"] = "image"
+    resolved["image_path"] = image_path
+    resolved["match_source"] = "manual"
+    resolved.pop("suggested_filename", None)
+    return resolved
+
+def resolve_element(el, auto_match_pool, source_sets, manual_mappings):
+    """Turn a compiled element into a render element (image matching, match_source)."""
+    resolved = copy.deepcopy(el)
+    kind = resolved.pop("kind")
+    original_id = resolved["id"]
+    
+    if kind == "text":
+        resolved["type"] = "text"
+        return resolved
+    
+    def source_of(matched):
+        if matched in source_sets['folder']:
+            return "folder"
+        if matched in source_sets['extracted_media']:
+            return "extracted"
+        return "uploaded"
+    
+    if manual_mappings and original_id in manual_mappings:
+        return apply_manual_mapping(resolved, manual_mappings[original_id])
+    
+    matched = find_match(resolved["name"], auto_match_pool)
+    if not matched and resolved.get('alt_text'):
+        matched = find_match(resolved['alt_text'], auto_match_pool)
+    
+    if matched:
+        for key in ("fill_color", "line_color", "line_width"):
+            resolved.pop(key, None)
+        resolved["type"] = "image"
+        resolved["image_path"] = matched
+        resolved["match_source"] = source_of(matched)
+    elif kind == "picture":
+        resolved["type"] = "image"
+        resolved["suggested_filename"] = get_suggested_filename(resolved["name"], resolved.get('alt_text'))
+    else:
+        resolved["type"] = "shape"
+    
+    return resolved
+
+def resolve_layout(compiled, asset_sources=None, manual_mappings=None):
+    """Apply asset matching and manual mappings to a compiled layout. No PPTX parsing."""
+    asset_sources = asset_sources or {}
+    auto_match_pool, source_sets = build_match_pool(asset_sources)
+    
+    return {
+        "canvas": dict(compiled["canvas"]),
+        "original": dict(compiled["original"]),
+        "scale": compiled["scale"],
+        "offset": dict(compiled["offset"]),
+        "pptx_background": compiled["pptx_background"],
+        "content_hash": compiled.get("content_hash"),
+        "asset_sources": asset_sources,
+        "auto_match_pool": list(auto_match_pool.keys()),
+        "elements": [
+            resolve_element(el, auto_match_pool, source_sets, manual_mappings)
+            for el in compiled["elements"]
+        ]
+    }
+
+def compiled_for_layout(layout, pptx_path, target_dims=None):
+    """Compiled layout a resolved layout came from, or None (e.g. an imported layout without its PPTX)."""
+    if not pptx_path or not os.path.exists(pptx_path):
+        return None
+    compiled = get_compiled_layout(pptx_path, target_dims)
+    if (compiled is None or compiled.get("content_hash") != layout.get("content_hash")
+            or compiled["canvas"] != layout["canvas"]):
+        return None
+    return compiled
+
+def missing_image_ids(layout):
+    return [el["id"] for el in layout["elements"] if el.get("type") == "image" and not el.get("image_path")]
+
+def update_layout_mappings(layout, compiled, manual_mappings, changed_ids, asset_sources=None):
+    """Re-resolve only the changed elements, optionally against new asset sources.
+    
+    Without a compiled layout only manual mappings can be applied; other
+    changed elements are left as they are.
+    """
+    changed_ids = set(changed_ids)
+    if asset_sources is not None:
+        layout["asset_sources"] = asset_sources
+    if not changed_ids:
+        return layout
+    
+    auto_match_pool, source_sets = build_match_pool(layout.get("asset_sources") or {})
+    layout["auto_match_pool"] = list(auto_match_pool.keys())
+    manual_mappings = manual_mappings or {}
+    by_id = {el["id"]: el for el in compiled["elements"]} if compiled else {}
+    
+    def refresh(el):
+        if el["id"] not in changed_ids:
+            return el
+        if el["id"] in by_id:
+            return resolve_element(by_id[el["id"]], auto_match_pool, source_sets, manual_mappings)
+        if el["id"] in manual_mappings:
+            return apply_manual_mapping(copy.deepcopy(el), manual_mappings[el["id"]])
+        return el
+    
+    layout["elements"] = [refresh(el) for el in layout["elements"]]
+    return layout
+
+def harvest_ppt(pptx_path, target_dims=None, asset_sources=None, manual_mappings=None):
+    try:
+        compiled = get_compiled_layout(pptx_path, target_dims)
+        if compiled is None:
+            return None
+        return resolve_layout(compiled, asset_sources, manual_mappings)
         
     except Exception as e:
         st.error(f"Extraction failed: {e}")
@@ -391,6 +548,17 @@ def harvest_ppt(pptx_path, target_dims=None, asset_sources=None, manual_mappings
         st.code(traceback.format_exc())
         return None
 
+def export_layout_json(layout):
+    """Serialize a resolved layout (plus schema version) for download."""
+    return json.dumps({"version": LAYOUT_CACHE_VERSION, "layout": layout}, indent=2)
+
+def import_layout_json(data):
+    """Inverse of export_layout_json; returns None for other schema versions."""
+    payload = json.loads(data)
+    if payload.get("version") != LAYOUT_CACHE_VERSION or "layout" not in payload:
+        return None
+    return _restore_tuples(payload["layout"])
+
 _font_cache = {}
 
 def get_font_cached(font_path, size, bold=False, italic=False):
@@ -498,124 +666,619 @@ def render_text_paragraphs(text_props, box_w, box_h, font_path):
     
     return np.array(img)
 
-def render_frame(layout, user_data, font_path, bg_settings):
+def render_background(layout, bg_settings):
     w, h = layout['canvas']['w'], layout['canvas']['h']
     
     bg_type = bg_settings.get('type', 'pptx')
     bg_value = bg_settings.get('value')
     
     if bg_type == 'image' and isinstance(bg_value, Image.Image):
-        frame = np.array(bg_value.resize((w, h), Image.Resampling.LANCZOS))
+        return np.array(bg_value.convert('RGB').resize((w, h), Image.Resampling.LANCZOS))
     elif bg_type == 'color' and isinstance(bg_value, tuple):
-        frame = np.full((h, w, 3), bg_value, dtype=np.uint8)
+        return np.full((h, w, 3), bg_value, dtype=np.uint8)
     elif bg_type == 'pptx':
-        frame = np.full((h, w, 3), layout['pptx_background'], dtype=np.uint8)
-    else:
-        frame = np.full((h, w, 3), (245, 245, 245), dtype=np.uint8)
+        return np.full((h, w, 3), layout['pptx_background'], dtype=np.uint8)
+    return np.full((h, w, 3), (245, 245, 245), dtype=np.uint8)
+
+# Resized assets are full-size RGBA arrays; bound the cache by bytes, not entries
+ASSET_CACHE_BYTES = 256 * 1024 * 1024
+
+@st.cache_resource
+def _asset_cache():
+    """LRU of resized assets shared across reruns: {'entries': OrderedDict, 'bytes': int, 'lock'}"""
+    return {'entries': OrderedDict(), 'bytes': 0, 'lock': threading.Lock()}
+
+def load_asset_rgba(img_path, w, h):
+    """Resized RGBA asset, cached per (path, size, mtime) so repeated renders skip decode + LANCZOS."""
+    key = (str(img_path), w, h, os.path.getmtime(img_path))
+    cache = _asset_cache()
+    with cache['lock']:
+        if key in cache['entries']:
+            cache['entries'].move_to_end(key)
+            return cache['entries'][key]
     
-    pil_img = Image.fromarray(frame)
-    draw = ImageDraw.Draw(pil_img)
+    asset_img = Image.open(img_path).convert('RGBA')
+    arr = np.array(asset_img.resize((w, h), Image.Resampling.LANCZOS))
+    if arr.nbytes > ASSET_CACHE_BYTES:
+        return arr
     
-    for el in layout['elements']:
-        x, y, ew, eh = el['x'], el['y'], el['w'], el['h']
+    with cache['lock']:
+        if key not in cache['entries']:
+            cache['entries'][key] = arr
+            cache['bytes'] += arr.nbytes
+        while cache['bytes'] > ASSET_CACHE_BYTES:
+            _, evicted = cache['entries'].popitem(last=False)
+            cache['bytes'] -= evicted.nbytes
+    return arr
+
+def element_text(el, user_data):
+    return user_data.get(el['id'], el.get('text_default', ''))
+
+def render_element(el, user_data, font_path):
+    """Rasterize one element into a straight-alpha RGBA array of its box size (or None)."""
+    ew, eh = el['w'], el['h']
+    if ew <= 0 or eh <= 0:
+        return None
+    
+    if el['type'] == 'shape':
+        fill = el.get('fill_color', (200, 200, 200))
+        line = el.get('line_color', (100, 100, 100))
+        line_w = el.get('line_width', 1)
         
-        if x < -ew or y < -eh or x >= w or y >= h:
-            continue
+        if not isinstance(fill, tuple):
+            fill = (200, 200, 200)
+        if not isinstance(line, tuple):
+            line = (100, 100, 100)
         
-        if el['type'] == 'shape':
-            fill = el.get('fill_color', (200, 200, 200))
-            line = el.get('line_color', (100, 100, 100))
-            line_w = el.get('line_width', 1)
-            
-            if not isinstance(fill, tuple):
-                fill = (200, 200, 200)
-            if not isinstance(line, tuple):
-                line = (100, 100, 100)
-            
-            draw.rectangle([x, y, x+ew, y+eh], fill=fill, outline=line, width=max(line_w, 1))
+        img = Image.new("RGBA", (ew + 1, eh + 1), (0, 0, 0, 0))
+        ImageDraw.Draw(img).rectangle([0, 0, ew, eh], fill=fill, outline=line, width=max(line_w, 1))
+        return np.array(img)
+    
+    if el['type'] == 'image':
+        img_path = el.get('image_path')
         
-        elif el['type'] == 'image':
-            img_path = el.get('image_path')
-            
-            if img_path and Path(img_path).exists():
-                try:
-                    asset_img = Image.open(img_path).convert('RGBA')
-                    asset_img = asset_img.resize((ew, eh), Image.Resampling.LANCZOS)
-                    pil_img.paste(asset_img, (x, y), asset_img)
-                except Exception as e:
-                    draw.rectangle([x, y, x+ew, y+eh], fill=(255, 0, 0))
-                    draw.text((x+5, y+5), "ERR", fill=(255, 255, 255))
-            else:
-                # MISSING IMAGE - Show placeholder
-                draw.rectangle([x, y, x+ew, y+eh], fill=(220, 220, 220), outline=(255, 100, 100), width=2)
-                
-                suggestion = el.get('suggested_filename', 'image.png')
-                label = "Missing"
-                
-                max_chars = max(10, ew // 8)
-                if len(suggestion) > max_chars:
-                    suggestion = suggestion[:max_chars-3] + "..."
-                
-                try:
-                    font = get_font_cached(font_path, 12)
-                except:
-                    font = get_font_cached(None, 12)
-                
-                bbox = draw.textbbox((0, 0), label, font=font)
-                text_w = bbox[2] - bbox[0]
-                text_x = x + (ew - text_w) // 2
-                text_y = y + eh // 3
-                draw.text((text_x, text_y), label, fill=(100, 100, 100), font=font)
-                
-                bbox2 = draw.textbbox((0, 0), suggestion, font=font)
-                text_w2 = bbox2[2] - bbox2[0]
-                text_x2 = x + (ew - text_w2) // 2
-                draw.text((text_x2, text_y + 15), suggestion, fill=(150, 50, 50), font=font)
+        if img_path and Path(img_path).exists():
+            try:
+                return load_asset_rgba(img_path, ew, eh)
+            except Exception:
+                img = Image.new("RGBA", (ew + 1, eh + 1), (255, 0, 0, 255))
+                ImageDraw.Draw(img).text((5, 5), "ERR", fill=(255, 255, 255))
+                return np.array(img)
         
-        elif el['type'] == 'text':
-            text = user_data.get(el['id'], el.get('text_default', ''))
-            
-            text_props = el.get('text_props', {}).copy()
-            if text_props and text != el.get('text_default', ''):
-                if text_props.get('paragraphs'):
-                    text_props['paragraphs'][0]['text'] = text
-            
-            if text_props and text_props.get('paragraphs'):
-                text_array = render_text_paragraphs(text_props, ew, eh, font_path)
-                
-                if text_array.shape[0] > 0 and text_array.shape[1] > 0:
-                    y_end = min(y + eh, h)
-                    x_end = min(x + ew, w)
-                    h_actual = y_end - y
-                    w_actual = x_end - x
-                    
-                    if h_actual > 0 and w_actual > 0:
-                        text_crop = text_array[:h_actual, :w_actual]
-                        
-                        alpha = text_crop[:, :, 3:4].astype(np.float32) / 255.0
-                        rgb_layer = text_crop[:, :, :3].astype(np.float32)
-                        roi = frame[y:y_end, x:x_end].astype(np.float32)
-                        
-                        blended = (rgb_layer * alpha + roi * (1 - alpha)).astype(np.uint8)
-                        frame[y:y_end, x:x_end] = blended
+        # MISSING IMAGE - Show placeholder
+        img = Image.new("RGBA", (ew + 1, eh + 1), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle([0, 0, ew, eh], fill=(220, 220, 220), outline=(255, 100, 100), width=2)
+        
+        suggestion = el.get('suggested_filename', 'image.png')
+        label = "Missing"
+        
+        max_chars = max(10, ew // 8)
+        if len(suggestion) > max_chars:
+            suggestion = suggestion[:max_chars-3] + "..."
+        
+        try:
+            font = get_font_cached(font_path, 12)
+        except:
+            font = get_font_cached(None, 12)
+        
+        bbox = draw.textbbox((0, 0), label, font=font)
+        text_w = bbox[2] - bbox[0]
+        text_x = (ew - text_w) // 2
+        text_y = eh // 3
+        draw.text((text_x, text_y), label, fill=(100, 100, 100), font=font)
+        
+        bbox2 = draw.textbbox((0, 0), suggestion, font=font)
+        text_w2 = bbox2[2] - bbox2[0]
+        draw.text(((ew - text_w2) // 2, text_y + 15), suggestion, fill=(150, 50, 50), font=font)
+        return np.array(img)
+    
+    if el['type'] == 'text':
+        text = element_text(el, user_data)
+        
+        text_props = el.get('text_props') or {}
+        if not text_props.get('paragraphs'):
+            return None
+        
+        # Copy paragraphs: rendering writes computed_lines and the override must not leak into the layout
+        text_props = {**text_props, 'paragraphs': [dict(p) for p in text_props['paragraphs']]}
+        if text != el.get('text_default', ''):
+            text_props['paragraphs'][0]['text'] = text
+        
+        return render_text_paragraphs(text_props, ew, eh, font_path)
+    
+    return None
+
+def is_visible(el, w, h):
+    return not (el['x'] < -el['w'] or el['y'] < -el['h'] or el['x'] >= w or el['y'] >= h)
+
+def render_frame(layout, user_data, font_path, bg_settings):
+    w, h = layout['canvas']['w'], layout['canvas']['h']
+    frame = render_background(layout, bg_settings)
+    
+    for el in layout['elements']:
+        if not is_visible(el, w, h):
+            continue
+        raster = render_element(el, user_data, font_path)
+        if raster is not None:
+            blend_over(frame, raster, el['x'], el['y'], premultiplied=False)
     
     return frame
 
-def encode_video(frames, fps, output_path):
-    h, w = frames[0].shape[:2]
-    for codec in ['mp4v', 'avc1']:
+# ============== LIVE PREVIEW ==============
+
+def element_signature(el, user_data, font_path):
+    """Everything that affects an element's pixels; a change means its raster is dirty."""
+    img_path = el.get('image_path')
+    try:
+        mtime = os.path.getmtime(img_path) if img_path else None
+    except OSError:
+        mtime = None
+    return (
+        el['type'], el['x'], el['y'], el['w'], el['h'],
+        img_path, mtime, el.get('suggested_filename'),
+        el.get('fill_color'), el.get('line_color'), el.get('line_width'),
+        element_text(el, user_data) if el['type'] == 'text' else None,
+        json.dumps(el.get('text_props'), sort_keys=True, default=str) if el['type'] == 'text' else None,
+        font_path if el['type'] in ('text', 'image') else None,
+    )
+
+def background_signature(layout, bg_settings):
+    value = bg_settings.get('value')
+    value_key = (bg_settings.get('path'), bg_settings.get('mtime')) if isinstance(value, Image.Image) else value
+    return (layout['canvas']['w'], layout['canvas']['h'], tuple(layout['pptx_background']),
+            bg_settings.get('type'), value_key)
+
+class PreviewRenderer:
+    """Downscaled live preview that only re-rasterizes elements whose inputs changed.
+    
+    Each element keeps a cached preview-scale sprite keyed by its signature.
+    When a few elements change, only their old and new boxes are
+    recomposited from the cached background; an unchanged call returns the
+    memoized frame.
+    """
+    
+    def __init__(self, max_width=960):
+        self.max_width = max_width
+        self.scale = 1.0
+        self.bg_key = None
+        self.background = None
+        self.frame = None
+        self.sprites = {}
+        self.order = []
+        self.last_stats = {}
+    
+    def _prepare_sprite(self, el, user_data, font_path, signature):
+        raster = render_element(el, user_data, font_path)
+        if raster is None:
+            return None
+        if self.scale < 1.0:
+            h, w = raster.shape[:2]
+            size = (max(1, round(w * self.scale)), max(1, round(h * self.scale)))
+            raster = np.asarray(Image.fromarray(raster).resize(size, Image.Resampling.BILINEAR))
+        return {
+            'signature': signature,
+            'sprite': Sprite.from_rgba(raster),
+            'x': round(el['x'] * self.scale),
+            'y': round(el['y'] * self.scale),
+        }
+    
+    @staticmethod
+    def _rect(entry):
+        if not entry:
+            return None
+        w, h = entry['sprite'].size
+        return entry['x'], entry['y'], entry['x'] + w, entry['y'] + h
+    
+    def _composite(self, rect=None):
+        if rect is None:
+            target, ox, oy = self.frame, 0, 0
+            target[:] = self.background
+        else:
+            fh, fw = self.frame.shape[:2]
+            x0, y0 = max(rect[0], 0), max(rect[1], 0)
+            x1, y1 = min(rect[2], fw), min(rect[3], fh)
+            if x0 >= x1 or y0 >= y1:
+                return
+            target, ox, oy = self.frame[y0:y1, x0:x1], x0, y0
+            target[:] = self.background[y0:y1, x0:x1]
+        
+        for el_id in self.order:
+            entry = self.sprites.get(el_id)
+            if entry:
+                blend_over(target, entry['sprite'], entry['x'] - ox, entry['y'] - oy)
+    
+    def render(self, layout, user_data, font_path, bg_settings):
+        w, h = layout['canvas']['w'], layout['canvas']['h']
+        scale = min(1.0, self.max_width / w) if w else 1.0
+        bg_key = background_signature(layout, bg_settings) + (scale,)
+        order = [el['id'] for el in layout['elements'] if is_visible(el, w, h)]
+        
+        full = bg_key != self.bg_key or order != self.order or self.frame is None
+        if bg_key != self.bg_key:
+            self.scale = scale
+            self.sprites = {}
+            bg = render_background(layout, bg_settings)
+            if scale < 1.0:
+                bg = np.asarray(Image.fromarray(bg).resize(
+                    (max(1, round(w * scale)), max(1, round(h * scale))), Image.Resampling.BILINEAR))
+            self.background = np.ascontiguousarray(bg)
+            self.frame = self.background.copy()
+            self.bg_key = bg_key
+        self.order = order
+        
+        dirty_rects = []
+        rerendered = 0
+        by_id = {el['id']: el for el in layout['elements']}
+        for el_id in order:
+            el = by_id[el_id]
+            signature = element_signature(el, user_data, font_path)
+            old = self.sprites.get(el_id)
+            if old and old['signature'] == signature:
+                continue
+            new = self._prepare_sprite(el, user_data, font_path, signature)
+            self.sprites[el_id] = new
+            rerendered += 1
+            dirty_rects.extend(r for r in (self._rect(old), self._rect(new)) if r)
+        
+        for el_id in set(self.sprites) - set(order):
+            dirty_rects.append(self._rect(self.sprites.pop(el_id)))
+        
+        if full:
+            self._composite()
+        else:
+            for rect in dirty_rects:
+                if rect:
+                    self._composite(rect)
+        
+        self.last_stats = {'rerendered': rerendered, 'elements': len(order), 'full': full}
+        return self.frame
+
+class VideoEncoder(ABC):
+    """Streaming encoder interface: open() probes, write() takes RGB frames, close() finalizes."""
+    name = "base"
+    
+    def __init__(self, output_path, fps, size):
+        self.output_path = output_path
+        self.fps = fps
+        self.w, self.h = size
+        self.frames_written = 0
+    
+    @classmethod
+    def available(cls):
+        return False
+    
+    @abstractmethod
+    def open(self):
+        """Start the stream; False when this backend cannot encode here."""
+    
+    @abstractmethod
+    def write(self, frame):
+        """Append one RGB(A) uint8 frame."""
+    
+    @abstractmethod
+    def close(self):
+        """Finalize the file; True when it was written successfully."""
+
+@functools.lru_cache(maxsize=1)
+def find_ffmpeg():
+    """Locate an ffmpeg binary: PATH first, then the one bundled with imageio-ffmpeg (moviepy)."""
+    path = shutil.which("ffmpeg")
+    if path:
+        return path
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except:
+        return None
+
+@functools.lru_cache(maxsize=4)
+def ffmpeg_has_encoder(ffmpeg_path, encoder):
+    try:
+        out = subprocess.run(
+            [ffmpeg_path, "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10
+        ).stdout
+        return any(line.split()[1:2] == [encoder] for line in out.splitlines() if line.strip())
+    except:
+        return False
+
+class FFmpegPipeEncoder(VideoEncoder):
+    """libx264/yuv420p via an ffmpeg subprocess fed raw RGB on stdin."""
+    name = "ffmpeg-libx264"
+    
+    def __init__(self, output_path, fps, size, preset="veryfast", crf=23):
+        super().__init__(output_path, fps, size)
+        self.preset = preset
+        self.crf = crf
+        self.proc = None
+    
+    @classmethod
+    def available(cls):
+        ffmpeg = find_ffmpeg()
+        return bool(ffmpeg) and ffmpeg_has_encoder(ffmpeg, "libx264")
+    
+    def open(self):
+        if not self.available():
+            return False
+        # yuv420p needs even dimensions
+        out_w, out_h = self.w - self.w % 2, self.h - self.h % 2
+        cmd = [
+            find_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", f"{self.w}x{self.h}", "-r", str(self.fps),
+            "-i", "-",
+            "-vf", f"crop={out_w}:{out_h}:0:0",
+            "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf),
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            self.output_path,
+        ]
+        try:
+            self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return True
+        except OSError:
+            self.proc = None
+            return False
+    
+    def write(self, frame):
+        self.proc.stdin.write(np.ascontiguousarray(frame[:, :, :3], dtype=np.uint8).data)
+        self.frames_written += 1
+    
+    def close(self):
+        if not self.proc:
+            return False
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        return self.proc.wait() == 0
+
+@functools.lru_cache(maxsize=1)
+def probe_opencv_codec():
+    """Return the first fourcc this OpenCV build can actually open, preferring web-playable avc1."""
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as probe:
+        probe_path = probe.name
+    for codec in ['avc1', 'mp4v']:
         try:
-            fourcc = cv2.VideoWriter_fourcc(*codec)
-            writer = cv2.VideoWriter(output_path, fourcc, fps, (w, h))
-            if writer.isOpened():
-                for frame in frames:
-                    writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
-                writer.release()
-                if os.path.exists(output_path) and os.path.getsize(output_path) > 1024:
-                    return True
+            writer = cv2.VideoWriter(probe_path, cv2.VideoWriter_fourcc(*codec), 1, (16, 16))
+            opened = writer.isOpened()
+            writer.release()
+            if opened:
+                return codec
         except:
             continue
-    return False
+        finally:
+            if os.path.exists(probe_path):
+                os.unlink(probe_path)
+    return None
+
+class OpenCVEncoder(VideoEncoder):
+    """cv2.VideoWriter fallback; converts into a reused BGR buffer instead of a fresh copy per frame."""
+    name = "opencv"
+    
+    def __init__(self, output_path, fps, size, **kwargs):
+        super().__init__(output_path, fps, size)
+        self.writer = None
+        self.codec = None
+        self._bgr = np.empty((self.h, self.w, 3), dtype=np.uint8)
+    
+    @classmethod
+    def available(cls):
+        return probe_opencv_codec() is not None
+    
+    def open(self):
+        self.codec = probe_opencv_codec()
+        if not self.codec:
+            return False
+        self.writer = cv2.VideoWriter(self.output_path, cv2.VideoWriter_fourcc(*self.codec),
+                                      self.fps, (self.w, self.h))
+        return self.writer.isOpened()
+    
+    def write(self, frame):
+        cv2.cvtColor(frame[:, :, :3], cv2.COLOR_RGB2BGR, dst=self._bgr)
+        self.writer.write(self._bgr)
+        self.frames_written += 1
+    
+    def close(self):
+        if not self.writer:
+            return False
+        self.writer.release()
+        return os.path.exists(self.output_path) and os.path.getsize(self.output_path) > 1024
+
+# Tried in order; the first backend that probes OK encodes the whole stream
+ENCODER_BACKENDS = [FFmpegPipeEncoder, OpenCVEncoder]
+
+def open_encoder(output_path, fps, size, preset="veryfast", crf=23, backends=None):
+    for backend in backends or ENCODER_BACKENDS:
+        if not backend.available():
+            continue
+        encoder = backend(output_path, fps, size, preset=preset, crf=crf)
+        if encoder.open():
+            return encoder
+    return None
+
+def encode_video(frames, fps, output_path, preset="veryfast", crf=23):
+    """Stream RGB frames to output_path.
+    
+    frames is a callable returning a fresh iterable (so a backend that fails
+    mid-stream, e.g. ffmpeg dying, can fall back to the next one) or a plain
+    iterable (no fallback once frames were consumed).
+    Returns a stats dict (backend, frames, seconds, encode_fps, size_bytes) or None on failure.
+    """
+    replayable = callable(frames)
+    remaining = list(ENCODER_BACKENDS)
+    while remaining:
+        stream = iter(frames() if replayable else frames)
+        try:
+            first = next(stream)
+        except StopIteration:
+            return None
+        
+        h, w = first.shape[:2]
+        encoder = open_encoder(output_path, fps, (w, h), preset=preset, crf=crf, backends=remaining)
+        if not encoder:
+            return None
+        remaining = remaining[remaining.index(type(encoder)) + 1:]
+        
+        start = time.perf_counter()
+        try:
+            encoder.write(first)
+            for frame in stream:
+                encoder.write(frame)
+            ok = encoder.close()
+        except Exception:
+            encoder.close()
+            ok = False
+        elapsed = time.perf_counter() - start
+        
+        if ok and os.path.exists(output_path):
+            break
+        if not replayable:
+            return None
+    else:
+        return None
+    
+    return {
+        'backend': encoder.name if encoder.name != 'opencv' else f"opencv-{encoder.codec}",
+        'frames': encoder.frames_written,
+        'seconds': elapsed,
+        'encode_fps': encoder.frames_written / elapsed if elapsed > 0 else float('inf'),
+        'size_bytes': os.path.getsize(output_path),
+    }
+
+# ============== BATCH MERGE ==============
+
+BATCH_FORMATS = {"PNG": "png", "JPEG": "jpg", "MP4": "mp4"}
+
+def load_records(file_name, data):
+    """Read a CSV or Parquet upload into a DataFrame."""
+    if Path(file_name).suffix.lower() == '.parquet':
+        return pd.read_parquet(BytesIO(data))
+    return pd.read_csv(BytesIO(data), dtype=str, keep_default_na=False)
+
+def _record_value(record, column):
+    value = record.get(column)
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = str(value)
+    return value if value.strip() else None
+
+def compile_batch_plan(layout, column_map, user_data, font_path, bg_settings):
+    """Prerender everything the records cannot change.
+    
+    Elements below the first mapped element are flattened into one base
+    frame; static elements above it are kept as premultiplied sprites so
+    each record only rasterizes its own mapped elements.
+    """
+    w, h = layout['canvas']['w'], layout['canvas']['h']
+    visible = [el for el in layout['elements'] if is_visible(el, w, h)]
+    first_dynamic = next((i for i, el in enumerate(visible) if el['id'] in column_map), len(visible))
+    
+    base = render_frame({**layout, 'elements': visible[:first_dynamic]}, user_data, font_path, bg_settings)
+    
+    overlays = []
+    for el in visible[first_dynamic:]:
+        if el['id'] in column_map:
+            overlays.append((el, None))
+        else:
+            raster = render_element(el, user_data, font_path)
+            if raster is not None:
+                overlays.append((el, Sprite.from_rgba(raster)))
+    
+    return {'base': base, 'overlays': overlays, 'column_map': dict(column_map), 'user_data': dict(user_data)}
+
+def render_record(plan, record, font_path, image_dir=None):
+    frame = plan['base'].copy()
+    
+    for el, sprite in plan['overlays']:
+        if sprite is not None:
+            blend_over(frame, sprite, el['x'], el['y'])
+            continue
+        
+        value = _record_value(record, plan['column_map'][el['id']])
+        user_data = plan['user_data']
+        if value is not None:
+            if el['type'] == 'text':
+                user_data = {**user_data, el['id']: value}
+            else:
+                img_path = Path(value)
+                if image_dir and not img_path.is_absolute():
+                    img_path = Path(image_dir) / img_path
+                el = {**el, 'type': 'image', 'image_path': str(img_path)}
+        
+        raster = render_element(el, user_data, font_path)
+        if raster is not None:
+            blend_over(frame, raster, el['x'], el['y'], premultiplied=False)
+    
+    return frame
+
+def _record_filename(record, index, name_column, used):
+    base = _record_value(record, name_column) if name_column else None
+    base = re.sub(r'[^\w\s-]', '', base).strip().replace(' ', '_') if base else ""
+    base = base or f"record_{index + 1:05d}"
+    name, n = base, 2
+    while name in used:
+        name, n = f"{base}_{n}", n + 1
+    used.add(name)
+    return name
+
+def run_batch_merge(layout, records, column_map, user_data, font_path, bg_settings,
+                    fmt="png", zip_path=None, out_dir=None, name_column=None, image_dir=None,
+                    fps=30, duration=3, progress_callback=None):
+    """Render every record against one compiled plan, streaming outputs to a ZIP or directory.
+    
+    Returns stats: records, seconds, records_per_sec, output.
+    """
+    plan = compile_batch_plan(layout, column_map, user_data, font_path, bg_settings)
+    rows = records.to_dict('records') if hasattr(records, 'to_dict') else list(records)
+    total = len(rows)
+    used_names = set()
+    
+    if out_dir:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+    zf = zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_STORED) if zip_path else None
+    
+    start = time.perf_counter()
+    try:
+        for i, record in enumerate(rows):
+            frame = render_record(plan, record, font_path, image_dir)
+            name = f"{_record_filename(record, i, name_column, used_names)}.{fmt}"
+            
+            if fmt == "mp4":
+                with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
+                    tmp_video = tmp.name
+                try:
+                    if not encode_video(lambda: (frame for _ in range(int(fps * duration))), fps, tmp_video):
+                        raise RuntimeError("no working video encoder")
+                    if zf:
+                        zf.write(tmp_video, name)
+                    if out_dir:
+                        shutil.copyfile(tmp_video, Path(out_dir) / name)
+                finally:
+                    os.unlink(tmp_video)
+            else:
+                buf = BytesIO()
+                Image.fromarray(frame).save(buf, format="JPEG" if fmt == "jpg" else "PNG",
+                                            **({'quality': 92} if fmt == "jpg" else {}))
+                if zf:
+                    zf.writestr(name, buf.getvalue())
+                if out_dir:
+                    (Path(out_dir) / name).write_bytes(buf.getvalue())
+            
+            if progress_callback:
+                progress_callback(i + 1, total)
+    finally:
+        if zf:
+            zf.close()
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'records': total,
+        'seconds': elapsed,
+        'records_per_sec': total / elapsed if elapsed > 0 else float('inf'),
+        'output': zip_path or out_dir,
+    }
 
 def main():
     st.title("🏭 PPTX Video Factory")
@@ -635,6 +1298,7 @@ def main():
         'current_template': None,
         'selected_element': None,
         'uploaded_images': {},
+        'preview_renderer': None,
     }
     for key, val in defaults.items():
         if key not in st.session_state:
@@ -759,11 +1423,12 @@ def main():
                             
                             if selected != "(Select existing...)":
                                 st.session_state.manual_mappings[el_id] = manual_pool[selected]
-                                layout = harvest_ppt(
-                                    st.session_state.pptx_path,
-                                    target,
-                                    st.session_state.asset_sources,
-                                    st.session_state.manual_mappings
+                                compiled = compiled_for_layout(st.session_state.layout, st.session_state.pptx_path, target)
+                                layout = update_layout_mappings(
+                                    st.session_state.layout,
+                                    compiled,
+                                    st.session_state.manual_mappings,
+                                    [el_id]
                                 )
                                 st.session_state.layout = layout
                                 st.success(f"Mapped {el_id} to {selected}")
@@ -785,11 +1450,14 @@ def main():
                             st.session_state.asset_sources['uploaded'] = st.session_state.uploaded_images
                             st.session_state.manual_mappings[el_id] = str(temp_path)
                             
-                            layout = harvest_ppt(
-                                st.session_state.pptx_path,
-                                target,
-                                st.session_state.asset_sources,
-                                st.session_state.manual_mappings
+                            # New pool images can only fill gaps; existing matches are kept
+                            compiled = compiled_for_layout(st.session_state.layout, st.session_state.pptx_path, target)
+                            layout = update_layout_mappings(
+                                st.session_state.layout,
+                                compiled,
+                                st.session_state.manual_mappings,
+                                missing_image_ids(st.session_state.layout) + [el_id],
+                                st.session_state.asset_sources
                             )
                             st.session_state.layout = layout
                             st.success(f"Uploaded and mapped to {el_id}")
@@ -820,11 +1488,13 @@ def main():
                     st.session_state.asset_sources['uploaded'] = st.session_state.uploaded_images
                     st.success(f"Added {added} images to pool")
                     
-                    layout = harvest_ppt(
-                        st.session_state.pptx_path,
-                        target,
-                        st.session_state.asset_sources,
-                        st.session_state.manual_mappings
+                    compiled = compiled_for_layout(layout, st.session_state.pptx_path, target)
+                    layout = update_layout_mappings(
+                        layout,
+                        compiled,
+                        st.session_state.manual_mappings,
+                        missing_image_ids(layout),
+                        st.session_state.asset_sources
                     )
                     st.session_state.layout = layout
                     st.rerun()
@@ -842,19 +1512,45 @@ def main():
             if selected_template != "(Current)" and selected_template in st.session_state.templates:
                 if st.button("Load"):
                     template_data = st.session_state.templates[selected_template]
-                    st.session_state.manual_mappings = template_data.get('mappings', {})
+                    old_mappings = st.session_state.manual_mappings
+                    new_mappings = template_data.get('mappings', {})
+                    changed = {k for k in old_mappings.keys() | new_mappings.keys()
+                               if old_mappings.get(k) != new_mappings.get(k)}
+                    st.session_state.manual_mappings = dict(new_mappings)
                     st.session_state.bg_settings = template_data.get('bg', {'type': 'pptx', 'value': None})
-                    layout = harvest_ppt(
-                        st.session_state.pptx_path,
-                        target,
-                        st.session_state.asset_sources,
-                        st.session_state.manual_mappings
+                    compiled = compiled_for_layout(layout, st.session_state.pptx_path, target)
+                    layout = update_layout_mappings(
+                        layout,
+                        compiled,
+                        st.session_state.manual_mappings,
+                        changed
                     )
                     st.session_state.layout = layout
                     st.session_state.current_template = selected_template
                     st.success(f"Loaded: {selected_template}")
                     st.rerun()
             
+            st.download_button(
+                "Export Layout JSON",
+                export_layout_json(layout),
+                f"{st.session_state.pptx_name or 'layout'}.layout.json",
+                mime="application/json"
+            )
+            layout_file = st.file_uploader("Import Layout JSON", type=['json'], key="layout_import")
+            if layout_file and st.button("Import Layout"):
+                imported = import_layout_json(layout_file.getvalue())
+                if imported:
+                    st.session_state.layout = imported
+                    st.session_state.user_data = {
+                        el['id']: el.get('text_default', '')
+                        for el in imported['elements']
+                        if el.get('type') == 'text'
+                    }
+                    st.success("Layout imported")
+                    st.rerun()
+                else:
+                    st.error(f"Unsupported layout file (expected version {LAYOUT_CACHE_VERSION})")
+            
             new_template_name = st.text_input("Save As", value=st.session_state.current_template or st.session_state.pptx_name or "")
             if st.button("Save Current") and new_template_name:
                 st.session_state.templates[new_template_name] = {
@@ -893,8 +1589,15 @@ def main():
                     bg_name = st.selectbox("Select", list(all_bg.keys()), key="bg_select")
                     if bg_name:
                         try:
-                            bg_img = Image.open(all_bg[bg_name]).convert('RGB')
-                            st.session_state.bg_settings = {'type': 'image', 'value': bg_img}
+                            bg_path = str(all_bg[bg_name])
+                            bg_mtime = os.path.getmtime(bg_path)
+                            current = st.session_state.bg_settings
+                            # Reopen only when the file changed so the preview keeps its cached background
+                            if current.get('path') != bg_path or current.get('mtime') != bg_mtime:
+                                bg_img = Image.open(bg_path).convert('RGB')
+                                st.session_state.bg_settings = {
+                                    'type': 'image', 'value': bg_img, 'path': bg_path, 'mtime': bg_mtime,
+                                }
                         except Exception as e:
                             st.error(f"Error: {e}")
             
@@ -902,8 +1605,10 @@ def main():
             st.header("5. Export")
             fps = st.slider("FPS", 6, 60, 30)
             duration = st.slider("Sec", 1, 30, 5)
+            quality = st.select_slider("Quality", ["Draft", "Good", "Best"], "Good")
             st.session_state.export_fps = fps
             st.session_state.export_duration = duration
+            st.session_state.export_quality = quality
     
     if not st.session_state.layout:
         st.info("""
@@ -938,13 +1643,18 @@ def main():
         missing_count = len([e for e in layout['elements'] if e.get('type') == 'image' and not e.get('image_path')])
         st.caption(f"Sources: {', '.join(sources)} | BG: {bg_info} | Missing: {missing_count}")
         
-        frame = render_frame(
+        if st.session_state.preview_renderer is None:
+            st.session_state.preview_renderer = PreviewRenderer()
+        preview = st.session_state.preview_renderer
+        frame = preview.render(
             layout, 
             st.session_state.user_data, 
             st.session_state.font_path, 
             st.session_state.bg_settings
         )
         st.image(frame, use_container_width=True)
+        stats = preview.last_stats
+        st.caption(f"Preview {frame.shape[1]}x{frame.shape[0]} | re-rendered {stats['rerendered']}/{stats['elements']} elements")
     
     with st.expander(f"Elements ({len(layout['elements'])})"):
         for el in layout['elements']:
@@ -974,22 +1684,37 @@ def main():
                 fps = st.session_state.export_fps
                 duration = st.session_state.export_duration
                 total_frames = int(fps * duration)
+                preset, crf = {
+                    'Draft': ('ultrafast', 28),
+                    'Good': ('veryfast', 23),
+                    'Best': ('slow', 20),
+                }[st.session_state.get('export_quality', 'Good')]
                 
-                frames = []
-                for i in range(total_frames):
-                    frame = render_frame(
-                        layout, 
-                        st.session_state.user_data, 
-                        st.session_state.font_path, 
-                        st.session_state.bg_settings
-                    )
-                    frames.append(frame)
+                # The layout is static, so one render is streamed for every frame
+                frame = render_frame(
+                    layout, 
+                    st.session_state.user_data, 
+                    st.session_state.font_path, 
+                    st.session_state.bg_settings
+                )
+                frames = lambda: (frame for _ in range(total_frames))
                 
-                out = tempfile.mktemp(suffix=".mp4")
-                if encode_video(frames, fps, out):
-                    with open(out, "rb") as f:
-                        st.video(f.read())
-                        st.download_button("DL MP4", f, "vid.mp4", mime="video/mp4")
+                with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
+                    out = tmp.name
+                try:
+                    stats = encode_video(frames, fps, out, preset=preset, crf=crf)
+                    if stats:
+                        st.caption(
+                            f"{stats['backend']} | {stats['frames']} frames in {stats['seconds']:.2f}s "
+                            f"({stats['encode_fps']:.0f} fps) | {stats['size_bytes'] / 1024:.0f} KB"
+                        )
+                        with open(out, "rb") as f:
+                            video_bytes = f.read()
+                        st.video(video_bytes)
+                        st.download_button("DL MP4", video_bytes, "vid.mp4", mime="video/mp4")
+                    else:
+                        st.error("Video encoding failed: no working encoder backend")
+                finally:
                     os.unlink(out)
     
     with b:
@@ -1007,6 +1732,67 @@ def main():
             with open(buf.name, "rb") as f:
                 st.download_button("DL PNG", f, "frame.png", mime="image/png")
             os.unlink(buf.name)
+    
+    st.subheader("📑 Batch Merge")
+    with st.expander("Render one output per CSV/Parquet record"):
+        data_file = st.file_uploader("Records", type=['csv', 'parquet'], key="batch_records")
+        if data_file:
+            try:
+                records = load_records(data_file.name, data_file.getvalue())
+            except Exception as e:
+                st.error(f"Could not read records: {e}")
+                records = None
+            
+            if records is not None:
+                st.caption(f"{len(records)} records, columns: {', '.join(map(str, records.columns))}")
+                columns = ["(static)"] + [str(c) for c in records.columns]
+                
+                column_map = {}
+                for el in layout['elements']:
+                    if el.get('type') not in ('text', 'image'):
+                        continue
+                    icon = "📝" if el['type'] == 'text' else "🖼️"
+                    choice = st.selectbox(f"{icon} {el['id']}", columns, key=f"batch_col_{el['id']}")
+                    if choice != "(static)":
+                        column_map[el['id']] = choice
+                
+                c1, c2, c3 = st.columns(3)
+                fmt_label = c1.selectbox("Output", list(BATCH_FORMATS.keys()), key="batch_fmt")
+                name_column = c2.selectbox("File name column", ["(index)"] + columns[1:], key="batch_name")
+                image_dir = c3.text_input("Image folder (relative paths)", value=st.session_state.asset_sources.get('folder') or "")
+                out_dir = st.text_input("Also write to directory (optional)", value="", key="batch_out_dir")
+                
+                if st.button("🚀 Run Batch", type="primary", disabled=not column_map):
+                    progress = st.progress(0.0)
+                    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
+                        zip_path = tmp.name
+                    
+                    def update(done, total):
+                        progress.progress(done / max(total, 1), f"{done}/{total}")
+                    
+                    try:
+                        stats = run_batch_merge(
+                            layout, records, column_map,
+                            st.session_state.user_data,
+                            st.session_state.font_path,
+                            st.session_state.bg_settings,
+                            fmt=BATCH_FORMATS[fmt_label],
+                            zip_path=zip_path,
+                            out_dir=out_dir or None,
+                            name_column=None if name_column == "(index)" else name_column,
+                            image_dir=image_dir or None,
+                            fps=st.session_state.export_fps,
+                            duration=st.session_state.export_duration,
+                            progress_callback=update,
+                        )
+                        st.success(f"{stats['records']} records in {stats['seconds']:.1f}s ({stats['records_per_sec']:.1f} records/sec)")
+                        with open(zip_path, "rb") as f:
+                            st.download_button("DL ZIP", f.read(), "batch.zip", mime="application/zip")
+                    except Exception as e:
+                        st.error(f"Batch failed: {e}")
+                    finally:
+                        if os.path.exists(zip_path):
+                            os.unlink(zip_path)
 
 if __name__ == "__main__":
     main()
@@ -13,7 +13,18 @@ import time
 import pandas as pd
 from transformers import pipeline
 import re
+import hashlib
 import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from jumia_parser import PARSER_BACKENDS, parse_products, parse_in_browser, ARTICLE_CLASS
+from jumia_crawl_state import CrawlState, content_hash
+import atexit
+import queue
+import threading
+from contextlib import contextmanager
+from selenium.common.exceptions import TimeoutException
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -24,8 +35,38 @@ st.title("Jumia Flash Sales AI Agent")
 # Target base URL
 base_url = "https://www.jumia.co.ke/phones-tablets/flash-sales/"
 
-# Initialize free Hugging Face model for text processing
-classifier = pipeline("sentiment-analysis", model="distilbert-base-uncased")
+# Initialize free Hugging Face model for text processing (once per process, not per rerun)
+RELEVANCE_MODEL = "distilbert-base-uncased"
+RELEVANCE_BATCH_SIZE = 256
+
+@st.cache_resource
+def load_classifier():
+    return pipeline("sentiment-analysis", model=RELEVANCE_MODEL)
+
+@st.cache_resource
+def relevance_cache():
+    """Title hash -> score, shared across reruns and sessions"""
+    return {}
+
+def title_key(title):
+    return hashlib.sha1(f"{RELEVANCE_MODEL}|{title}".encode("utf-8")).hexdigest()
+
+def score_titles(titles):
+    """Relevance score per title; uncached titles are scored in padded batches"""
+    cache = relevance_cache()
+    keys = [title_key(t) for t in titles]
+    missing = {}
+    for title, key in zip(titles, keys):
+        if key not in cache:
+            missing.setdefault(key, title)
+    
+    if missing:
+        classifier = load_classifier()
+        outputs = classifier(list(missing.values()), batch_size=RELEVANCE_BATCH_SIZE, truncation=True)
+        for key, output in zip(missing, outputs):
+            cache[key] = output["score"]
+    
+    return [cache[key] for key in keys]
 
 # UI Options
 query = st.text_input("Enter query (e.g., 'phones under 15000' or 'Tecno')", value="flash sales")
@@ -34,12 +75,169 @@ debug_mode = st.checkbox("Enable Debug Mode (Show Raw HTML)")
 max_pages = st.slider("Max Pages to Scrape (Requests Only)", 1, 10, 5)
 max_scrolls = st.slider("Max Page Scrolls (Selenium Only)", 1, 5, 3)
 max_retries = st.slider("Max Retries on Failure", 1, 3, 2)
+incremental = st.checkbox("Incremental crawl (skip unchanged pages, show changes since last run)", value=True)
+parser_backend = st.radio("HTML Parser", list(PARSER_BACKENDS), horizontal=True,
+                          help="lxml walks each product card once; bs4 is the original BeautifulSoup path")
 
 # Placeholder for progress
 progress_bar = st.progress(0)
 status_text = st.empty()
 csv_placeholder = st.empty()
 
+# Concurrent page fetching (Requests path)
+PROXY_URL = "https://cors.ericmwangi13.workers.dev/?url="
+PAGE_FETCH_WINDOW = 4  # pages in flight at once
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+
+http_session = requests.Session()
+http_session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=PAGE_FETCH_WINDOW))
+
+def page_url(page):
+    page_param = f"?page={page}" if page > 1 else ""
+    return f"{PROXY_URL}{urllib.parse.quote(base_url + page_param, safe=':/?#')}"
+
+def fetch_page(page, headers=None):
+    """Download one listing page through the CORS proxy; runs on a worker thread
+    
+    Returns the response; a 304 (page unchanged since the validators in
+    `headers`) is returned as-is rather than raised.
+    """
+    response = http_session.get(page_url(page), headers={**HEADERS, **(headers or {})}, timeout=15)
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
+
+@st.cache_resource
+def crawl_state():
+    return CrawlState()
+
+def fetch_pages(max_pages, parse_page, window=PAGE_FETCH_WINDOW, on_page=None, fetch=fetch_page):
+    """Fetch pages 1..max_pages with up to `window` requests in flight
+    
+    Each page is parsed as soon as it arrives. The first empty page marks the
+    end of the listing: no further pages are requested, and pages beyond it
+    that are already in flight (at most window - 1, one per worker, so none
+    sit queued) are awaited and dropped. Returns parsed listings in page order.
+    """
+    parsed = {}
+    last_page = max_pages
+    next_page = 1
+    in_flight = {}
+    
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        while in_flight or next_page <= last_page:
+            while next_page <= last_page and len(in_flight) < window:
+                in_flight[executor.submit(fetch, next_page)] = next_page
+                next_page += 1
+            
+            done, _ = wait_futures(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = in_flight.pop(future)
+                if page > last_page:
+                    continue
+                page_listings = parse_page(future.result(), page)
+                parsed[page] = page_listings
+                if on_page:
+                    on_page(page, page_listings)
+                if not page_listings:  # Stop if no more listings
+                    last_page = page - 1
+    
+    return [listing for page in sorted(parsed) if page <= last_page for listing in parsed[page]]
+
+# Warm Selenium drivers (Selenium path)
+DRIVER_POOL_SIZE = 2
+SCROLL_STABLE_SECONDS = 1.5  # stop scrolling once no new cards appear for this long
+ARTICLE_SELECTOR = "article." + ARTICLE_CLASS.replace(" ", ".")
+BLOCKED_RESOURCES = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg",
+                     "*.woff", "*.woff2", "*.ttf", "*.otf"]
+
+@st.cache_resource
+def chromedriver_path():
+    return ChromeDriverManager().install()
+
+def new_driver():
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    # Images and web fonts are never needed for extraction
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_RESOURCES})
+    return driver
+
+class DriverPool:
+    """Headless Chrome instances kept alive across reruns and handed out one at a time"""
+    
+    def __init__(self, size=DRIVER_POOL_SIZE):
+        self.idle = queue.Queue()
+        self.slots = threading.Semaphore(size)
+        self.all = []
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def driver(self):
+        self.slots.acquire()
+        try:
+            try:
+                driver = self.idle.get_nowait()
+            except queue.Empty:
+                driver = new_driver()
+                with self.lock:
+                    self.all.append(driver)
+            try:
+                yield driver
+            except Exception:
+                # A failed session may be wedged; replace it next time
+                self._discard(driver)
+                raise
+            else:
+                self.idle.put(driver)
+        finally:
+            self.slots.release()
+    
+    def _discard(self, driver):
+        with self.lock:
+            if driver in self.all:
+                self.all.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    
+    def close(self):
+        for driver in list(self.all):
+            self._discard(driver)
+
+@st.cache_resource
+def driver_pool():
+    pool = DriverPool()
+    atexit.register(pool.close)
+    return pool
+
+def scroll_until_stable(driver, max_scrolls, on_scroll=None):
+    """Scroll to the bottom until the product count stops growing
+    
+    Returns (count, stable); stable is False when max_scrolls ran out first.
+    """
+    count_js = f"return document.querySelectorAll('{ARTICLE_SELECTOR}').length;"
+    count = driver.execute_script(count_js)
+    for i in range(max_scrolls):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, SCROLL_STABLE_SECONDS, poll_frequency=0.2).until(
+                lambda d: d.execute_script(count_js) > count
+            )
+        except TimeoutException:
+            return count, True  # Nothing new loaded: the list is stable
+        count = driver.execute_script(count_js)
+        if on_scroll:
+            on_scroll(i, count)
+    return count, False
+
 # Function to parse price (e.g., "KSh 11,500" -> 11500)
 def parse_price(price_str):
     try:
@@ -61,19 +259,23 @@ def filter_products(products, query):
     
     keywords = [word.lower() for word in query.split() if word.lower() not in ["under", "phones"]]
     
-    filtered = []
-    for product in products:
-        title = product["title"].lower()
-        price = parse_price(product["price"])
-        relevance = classifier(title)[0]["score"] if keywords else 1.0
-        if price <= max_price and (not keywords or any(k in title for k in keywords)) and relevance > 0.5:
-            filtered.append(product)
+    # Cheap price/keyword prefilter first; only survivors reach the model
+    candidates = [
+        product for product in products
+        if parse_price(product["price"]) <= max_price
+        and (not keywords or any(k in product["title"].lower() for k in keywords))
+    ]
+    if not keywords or not candidates:
+        return candidates
     
-    return filtered
+    scores = score_titles([product["title"].lower() for product in candidates])
+    return [product for product, relevance in zip(candidates, scores) if relevance > 0.5]
 
 # Scraper Function
-def scrape_jumia(method, max_pages, max_scrolls, max_retries):
+def scrape_jumia(method, max_pages, max_scrolls, max_retries, backend="lxml", state=None):
+    """Returns (products, complete); complete means the end of the listing was reached"""
     all_products = []
+    complete = False
     for attempt in range(max_retries):
         try:
             status_text.write(f"Attempt {attempt + 1}/{max_retries}...")
@@ -81,72 +283,73 @@ def scrape_jumia(method, max_pages, max_scrolls, max_retries):
             
             if method == "Selenium (Dynamic Content)":
                 logger.info("Starting Selenium scrape")
-                options = Options()
-                options.add_argument("--headless")
-                options.add_argument("--no-sandbox")
-                options.add_argument("--disable-dev-shm-usage")
-                options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-                driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+                with driver_pool().driver() as driver:
+                    driver.get(base_url)
+                    wait = WebDriverWait(driver, 15)
+                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ARTICLE_SELECTOR)))
+                    progress_bar.progress(30)
+                    
+                    def on_scroll(i, count):
+                        status_text.write(f"Scroll {i + 1}: {count} listings loaded")
+                        progress_bar.progress(30 + (i + 1) * (50 // max_scrolls))
+                    
+                    _, complete = scroll_until_stable(driver, max_scrolls, on_scroll)
+                    if debug_mode:
+                        st.write("### Raw HTML Preview (First 2000 chars):")
+                        st.code(driver.page_source[:2000], language="html")
+                    products = parse_in_browser(driver)
                 
-                driver.get(base_url)
-                wait = WebDriverWait(driver, 15)
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "article.prd._fb.col.c-prd")))
-                progress_bar.progress(30)
+            else:
+                logger.info("Starting proxy scrape with pagination")
                 
-                for i in range(max_scrolls):
-                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(2)
-                    progress_bar.progress(30 + (i + 1) * (50 // max_scrolls))
+                page_stats = {"not_modified": 0, "unchanged": 0, "parsed": 0, "empty": 0}
                 
-                soup = BeautifulSoup(driver.page_source, "html.parser")
-                driver.quit()
-                listings = soup.find_all("article", class_="prd _fb col c-prd")
+                def fetch(page):
+                    headers = state.conditional_headers(page_url(page)) if state else None
+                    return fetch_page(page, headers)
                 
-            else:
-                logger.info("Starting proxy scrape with pagination")
-                listings = []
-                for page in range(1, max_pages + 1):
-                    page_param = f"?page={page}" if page > 1 else ""
-                    target_page_url = base_url + page_param
-                    proxy_page_url = f"https://cors.ericmwangi13.workers.dev/?url={urllib.parse.quote(target_page_url, safe=':/?#')}"
-                    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
-                    response = requests.get(proxy_page_url, headers=headers, timeout=15)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.content, "html.parser")
+                def parse_page(response, page):
+                    url = page_url(page)
+                    if response.status_code == 304 and state:
+                        cached = state.cached_products(url)
+                        if cached is not None:
+                            page_stats["not_modified"] += 1
+                            return cached
+                        # Validators outlived the cached products: a 304 has no body to parse
+                        response = fetch_page(page)
                     
-                    if debug_mode:
-                        st.write(f"### Raw HTML Preview for Page {page} (First 2000 chars):")
-                        st.code(soup.prettify()[:2000], language="html")
-                    
-                    page_listings = soup.find_all("article", class_="prd _fb col c-prd")
-                    listings.extend(page_listings)
-                    status_text.write(f"Page {page}: Found {len(page_listings)} listings")
-                    progress_bar.progress(50 + (page / max_pages) * 40)
+                    content = response.content
+                    digest = content_hash(content)
+                    cached = state.cached_products(url, digest) if state else None
+                    if cached is not None:
+                        page_stats["unchanged"] += 1
+                        return cached
                     
-                    if not page_listings:  # Stop if no more listings
-                        break
-            
-            # Extract from all listings
-            products = []
-            for listing in listings:
-                title_elem = listing.find("h3", class_="name") or listing.find("a", class_="name")
-                price_elem = listing.find("div", class_="prc") or listing.find("span", class_="p24_price")
-                desc_elem = listing.find("div", class_="bdg _dsct _sm") or \
-                            listing.find("p", class_="dscr") or \
-                            listing.find("div", class_="s-prc-w") or \
-                            listing.find("div", class_="info") or \
-                            listing.find("div", class_="tag _dsct")  # Added for discounts
+                    if debug_mode:
+                        # Saved pages double as fixtures for `python jumia_parser.py <pages>`
+                        fixture_path = os.path.join(tempfile.gettempdir(), f"jumia_page_{page}.html")
+                        with open(fixture_path, "wb") as f:
+                            f.write(content)
+                        st.write(f"### Raw HTML Preview for Page {page} (First 2000 chars, saved to {fixture_path}):")
+                        st.code(BeautifulSoup(content, "html.parser").prettify()[:2000], language="html")
+                    page_products = parse_products(content, backend)
+                    page_stats["parsed"] += 1
+                    if state:
+                        state.record_page(url, response.headers, digest, page_products)
+                    return page_products
                 
-                title = title_elem.get_text(strip=True) if title_elem else "N/A"
-                price = price_elem.get_text(strip=True) if price_elem else "N/A"
-                description = desc_elem.get_text(strip=True) if desc_elem else "N/A"
+                pages_done = []
+                def on_page(page, page_listings):
+                    pages_done.append(page)
+                    page_stats["empty"] += not page_listings
+                    status_text.write(f"Page {page}: Found {len(page_listings)} listings")
+                    progress_bar.progress(int(50 + (len(pages_done) / max_pages) * 40))
                 
-                if title != "N/A":
-                    products.append({
-                        "title": title,
-                        "price": price,
-                        "description": description
-                    })
+                products = fetch_pages(max_pages, parse_page, on_page=on_page, fetch=fetch)
+                complete = page_stats["empty"] > 0
+                if state:
+                    logger.info(f"Pages: {page_stats['parsed']} parsed, {page_stats['unchanged']} unchanged, "
+                                f"{page_stats['not_modified']} not modified")
             
             all_products = products  # Use collected products
             if all_products:
@@ -157,16 +360,46 @@ def scrape_jumia(method, max_pages, max_scrolls, max_retries):
             if attempt == max_retries - 1:
                 status_text.error(f"All retries failed: {str(e)}")
                 progress_bar.progress(0)
-                return []
+                return [], False
     
-    return all_products
+    return all_products, complete
+
+def show_change_feed(feed, complete):
+    """Added / repriced / changed / removed products since the previous crawl"""
+    st.subheader("🔔 Changes Since Last Crawl")
+    cols = st.columns(4)
+    cols[0].metric("New", len(feed["added"]))
+    cols[1].metric("Repriced", len(feed["repriced"]))
+    cols[2].metric("Removed", len(feed["removed"]) if complete else "–")
+    cols[3].metric("Unchanged", feed["unchanged"])
+    
+    if feed["repriced"]:
+        st.write("**Repriced:**")
+        st.dataframe(pd.DataFrame([
+            {"title": r["product"]["title"], "old_price": r["old_price"], "new_price": r["product"]["price"],
+             "change": parse_price(r["product"]["price"]) - parse_price(r["old_price"])}
+            for r in feed["repriced"]
+        ]), use_container_width=True)
+    for label, key in (("New", "added"), ("Changed", "changed"), ("Removed", "removed")):
+        if feed[key]:
+            st.write(f"**{label}:**")
+            st.dataframe(pd.DataFrame(feed[key]), use_container_width=True)
+    if not complete:
+        st.caption("Removals are only reported when the crawl reaches the last page.")
 
 # Main Logic
 if st.button("Scrape and Filter"):
     try:
         # Scrape data
         status_text.write("Scraping Jumia...")
-        products = scrape_jumia(scrape_method, max_pages, max_scrolls, max_retries)
+        state = crawl_state() if incremental else None
+        products, complete = scrape_jumia(scrape_method, max_pages, max_scrolls, max_retries, parser_backend, state)
+        
+        # Change feed against the previous crawl
+        if state and products:
+            feed = state.diff(products, complete)
+            state.save()
+            show_change_feed(feed, complete)
         
         # Filter with AI
         status_text.write("Filtering results with AI...")
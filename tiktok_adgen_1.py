@@ -4,6 +4,8 @@ from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
 import numpy as np
 from moviepy.editor import ImageSequenceClip, AudioFileClip
 from rembg import remove
+import httpx
+from groq_client import AsyncGroqClient
 
 # --- GLOBAL CONFIGURATION ---
 st.set_page_config(page_title="TikTok AdGen Pro", layout="wide", page_icon="🎬")
@@ -32,12 +34,6 @@ if "groq_key" not in st.secrets:
     st.error("🚨 Missing Secret: Add `groq_key` to your .streamlit/secrets.toml")
     st.stop()
 
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
-HEADERS = {
-    "Authorization": f"Bearer {st.secrets['groq_key']}",
-    "Content-Type": "application/json"
-}
-
 # --- IMAGE PROCESSING ---
 @st.cache_data(show_spinner=False)
 def process_image_pro(input_image_bytes):
@@ -105,26 +101,24 @@ TEMPLATES = {
 }
 
 # --- GROQ AI ---
-def ask_groq(payload, timeout=20):
+@st.cache_resource
+def groq_client():
+    """Process-wide async client: pooled connections, coalescing, response cache, rate limits"""
+    return AsyncGroqClient(st.secrets["groq_key"])
+
+def groq_result(pending):
+    """Wait for a submitted Groq call; None (with a warning) on failure"""
     try:
-        r = requests.post(GROQ_URL, json=payload, headers=HEADERS, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-        choices = data.get("choices", [])
-        if choices:
-            message = choices[0].get("message", {})
-            content = message.get("content", "")
-            return content.strip()
-        return None
-    except requests.exceptions.Timeout:
+        return pending.result()
+    except httpx.TimeoutException:
         st.warning("⚠️ Groq API timeout. Using fallback.")
         return None
     except Exception as e:
         st.warning(f"⚠️ Groq API error: {str(e)[:150]}")
         return None
 
-def generate_tiktok_hook(product_name):
-    """Generate a 3-5 word TikTok hook."""
+def request_tiktok_hook(product_name):
+    """Start the hook call; pass the result to generate_tiktok_hook."""
     payload = {
         "model": "llama-3.3-70b-versatile",
         "messages": [
@@ -134,15 +128,18 @@ def generate_tiktok_hook(product_name):
         "temperature": 0.9,
         "max_tokens": 15
     }
-    
-    result = ask_groq(payload, timeout=10)
+    return groq_client().submit(payload, timeout=10)
+
+def generate_tiktok_hook(product_name, pending=None):
+    """Generate a 3-5 word TikTok hook."""
+    result = groq_result(pending or request_tiktok_hook(product_name))
     if result:
         result = result.strip('"').strip("'").strip()
         return result if len(result.split()) <= 6 else "Transform Your Space"
     return "Transform Your Space"
 
-def generate_tiktok_caption(product_name, price, hook):
-    """Generate complete TikTok caption."""
+def request_tiktok_caption(product_name, price, hook):
+    """Start the caption call; pass the result to generate_tiktok_caption."""
     payload = {
         "model": "llama-3.3-70b-versatile",
         "messages": [
@@ -152,16 +149,18 @@ def generate_tiktok_caption(product_name, price, hook):
         "temperature": 0.8,
         "max_tokens": 80
     }
-    
-    caption = ask_groq(payload, timeout=10)
+    return groq_client().submit(payload, timeout=10)
+
+def generate_tiktok_caption(product_name, price, hook, pending=None):
+    """Generate complete TikTok caption."""
+    caption = groq_result(pending or request_tiktok_caption(product_name, price, hook))
     if not caption:
         caption = f"Elevate your space with the {product_name}. Premium quality at {price}. DM to order! 💫"
     
     hashtags = TRENDING_HASHTAGS["furniture"]
     return f"{caption}\n\n{hashtags}\n\n#SMInteriors"
 
-def generate_content_ideas(content_type, keyword):
-    """Generate viral content ideas."""
+def content_ideas_payload(content_type, keyword):
     prompts = {
         "DIY Tips": f"List 5 viral DIY home decor hacks about '{keyword}'. Use emoji.",
         "Furniture Care": f"List 5 furniture care tips for '{keyword}'. Use emoji.",
@@ -177,9 +176,24 @@ def generate_content_ideas(content_type, keyword):
         "temperature": 0.9,
         "max_tokens": 400
     }
+    return payload
+
+def generate_content_ideas(content_types, keywords):
+    """Generate viral content ideas for every (content type, keyword) pair.
     
-    result = ask_groq(payload)
-    return result if result else "*No ideas generated. Try again.*"
+    The calls are independent, so they run concurrently (rate-limited) in one batch.
+    Returns {(content_type, keyword): markdown}.
+    """
+    pairs = [(content_type, keyword) for content_type in content_types for keyword in keywords]
+    results = groq_client().complete_many([content_ideas_payload(*pair) for pair in pairs])
+    
+    ideas = {}
+    for pair, result in zip(pairs, results):
+        if isinstance(result, Exception):
+            st.warning(f"⚠️ Groq API error for {pair[0]} / {pair[1]}: {str(result)[:150]}")
+            result = None
+        ideas[pair] = result if result else "*No ideas generated. Try again.*"
+    return ideas
 
 # --- RENDERING ---
 def hex_to_rgb(hex_color):
@@ -336,15 +350,18 @@ with col1:
 
 with col2:
     st.subheader("💡 Content Idea Generator")
-    content_type = st.selectbox("Content Type", 
-                                ["DIY Tips", "Furniture Care", "Design Trends"])
-    keyword = st.text_input("Focus Keyword", "Mid-Century Console")
+    content_types = st.multiselect("Content Types", 
+                                   ["DIY Tips", "Furniture Care", "Design Trends"], default=["DIY Tips"])
+    keyword_text = st.text_input("Focus Keywords (comma-separated)", "Mid-Century Console")
+    keywords = [k.strip() for k in keyword_text.split(",") if k.strip()]
     
-    if st.button("✨ Generate Ideas"):
-        with st.spinner("Generating ideas..."):
-            ideas = generate_content_ideas(content_type, keyword)
-            st.markdown("### 🎯 Content Ideas")
-            st.markdown(ideas)
+    if st.button("✨ Generate Ideas") and content_types and keywords:
+        with st.spinner(f"Generating {len(content_types) * len(keywords)} idea sets..."):
+            ideas = generate_content_ideas(content_types, keywords)
+        st.markdown("### 🎯 Content Ideas")
+        for (content_type, keyword), text in ideas.items():
+            with st.expander(f"{content_type} · {keyword}", expanded=len(ideas) == 1):
+                st.markdown(text)
 
 # --- VIDEO GENERATION ---
 if generate_btn:
@@ -354,6 +371,9 @@ if generate_btn:
         try:
             progress_placeholder = st.empty()
             
+            # The hook only needs the product name: let it run during image processing
+            hook_request = request_tiktok_hook(product_name)
+            
             # Step 1: Process image
             progress_placeholder.info("🎨 Step 1/4: Processing image...")
             raw_img = Image.open(uploaded_file).convert("RGBA")
@@ -376,13 +396,11 @@ if generate_btn:
             
             # Step 2: Generate hook
             progress_placeholder.info("🧠 Step 2/4: Generating hook...")
-            hook = generate_tiktok_hook(product_name)
+            hook = generate_tiktok_hook(product_name, hook_request)
             st.success(f"**Hook:** {hook}")
             
-            # Step 3: Generate caption
-            full_caption = generate_tiktok_caption(product_name, price, hook)
-            with st.expander("📝 TikTok Caption"):
-                st.text_area("Copy this:", full_caption, height=120)
+            # Step 3: Generate caption (in flight while frames render)
+            caption_request = request_tiktok_caption(product_name, price, hook)
             
             # Step 4: Render video
             progress_placeholder.info("🎬 Step 3/4: Rendering frames...")
@@ -406,6 +424,10 @@ if generate_btn:
             
             render_progress.progress(1.0)
             
+            full_caption = generate_tiktok_caption(product_name, price, hook, caption_request)
+            with st.expander("📝 TikTok Caption"):
+                st.text_area("Copy this:", full_caption, height=120)
+            
             # Step 5: Create video
             progress_placeholder.info("🎵 Step 4/4: Adding audio...")
             
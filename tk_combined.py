@@ -10,6 +10,7 @@ from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import numpy as np
 from moviepy.editor import ImageSequenceClip, AudioFileClip
 from rembg import remove
+from compositing import Sprite, blend_over
 
 # ============================================================================
 # 1. CORE CONFIG - SIMPLE
@@ -318,23 +319,23 @@ def load_logo():
     except:
         return None
 
-def add_brand_elements(draw, width, height, colors, t):
-    """Add logo and website to background (not in UI)"""
-    # Logo in top-left
+@st.cache_resource
+def load_logo_sprite():
+    """Brand logo as a premultiplied sprite, built once per process"""
     logo = load_logo()
+    return Sprite.from_image(logo) if logo else None
+
+def add_brand_elements(frame, width, height, colors, t):
+    """Blend the pulsing logo into the frame array in place (not in UI)"""
+    # Logo in top-left
+    logo = load_logo_sprite()
     if logo:
         logo_x = int(width * 0.05)
         logo_y = int(height * 0.05)
         alpha = int(200 + 55 * math.sin(t * 0.5))
-        logo_data = np.array(logo)
-        logo_data[:, :, 3] = (logo_data[:, :, 3] * (alpha/255)).astype(np.uint8)
-        logo_with_alpha = Image.fromarray(logo_data)
-        
-        logo_layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-        logo_layer.paste(logo_with_alpha, (logo_x, logo_y), logo_with_alpha)
-        return logo_layer
+        blend_over(frame, logo, logo_x, logo_y, opacity=alpha / 255)
     
-    return None
+    return frame
 
 # ============================================================================
 # 7. FRAME GENERATOR - WITH SIMPLE FIXES
@@ -346,9 +347,9 @@ def create_frame(t, width, height, content, colors, template_name, product_img=N
     bg = create_background(template_name, width, height, colors, t)
     
     # Add brand logo
-    logo_layer = add_brand_elements(ImageDraw.Draw(bg), width, height, colors, t)
-    if logo_layer:
-        bg = Image.alpha_composite(bg, logo_layer)
+    bg_data = np.array(bg)
+    add_brand_elements(bg_data, width, height, colors, t)
+    bg = Image.fromarray(bg_data)
     
     canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(canvas, "RGBA")
@@ -7,25 +7,33 @@ class BatchProcessor:
     """Process multiple phones at once for efficiency"""
     
     @staticmethod
-    def process_phone_list(phone_list: List[str], max_workers: int = 3):
-        """Process multiple phones in parallel"""
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+    def process_phone_list(phone_list: List[str], max_workers: int = 16, on_result=None):
+        """Process multiple phones in parallel
         
+        Records already in the phone_data cache are returned directly; the
+        rest go through the gsm_specs service, whose HTTP concurrency per host
+        stays bounded regardless of max_workers. Failed lookups map to
+        {"error": message} and are not cached.
+        """
+        from gsm_specs import fetch_devices
+        
+        cache = get_caches()["phone_data"]
         results = {}
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_phone = {
-                executor.submit(fetch_phone_data, phone): phone 
-                for phone in phone_list
-            }
-            
-            for future in as_completed(future_to_phone):
-                phone = future_to_phone[future]
-                try:
-                    results[phone] = future.result()
-                except Exception as e:
-                    results[phone] = {"error": str(e)}
-        
-        return results
+        for query in phone_list:
+            record = cache.get(cache_key_for(query))
+            if record is not None:
+                results[query] = record
+                if on_result:
+                    on_result(query, record)
+        
+        missing = [query for query in phone_list if query not in results]
+        if missing:
+            for query, record in fetch_devices(missing, max_workers=max_workers, on_result=on_result).items():
+                if "error" not in record:
+                    cache.set(cache_key_for(query), record)
+                results[query] = record
+        
+        return {query: results[query] for query in phone_list}
 
 # 2. PERFORMANCE OPTIMIZATION
 def optimize_image_for_platform(img: Image.Image, platform: str) -> Image.Image:
@@ -49,19 +57,237 @@ def optimize_image_for_platform(img: Image.Image, platform: str) -> Image.Image:
     return img
 
 # 3. ENHANCED CACHING WITH VERSIONING
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import hashlib
+import json
+from collections import OrderedDict
+
+def private_data_dir() -> Optional[str]:
+    """~/.cache/tkgsm, owned by this user with 0700 permissions; None if it can't be made private
+    
+    Cache pickles and the campaign database live here rather than in the
+    shared temp directory, where other local users could read or plant files.
+    """
+    path = os.path.join(os.path.expanduser("~"), ".cache", "tkgsm")
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.stat(path)
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            return None
+        if info.st_mode & 0o077:
+            os.chmod(path, 0o700)
+        return path
+    except OSError:
+        return None
+
+def cache_key_for(*parts) -> str:
+    """Stable key for JSON-like inputs (phone specs, personas, ad elements)"""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 class VersionedCache:
-    """Cache with versioning for updates"""
+    """Two-tier cache with versioning for updates
     
-    def __init__(self, ttl: int = 86400, version: str = "v1"):
+    Memory: LRU bounded by max_memory_bytes. Disk: one pickle per entry under
+    cache_dir/namespace/version/ (private_data_dir() by default), written
+    atomically. Bumping `version` orphans old entries; clear_old_versions()
+    deletes them. Without a private directory the cache is memory-only.
+    """
+    
+    def __init__(self, ttl: int = 86400, version: str = "v1", namespace: str = "default",
+                 max_memory_bytes: int = 64 * 1024 * 1024, cache_dir: Optional[str] = None,
+                 persist: bool = True):
         self.ttl = ttl
         self.version = version
+        self.namespace = namespace
+        self.max_memory_bytes = max_memory_bytes
+        cache_dir = cache_dir or private_data_dir()
+        self.persist = persist and cache_dir is not None
+        self.root = os.path.join(cache_dir or "", "cache", namespace)
+        self.dir = os.path.join(self.root, version)
+        self._memory = OrderedDict()  # cache key -> (expires_at, value, size)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0,
+                         "evictions": 0, "disk_writes": 0}
     
     def get_cache_key(self, key: str) -> str:
         return f"{self.version}:{key}"
     
-    def clear_old_versions(self):
-        """Clear old cached versions"""
-        pass
+    def _path(self, cache_key: str) -> str:
+        return os.path.join(self.dir, hashlib.sha256(cache_key.encode("utf-8")).hexdigest() + ".pkl")
+    
+    @staticmethod
+    def _sizeof(value, payload: bytes) -> int:
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if isinstance(value, Image.Image):
+            return value.width * value.height * len(value.getbands())
+        return len(payload)
+    
+    def _remember(self, cache_key: str, expires_at: float, value, size: int):
+        """Insert into the LRU and evict from the cold end; caller holds the lock"""
+        if cache_key in self._memory:
+            self._memory_bytes -= self._memory.pop(cache_key)[2]
+        if size > self.max_memory_bytes:
+            return  # Too big for memory; disk only
+        self._memory[cache_key] = (expires_at, value, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, _, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+            self.counters["evictions"] += 1
+    
+    def get(self, key: str, default=None):
+        cache_key = self.get_cache_key(key)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry:
+                if entry[0] > now:
+                    self._memory.move_to_end(cache_key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                self._memory_bytes -= self._memory.pop(cache_key)[2]
+                self.counters["expired"] += 1
+        
+        if self.persist:
+            try:
+                with open(self._path(cache_key), "rb") as f:
+                    payload = f.read()
+                expires_at, value = pickle.loads(payload)
+                if expires_at > now:
+                    with self._lock:
+                        self._remember(cache_key, expires_at, value, self._sizeof(value, payload))
+                        self.counters["disk_hits"] += 1
+                    return value
+                os.remove(self._path(cache_key))
+                with self._lock:
+                    self.counters["expired"] += 1
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                pass
+        
+        with self._lock:
+            self.counters["misses"] += 1
+        return default
+    
+    def set(self, key: str, value, ttl: Optional[int] = None):
+        cache_key = self.get_cache_key(key)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        payload = pickle.dumps((expires_at, value), protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(cache_key, expires_at, value, self._sizeof(value, payload))
+        
+        if self.persist:
+            try:
+                os.makedirs(self.dir, exist_ok=True)
+                path = self._path(cache_key)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+                with self._lock:
+                    self.counters["disk_writes"] += 1
+            except OSError:
+                pass
+        return value
+    
+    def get_or_set(self, key: str, factory, ttl: Optional[int] = None):
+        """Cached value, or factory() stored under key (None results are not cached)"""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = factory()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+    
+    def delete(self, key: str):
+        cache_key = self.get_cache_key(key)
+        with self._lock:
+            if cache_key in self._memory:
+                self._memory_bytes -= self._memory.pop(cache_key)[2]
+        try:
+            os.remove(self._path(cache_key))
+        except OSError:
+            pass
+    
+    def clear(self):
+        """Drop every entry of the current version"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        shutil.rmtree(self.dir, ignore_errors=True)
+    
+    def clear_old_versions(self) -> int:
+        """Clear old cached versions; returns the number of version directories removed"""
+        removed = 0
+        with self._lock:
+            prefix = f"{self.version}:"
+            for cache_key in [k for k in self._memory if not k.startswith(prefix)]:
+                self._memory_bytes -= self._memory.pop(cache_key)[2]
+        try:
+            versions = os.listdir(self.root)
+        except OSError:
+            return 0
+        for name in versions:
+            path = os.path.join(self.root, name)
+            if name != self.version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
+    
+    def purge_expired(self) -> int:
+        """Delete expired entries of the current version from disk"""
+        removed = 0
+        now = time.time()
+        try:
+            names = os.listdir(self.dir)
+        except OSError:
+            return 0
+        for name in names:
+            path = os.path.join(self.dir, name)
+            try:
+                with open(path, "rb") as f:
+                    expires_at, _ = pickle.load(f)
+                if expires_at <= now:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                pass
+        return removed
+    
+    def stats(self) -> Dict:
+        """Counters plus current memory usage, for sizing max_memory_bytes"""
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": (lookups - self.counters["misses"]) / lookups if lookups else 0.0,
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+            }
+
+@st.cache_resource
+def get_caches() -> Dict[str, VersionedCache]:
+    """Process-wide caches (module globals would reset on every rerun)
+    
+    Sized per kind of data: small JSON-like specs, generated copy, rendered ads.
+    """
+    return {
+        "phone_data": VersionedCache(ttl=7 * 86400, version="v1", namespace="phone_data",
+                                     max_memory_bytes=8 * 1024 * 1024),
+        "ad_copy": VersionedCache(ttl=86400, version="v1", namespace="ad_copy",
+                                  max_memory_bytes=4 * 1024 * 1024),
+        "ad_images": VersionedCache(ttl=86400, version="v1", namespace="ad_images",
+                                    max_memory_bytes=256 * 1024 * 1024),
+    }
 
 # 4. REAL-TIME PROGRESS UPDATES
 def create_progress_tracker(total_steps: int):
@@ -135,6 +361,10 @@ class Localization:
 class SpecsAnalyzer:
     """Advanced analysis of phone specifications"""
     
+    FIRST_NUMBER = re.compile(r'(\d+)')
+    CAMERA_MP = re.compile(r'(?P<mp>\d+)MP')
+    SCORE_CAPS = {"ram": 30, "main_camera": 30, "battery": 20, "storage": 20}
+    
     @staticmethod
     def calculate_performance_score(phone_data: dict) -> float:
         """Calculate a performance score 0-100 based on specs"""
@@ -144,7 +374,7 @@ class SpecsAnalyzer:
         # RAM scoring
         if phone_data.get("ram") != "N/A":
             try:
-                ram_gb = int(re.search(r'(\d+)', phone_data["ram"]).group(1))
+                ram_gb = int(SpecsAnalyzer.FIRST_NUMBER.search(phone_data["ram"]).group(1))
                 score += min(30, ram_gb * 3)  # Max 30 points for RAM
                 factors += 1
             except:
@@ -154,7 +384,7 @@ class SpecsAnalyzer:
         if phone_data.get("main_camera") != "N/A":
             try:
                 mp_total = sum(
-                    int(mp) for mp in re.findall(r'(\d+)MP', phone_data["main_camera"])
+                    int(mp) for mp in SpecsAnalyzer.CAMERA_MP.findall(phone_data["main_camera"])
                 )
                 score += min(30, mp_total // 5)  # Max 30 points for camera
                 factors += 1
@@ -164,7 +394,7 @@ class SpecsAnalyzer:
         # Battery scoring
         if phone_data.get("battery") != "N/A" and "mAh" in phone_data["battery"]:
             try:
-                mAh = int(re.search(r'(\d+)', phone_data["battery"]).group(1))
+                mAh = int(SpecsAnalyzer.FIRST_NUMBER.search(phone_data["battery"]).group(1))
                 score += min(20, mAh // 100)  # Max 20 points for battery
                 factors += 1
             except:
@@ -173,7 +403,7 @@ class SpecsAnalyzer:
         # Storage scoring
         if phone_data.get("storage") != "N/A":
             try:
-                storage_gb = int(re.search(r'(\d+)', phone_data["storage"]).group(1))
+                storage_gb = int(SpecsAnalyzer.FIRST_NUMBER.search(phone_data["storage"]).group(1))
                 score += min(20, storage_gb // 32)  # Max 20 points for storage
                 factors += 1
             except:
@@ -181,6 +411,67 @@ class SpecsAnalyzer:
         
         return (score / max(factors, 1)) if factors > 0 else 0
     
+    @staticmethod
+    def score_catalog(catalog, sort: bool = True):
+        """Score a whole catalog at once
+        
+        catalog is a DataFrame with ram / main_camera / battery / storage spec
+        strings (one row per phone). Numbers come from vectorized str.extract
+        over each column's distinct strings, and scoring runs in NumPy. It
+        matches calculate_performance_score row by row. Adds the parsed numbers plus performance_score, rank (1 = best,
+        ties share the best rank) and percentile (0-100) columns.
+        """
+        import numpy as np
+        import pandas as pd
+        
+        df = catalog.copy()
+        
+        def parse(column: str, extract) -> np.ndarray:
+            """Run extract over the distinct spec strings only, then broadcast back"""
+            if column not in df:
+                return np.full(len(df), np.nan)
+            codes, uniques = pd.factorize(df[column].astype("string"))
+            uniques = pd.Series(uniques, dtype="string")
+            values = np.append(extract(uniques.mask(uniques == "N/A")), np.nan)
+            return values[codes]  # code -1 (missing) picks the trailing NaN
+        
+        def first_number(values: pd.Series) -> np.ndarray:
+            found = values.str.extract(SpecsAnalyzer.FIRST_NUMBER, expand=False)
+            return pd.to_numeric(found, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        
+        def battery_mah(values: pd.Series) -> np.ndarray:
+            return first_number(values.where(values.str.contains("mAh", regex=False)))
+        
+        def camera_mp(values: pd.Series) -> np.ndarray:
+            # Every MP figure summed; a camera string without one still counts as 0
+            mp = values.str.extractall(SpecsAnalyzer.CAMERA_MP)["mp"].astype(float)
+            totals = mp.groupby(level=0).sum().reindex(values.index, fill_value=0.0)
+            return np.where(values.notna().to_numpy(), totals.to_numpy(dtype=float), np.nan)
+        
+        df["ram_gb"] = parse("ram", first_number)
+        df["camera_mp"] = parse("main_camera", camera_mp)
+        df["battery_mah"] = parse("battery", battery_mah)
+        df["storage_gb"] = parse("storage", first_number)
+        
+        caps = SpecsAnalyzer.SCORE_CAPS
+        points = np.column_stack([
+            np.minimum(caps["ram"], df["ram_gb"].to_numpy() * 3),
+            np.minimum(caps["main_camera"], df["camera_mp"].to_numpy() // 5),
+            np.minimum(caps["battery"], df["battery_mah"].to_numpy() // 100),
+            np.minimum(caps["storage"], df["storage_gb"].to_numpy() // 32),
+        ])
+        factors = (~np.isnan(points)).sum(axis=1)
+        totals = np.nansum(points, axis=1)
+        df["performance_score"] = np.divide(totals, factors, out=np.zeros(len(df)), where=factors > 0)
+        
+        scores = df["performance_score"]
+        df["rank"] = scores.rank(method="min", ascending=False).astype(int)
+        df["percentile"] = scores.rank(method="max", pct=True) * 100
+        
+        if sort:
+            df = df.sort_values("rank", kind="stable")
+        return df
+    
     @staticmethod
     def generate_specs_summary(phone_data: dict) -> str:
         """Generate a human-readable specs summary"""
@@ -201,30 +492,286 @@ class SpecsAnalyzer:
         return " | ".join(highlights[:3])
 
 # 8. SCHEDULING AND AUTOMATION
+import heapq
+import sqlite3
+from contextlib import contextmanager
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
 class CampaignScheduler:
-    """Schedule campaigns for future posting"""
+    """Schedule campaigns for future posting
     
-    def __init__(self):
-        self.scheduled = []
+    Campaigns are rows in SQLite (indexed on status + schedule_time), so they
+    survive restarts. The next HEAP_WINDOW due jobs sit in a min-heap of
+    (schedule_time, id); popping the next due job is O(log n) and the table is
+    only queried again when the window runs dry. start() runs a worker thread
+    that renders and dispatches due campaigns on a bounded pool.
     
-    def schedule_campaign(self, phone_data: dict, platforms: List[str], 
-                         schedule_time: datetime, repeat: bool = False):
-        """Schedule a campaign for posting"""
-        campaign = {
-            "phone": phone_data,
-            "platforms": platforms,
-            "schedule_time": schedule_time,
-            "repeat": repeat,
-            "status": "scheduled"
+    Use get_scheduler() in the app: one instance per process, so interrupted
+    jobs are recovered once and never claimed twice.
+    """
+    
+    HEAP_WINDOW = 256
+    MAX_ATTEMPTS = 3              # one-off campaigns: tries before status 'failed'
+    RETRY_DELAY = 300.0           # seconds, doubled per failed attempt
+    
+    def __init__(self, db_path: Optional[str] = None, max_workers: int = 4,
+                 poll_interval: float = 30.0):
+        # Private per-user directory; a fresh 0700 temp dir if none can be made
+        self.db_path = db_path or os.path.join(private_data_dir() or tempfile.mkdtemp(), "campaigns.db")
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._heap = []
+        self._horizon = float("inf")  # Rows after this time are not in the heap yet
+        self._worker = None
+        self._pool = None
+        
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS campaigns (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone TEXT NOT NULL,
+                    platforms TEXT NOT NULL,
+                    schedule_time REAL NOT NULL,
+                    repeat_seconds REAL,
+                    options TEXT NOT NULL DEFAULT '{}',
+                    status TEXT NOT NULL DEFAULT 'scheduled',
+                    runs INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    dispatched_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_campaigns_due ON campaigns (status, schedule_time)")
+        self._refill()
+    
+    @contextmanager
+    def _connect(self):
+        """One connection per operation: commit on success, always close"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def recover_interrupted(self) -> int:
+        """Make jobs left 'running' by a dead process due again
+        
+        Only safe before this process starts dispatching, and with a single
+        dispatching process per database (see get_scheduler).
+        """
+        with self._connect() as conn:
+            recovered = conn.execute(
+                "UPDATE campaigns SET status = 'scheduled' WHERE status = 'running'"
+            ).rowcount
+        if recovered:
+            self._refill()
+        return recovered
+    
+    def _refill(self):
+        """Load the next HEAP_WINDOW scheduled jobs from the index"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, schedule_time FROM campaigns WHERE status = 'scheduled' "
+                "ORDER BY schedule_time, id LIMIT ?", (self.HEAP_WINDOW,)
+            ).fetchall()
+        with self._lock:
+            self._heap = [(row["schedule_time"], row["id"]) for row in rows]
+            heapq.heapify(self._heap)
+            self._horizon = rows[-1]["schedule_time"] if len(rows) == self.HEAP_WINDOW else float("inf")
+    
+    def _push(self, when: float, campaign_id: int):
+        with self._lock:
+            if when <= self._horizon:
+                heapq.heappush(self._heap, (when, campaign_id))
+        self._wake.set()
+    
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "phone": json.loads(row["phone"]),
+            "platforms": json.loads(row["platforms"]),
+            "schedule_time": datetime.fromtimestamp(row["schedule_time"]),
+            "repeat": row["repeat_seconds"] is not None,
+            "repeat_every": timedelta(seconds=row["repeat_seconds"]) if row["repeat_seconds"] else None,
+            "options": json.loads(row["options"]),
+            "status": row["status"],
+            "runs": row["runs"],
+            "failures": row["failures"],
+            "last_error": row["last_error"],
         }
-        self.scheduled.append(campaign)
-        return campaign
     
-    def get_upcoming_campaigns(self) -> List[Dict]:
+    def schedule_campaign(self, phone_data: dict, platforms: List[str], 
+                         schedule_time: datetime, repeat: bool = False,
+                         repeat_every: timedelta = timedelta(days=1),
+                         options: Optional[Dict] = None):
+        """Schedule a campaign for posting
+        
+        options carries what the renderer needs later (persona, tone, template).
+        """
+        when = schedule_time.timestamp()
+        repeat_seconds = repeat_every.total_seconds() if repeat else None
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO campaigns (phone, platforms, schedule_time, repeat_seconds, options, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (json.dumps(phone_data, default=str), json.dumps(platforms), when, repeat_seconds,
+                 json.dumps(options or {}, default=str), time.time())
+            )
+            campaign_id = cursor.lastrowid
+        self._push(when, campaign_id)
+        return self.get_campaign(campaign_id)
+    
+    def get_campaign(self, campaign_id: int) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        return self._to_dict(row) if row else None
+    
+    def cancel_campaign(self, campaign_id: int) -> bool:
+        """Cancel a scheduled campaign; its stale heap entry is skipped when popped"""
+        with self._connect() as conn:
+            cancelled = conn.execute(
+                "UPDATE campaigns SET status = 'cancelled' WHERE id = ? AND status = 'scheduled'",
+                (campaign_id,)
+            ).rowcount == 1
+        return cancelled
+    
+    def get_upcoming_campaigns(self, limit: int = 50) -> List[Dict]:
         """Get upcoming scheduled campaigns"""
-        now = datetime.now()
-        return [c for c in self.scheduled 
-                if c["schedule_time"] > now and c["status"] == "scheduled"]
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM campaigns WHERE status = 'scheduled' AND schedule_time > ? "
+                "ORDER BY schedule_time, id LIMIT ?", (time.time(), limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+    
+    def pop_due(self, now: Optional[float] = None) -> Optional[Dict]:
+        """Claim the earliest due campaign (status -> running), or None"""
+        while True:
+            now = time.time() if now is None else now
+            with self._lock:
+                if not self._heap:
+                    exhausted = self._horizon == float("inf")
+                    entry = None
+                elif self._heap[0][0] <= now:
+                    entry = heapq.heappop(self._heap)
+                else:
+                    return None
+            if entry is None:
+                if exhausted:
+                    return None
+                self._refill()
+                continue
+            
+            when, campaign_id = entry
+            with self._connect() as conn:
+                claimed = conn.execute(
+                    "UPDATE campaigns SET status = 'running' "
+                    "WHERE id = ? AND status = 'scheduled' AND schedule_time = ?",
+                    (campaign_id, when)
+                ).rowcount == 1
+                row = conn.execute("SELECT * FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+            if claimed:
+                return self._to_dict(row)
+            # Cancelled, already claimed or rescheduled: stale entry, keep popping
+    
+    def next_due_time(self) -> Optional[float]:
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+    
+    def _finish(self, campaign: Dict, error: Optional[str] = None):
+        """Record the outcome and schedule the next run
+        
+        Repeating campaigns always move on to their next occurrence (a failed
+        run only leaves last_error behind). One-off campaigns are retried with
+        backoff up to MAX_ATTEMPTS before they are marked failed.
+        """
+        now = time.time()
+        failures = campaign["failures"] + 1 if error else 0
+        next_time = None
+        if campaign["repeat_every"]:
+            # Skip missed occurrences rather than firing a burst after downtime
+            step = campaign["repeat_every"].total_seconds()
+            next_time = campaign["schedule_time"].timestamp() + step
+            if next_time <= now:
+                next_time += step * (int((now - next_time) // step) + 1)
+        elif error and failures < self.MAX_ATTEMPTS:
+            next_time = now + self.RETRY_DELAY * 2 ** (failures - 1)
+        
+        if next_time:
+            status = "scheduled"
+        else:
+            status = "failed" if error else "done"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE campaigns SET status = ?, runs = runs + 1, failures = ?, last_error = ?, "
+                "dispatched_at = ?, schedule_time = COALESCE(?, schedule_time) WHERE id = ?",
+                (status, failures, error, now, next_time, campaign["id"])
+            )
+        if next_time:
+            self._push(next_time, campaign["id"])
+    
+    def _run(self, campaign: Dict, render, dispatch):
+        try:
+            for platform in campaign["platforms"]:
+                dispatch(campaign, platform, render(campaign, platform))
+            self._finish(campaign)
+        except Exception as e:
+            self._finish(campaign, error=str(e))
+        finally:
+            self._slots.release()
+    
+    def run_due(self, render, dispatch) -> int:
+        """Hand every due campaign to the pool; blocks while all workers are busy"""
+        started = 0
+        while not self._stop.is_set():
+            self._slots.acquire()
+            campaign = self.pop_due()
+            if campaign is None:
+                self._slots.release()
+                break
+            self._pool.submit(self._run, campaign, render, dispatch)
+            started += 1
+        return started
+    
+    def _loop(self, render, dispatch):
+        while not self._stop.is_set():
+            self.run_due(render, dispatch)
+            next_due = self.next_due_time()
+            timeout = self.poll_interval if next_due is None else min(self.poll_interval, max(0.0, next_due - time.time()))
+            self._wake.wait(timeout)
+            self._wake.clear()
+    
+    def start(self, render, dispatch):
+        """Run the dispatcher in the background
+        
+        render(campaign, platform) builds the ad for one platform and
+        dispatch(campaign, platform, rendered) posts it. At most max_workers
+        campaigns run at once; exceptions are handled by _finish.
+        """
+        if self._worker and self._worker.is_alive():
+            return
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="campaign")
+        self._worker = threading.Thread(target=self._loop, args=(render, dispatch), daemon=True)
+        self._worker.start()
+    
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._worker:
+            self._worker.join()
+        if self._pool:
+            self._pool.shutdown(wait=wait)
 
 # 9. ADVANCED ERROR RECOVERY
 class ErrorRecovery:
@@ -303,8 +850,7 @@ def enhanced_main():
     # Add initialization for new features
     if "campaign_history" not in st.session_state:
         st.session_state.campaign_history = []
-    if "scheduler" not in st.session_state:
-        st.session_state.scheduler = CampaignScheduler()
+    scheduler = get_scheduler()
     if "selected_template" not in st.session_state:
         st.session_state.selected_template = "modern_minimal"
     
@@ -361,6 +907,39 @@ def enhanced_main():
                 'Status': ['Success' for _ in range(min(10, len(dates)))]
             })
             st.dataframe(df, use_container_width=True)
+        
+        # Scheduled campaigns
+        st.subheader("🗓️ Scheduled Campaigns")
+        if st.session_state.current_phone:
+            with st.form("schedule_campaign"):
+                platforms = st.multiselect("Platforms", ["facebook", "instagram", "whatsapp"], default=["facebook"])
+                col_d, col_t = st.columns(2)
+                post_date = col_d.date_input("Date", value=datetime.now().date())
+                post_time = col_t.time_input("Time", value=(datetime.now() + timedelta(hours=1)).time())
+                col_p, col_o = st.columns(2)
+                persona = col_p.text_input("Persona", "General")
+                tone = col_o.text_input("Tone", "Professional")
+                repeat_days = st.number_input("Repeat every N days (0 = once)", min_value=0, max_value=30, value=0)
+                if st.form_submit_button("Schedule") and platforms:
+                    scheduler.schedule_campaign(
+                        st.session_state.current_phone, platforms,
+                        datetime.combine(post_date, post_time),
+                        repeat=repeat_days > 0, repeat_every=timedelta(days=max(1, repeat_days)),
+                        options={"persona": persona, "tone": tone, "template": st.session_state.selected_template}
+                    )
+                    st.success("Campaign scheduled")
+        
+        upcoming = scheduler.get_upcoming_campaigns()
+        if upcoming:
+            st.dataframe([{
+                "When": c["schedule_time"].strftime("%Y-%m-%d %H:%M"),
+                "Phone": c["phone"].get("name", ""),
+                "Platforms": ", ".join(c["platforms"]),
+                "Repeats": str(c["repeat_every"]) if c["repeat_every"] else "once",
+                "Last error": c["last_error"] or "",
+            } for c in upcoming], use_container_width=True)
+        else:
+            st.info("No campaigns scheduled")
     
     # NEW TAB: SETTINGS
     with tabs[4]:
@@ -403,8 +982,20 @@ def enhanced_main():
             clear_cache = st.button("Clear Cache", help="Clear all cached images and data")
             if clear_cache:
                 st.cache_data.clear()
+                for cache in get_caches().values():
+                    cache.clear()
+                    cache.clear_old_versions()
                 st.success("Cache cleared!")
             
+            cache_stats = {name: cache.stats() for name, cache in get_caches().items()}
+            st.dataframe(
+                [{"cache": name, "hit rate": f"{s['hit_rate']:.0%}", "entries": s["entries"],
+                  "memory": f"{s['memory_bytes'] / 1e6:.1f}/{s['max_memory_bytes'] / 1e6:.0f} MB",
+                  "evictions": s["evictions"]}
+                 for name, s in cache_stats.items()],
+                use_container_width=True
+            )
+            
             # API settings
             if GROQ_KEY:
                 st.success("✅ API Key Configured")
@@ -474,12 +1065,20 @@ def enhanced_main():
 class EnhancedFacebookAdGenerator(FacebookAdGenerator):
     """Enhanced Facebook ad generator with templates"""
     
-    def generate(self, phone_data: dict, ad_elements: Dict[str, str] = None) -> Image.Image:
+    def generate(self, phone_data: dict, ad_elements: Dict[str, str] = None,
+                 template_name: Optional[str] = None) -> Image.Image:
+        # Scheduled renders pass the template explicitly (no session state off the script thread)
+        template_name = template_name or st.session_state.get('selected_template', 'modern_minimal')
+        cache = get_caches()["ad_images"]
+        key = cache_key_for("facebook", phone_data, ad_elements, template_name)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.copy()
+        
         # Get base ad
         base_ad = super().generate(phone_data, ad_elements)
         
         # Apply template if selected
-        template_name = st.session_state.get('selected_template', 'modern_minimal')
         if template_name != 'modern_minimal':
             base_ad = TemplateManager.apply_template(base_ad, template_name)
         
@@ -490,8 +1089,56 @@ class EnhancedFacebookAdGenerator(FacebookAdGenerator):
             draw.text((100, 100), "⭐ TOP PERFORMER", 
                      fill=BRAND_GOLD, font=self.badge_font)
         
+        cache.set(key, base_ad.copy())
         return base_ad
 
+# ==========================================
+# SCHEDULED CAMPAIGN DISPATCH
+# ==========================================
+
+def render_scheduled_ad(campaign: Dict, platform: str) -> Image.Image:
+    """Render one platform's ad for a due campaign (runs on a scheduler worker)"""
+    phone_data = campaign["phone"]
+    options = campaign["options"]
+    persona = options.get("persona", "General")
+    tone = options.get("tone", "Professional")
+    
+    cache = get_caches()["ad_copy"]
+    key = cache_key_for(phone_data, persona, tone)
+    ad_elements = cache.get(key)
+    if ad_elements is None:
+        ad_elements = generate_marketing_content(phone_data, persona, tone)
+        if ad_elements:
+            cache.set(key, ad_elements)
+        else:
+            ad_elements = ErrorRecovery.fallback_ad_elements(phone_data)
+    
+    ad = EnhancedFacebookAdGenerator().generate(
+        phone_data, ad_elements, template_name=options.get("template", "modern_minimal")
+    )
+    return optimize_image_for_platform(ad, platform)
+
+def outbox_dir() -> str:
+    path = os.path.join(private_data_dir() or tempfile.mkdtemp(), "outbox")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def dispatch_to_outbox(campaign: Dict, platform: str, ad: Image.Image):
+    """Publish a rendered ad to the outbox (one PNG per campaign run and platform)"""
+    name = f"{campaign['id']}_{platform}_{datetime.now():%Y%m%d_%H%M%S}.png"
+    path = os.path.join(outbox_dir(), name)
+    tmp_path = f"{path}.tmp"
+    ad.save(tmp_path, format="PNG")
+    os.replace(tmp_path, path)
+
+@st.cache_resource
+def get_scheduler() -> CampaignScheduler:
+    """The process's scheduler: recovers interrupted jobs once, then dispatches in the background"""
+    scheduler = CampaignScheduler()
+    scheduler.recover_interrupted()
+    scheduler.start(render_scheduled_ad, dispatch_to_outbox)
+    return scheduler
+
 # ==========================================
 # ENHANCED ERROR HANDLING IN MAIN FLOW
 # ==========================================
@@ -499,8 +1146,14 @@ class EnhancedFacebookAdGenerator(FacebookAdGenerator):
 def safe_generate_content(phone_data: dict, persona: str, tone: str) -> Optional[Dict[str, str]]:
     """Enhanced content generation with fallbacks"""
     try:
-        # Try AI generation first
-        content = generate_marketing_content(phone_data, persona, tone)
+        # Cached copy for the same phone/persona/tone, else AI generation
+        cache = get_caches()["ad_copy"]
+        key = cache_key_for(phone_data, persona, tone)
+        content = cache.get(key)
+        if content is None:
+            content = generate_marketing_content(phone_data, persona, tone)
+            if content:
+                cache.set(key, content)
         
         if content:
             # Add to campaign history
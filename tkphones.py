@@ -6,6 +6,7 @@ import numpy as np
 from moviepy import VideoClip
 import re
 import random
+from gsm_specs import get_device, fetch_devices
 
 # ==========================================
 # 1. GLOBAL CONFIGURATION
@@ -72,81 +73,47 @@ def load_asset(url, size=None):
         return img
     except: return Image.new("RGBA", (1,1), (0,0,0,0))
 
-def fetch_device_data(query):
+def dummy_device(query):
     # Professional fallback data if the search fails entirely
-    dummy = {
+    return {
         "name": query.upper(), 
         "img_url": CONFIG["placeholder_phone"], 
         "specs": [("processor", "Flagship Chip"), ("screen", "OLED Display"), ("memory", "High Speed"), ("battery", "Long Life")]
     }
-    
-    try:
-        # 1. SEARCH: Get the base_id and official name
-        search_res = requests.get(f"https://tkphsp2.vercel.app/gsm/search?q={query}", timeout=10).json()
-        if not search_res: return dummy
-        
-        base_id = search_res[0]['id'] # e.g., "xiaomi_poco_x3_pro-10802.php"
-        official_name = search_res[0]['name']
-
-        # 2. IMAGE ID TRANSFORMATION (Needed for the images endpoint)
-        if "-" in base_id:
-            parts = base_id.rsplit('-', 1)
-            # Remove .php if present in the first part and rebuild
-            clean_part_0 = parts[0].replace(".php", "")
-            image_id = f"{clean_part_0}-pictures-{parts[1]}"
-        else:
-            image_id = base_id
-
-        # 3. FETCH INFO & IMAGES
-        info = requests.get(f"https://tkphsp2.vercel.app/gsm/info/{base_id}", timeout=10).json()
-        imgs_data = requests.get(f"https://tkphsp2.vercel.app/gsm/images/{image_id}", timeout=10).json()
-        #imgs_data = requests.get(f"https://tkphsp2.vercel.app/gsm/images/{base_id}", timeout=10).json()
-
-        # 4. IMAGE LOGIC: Safe extraction (Prevents IndexError)
-        img_list = imgs_data.get('images', [])
-        if len(img_list) > 1:
-            api_img = img_list[1]  # Priority: Lifestyle Shot
-        elif len(img_list) == 1:
-            api_img = img_list[0]  # Fallback: Single image
-        else:
-            api_img = search_res[0].get('image', CONFIG["placeholder_phone"]) # Last resort: Search thumbnail
-
-        # 5. CLEAN SPECS (Safe against structure changes)
-        chip = info.get("platform", {}).get("chipset", "High Performance").split('(')[0].strip()
-        
-        display_raw = info.get("display", {}).get("size", "6.7 inches")
-        screen = display_raw.split(',')[0].strip()
-
-        # Memory Handling (Handles both List and Dictionary formats)
-        mem_data = info.get("memory", {})
-        if isinstance(mem_data, list) and len(mem_data) > 0:
-            mem_raw = mem_data[0].get("internal", "128GB 8GB RAM")
-        elif isinstance(mem_data, dict):
-            mem_raw = mem_data.get("internal", "128GB 8GB RAM")
-        else:
-            mem_raw = "128GB 8GB RAM"
-        
-        memory = mem_raw.split(',')[0].strip()
-
-        # Battery Handling
-        batt_raw = info.get("battery", {}).get("battType", "5000 mAh")
-        batt_match = re.search(r'(\d+)\s*mAh', str(batt_raw))
-        battery = f"{batt_match.group(1)} mAh" if batt_match else "5000 mAh"
 
-        return {
-            "name": official_name, 
-            "img_url": api_img,
-            "specs": [
-                ("processor", chip), 
-                ("screen", screen), 
-                ("memory", memory), 
-                ("battery", battery)
-            ]
-        }
+def fetch_device_data(query):
+    try:
+        # Search, then info + images concurrently; records are cached by GSM id
+        record = get_device(query)
+        return device_from_record(record)
         
     except Exception as e:
         # If anything breaks, return the query name with placeholders to keep the app running
-        return {**dummy, "name": query.upper()}
+        return dummy_device(query)
+
+def device_from_record(record):
+    """Ad layout data from a normalized gsm_specs record"""
+    def spec(key, default):
+        return default if record.get(key, "N/A") == "N/A" else record[key]
+    
+    return {
+        "name": record["name"], 
+        "img_url": record.get("image_url") or CONFIG["placeholder_phone"],
+        "specs": [
+            ("processor", spec("chipset", "High Performance")), 
+            ("screen", spec("screen", "6.7 inches")), 
+            ("memory", spec("memory", "128GB 8GB RAM")), 
+            ("battery", spec("battery", "5000 mAh"))
+        ]
+    }
+
+def fetch_devices_data(queries, on_result=None):
+    """Batch version of fetch_device_data for many devices (failed lookups get placeholders)"""
+    records = fetch_devices(queries, on_result=on_result)
+    return {
+        query: dummy_device(query) if "error" in record else device_from_record(record)
+        for query, record in records.items()
+    }
 
 # ==========================================
 # 3. MOTION GRAPHICS ENGINE